@@ -0,0 +1,260 @@
+'''
+ata 명령
+    python -m ata sweep --file-path BTC_Data.csv --grid end_condition=0.9,0.95 --grid bollinger_period=20,30
+    python -m ata walkforward --file-path BTC_Data.csv --window-days 30 --grid bollinger_period=20,30
+    python -m ata import --file-path BTC_Data.csv --store-path candles --symbol BTC
+    python -m ata download --store-path candles --symbols BTC,ETH --timeframes 1m,1h --since 2024-01-01
+'''
+import argparse
+import os
+
+from ata.data.candlestore import read_candles
+
+def get_args():
+    parser = argparse.ArgumentParser(prog='ata')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    sweep_parser = subparsers.add_parser('sweep', help='백테스트 파라미터 스윕')
+    sweep_parser.add_argument(
+        '--file-path',
+        type=str,
+        default='BTC_Data.csv'
+    )
+
+    sweep_parser.add_argument(
+        '--grid',
+        type=str,
+        action='append',
+        default=[],
+        help='파라미터=값1,값2,... (여러 번 사용)'
+    )
+
+    sweep_parser.add_argument(
+        '--output-path',
+        type=str,
+        default='sweep_results.csv'
+    )
+
+    sweep_parser.add_argument(
+        '--engine',
+        type=str,
+        default='event',
+        choices=['event', 'vector']
+    )
+
+    sweep_parser.add_argument(
+        '--processes',
+        type=int,
+        default=None
+    )
+
+    sweep_parser.add_argument(
+        '--sort-by',
+        type=str,
+        default='total_return'
+    )
+
+    walkforward_parser = subparsers.add_parser('walkforward', help='워크 포워드 백테스트')
+    walkforward_parser.add_argument(
+        '--file-path',
+        type=str,
+        default='BTC_Data.csv'
+    )
+
+    walkforward_parser.add_argument(
+        '--window-days',
+        type=float,
+        default=30
+    )
+
+    walkforward_parser.add_argument(
+        '--step-days',
+        type=float,
+        default=None,
+        help='구간 시작 간격, 기본값은 window-days'
+    )
+
+    walkforward_parser.add_argument(
+        '--grid',
+        type=str,
+        action='append',
+        default=[],
+        help='파라미터=값1,값2,... (여러 번 사용), 주면 이전 구간의 최적 조합을 다음 구간에서 평가'
+    )
+
+    walkforward_parser.add_argument(
+        '--output-path',
+        type=str,
+        default='walkforward_results.csv'
+    )
+
+    walkforward_parser.add_argument(
+        '--evaluation-path',
+        type=str,
+        default='walkforward_evaluation.csv'
+    )
+
+    walkforward_parser.add_argument(
+        '--engine',
+        type=str,
+        default='event',
+        choices=['event', 'vector']
+    )
+
+    walkforward_parser.add_argument(
+        '--processes',
+        type=int,
+        default=None
+    )
+
+    walkforward_parser.add_argument(
+        '--sort-by',
+        type=str,
+        default='total_return'
+    )
+
+    import_parser = subparsers.add_parser('import', help='캔들 csv 를 CandleStore 로 가져오기')
+    import_parser.add_argument(
+        '--file-path',
+        type=str,
+        default='BTC_Data.csv'
+    )
+
+    import_parser.add_argument(
+        '--store-path',
+        type=str,
+        default='candles'
+    )
+
+    import_parser.add_argument(
+        '--symbol',
+        type=str,
+        default='BTC'
+    )
+
+    import_parser.add_argument(
+        '--timeframe',
+        type=str,
+        default='1m'
+    )
+
+    import_parser.add_argument(
+        '--chunksize',
+        type=int,
+        default=1000000
+    )
+
+    download_parser = subparsers.add_parser('download', help='업비트 KRW 마켓 캔들을 CandleStore 로 내려받기 (이어 받기)')
+    download_parser.add_argument(
+        '--store-path',
+        type=str,
+        default='candles'
+    )
+
+    download_parser.add_argument(
+        '--symbols',
+        type=str,
+        default=None,
+        help='BTC,ETH,... 기본값은 KRW 마켓 전체'
+    )
+
+    download_parser.add_argument(
+        '--timeframes',
+        type=str,
+        default='1m,5m,15m,1h'
+    )
+
+    download_parser.add_argument(
+        '--since',
+        type=str,
+        default=None,
+        help='이 시각(UTC) 이후만, 기본값은 상장 시점부터'
+    )
+
+    download_parser.add_argument(
+        '--connections',
+        type=int,
+        default=4
+    )
+
+    download_parser.add_argument(
+        '--base-url',
+        type=str,
+        default=None,
+        help='업비트 API 대신 사용할 주소 (ex. 테스트용 로컬 서버 http://127.0.0.1:8000)'
+    )
+
+    return parser.parse_args()
+
+def sweep(args):
+    from ata.backtest import parametersweep
+
+    grid = parametersweep.parse_grid(args.grid)
+    results = parametersweep.sweep(
+        data=read_candles(args.file_path),
+        grid=grid,
+        output_path=args.output_path,
+        engine=args.engine,
+        processes=args.processes,
+        data_name=os.path.abspath(args.file_path)
+    )
+    print(f'results saved at {args.output_path}')
+    print(results.sort_values(args.sort_by, ascending=False).head(10).to_string(index=False))
+
+def walkforward(args):
+    from ata.backtest import parametersweep, walkforward
+
+    window = int(args.window_days * walkforward.MINUTES_PER_DAY)
+    step = int(args.step_days * walkforward.MINUTES_PER_DAY) if args.step_days is not None else None
+    results, evaluation = walkforward.walk_forward(
+        data=read_candles(args.file_path),
+        window=window,
+        step=step,
+        grid=parametersweep.parse_grid(args.grid),
+        engine=args.engine,
+        processes=args.processes,
+        sort_by=args.sort_by
+    )
+    results.to_csv(args.output_path, index=False)
+    evaluation.to_csv(args.evaluation_path, index=False)
+    print(f'results saved at {args.output_path}, {args.evaluation_path}')
+    print(evaluation.to_string(index=False))
+    for key, value in walkforward.summarize(evaluation).items():
+        print(f'{key}: {value}')
+
+def import_candles(args):
+    from ata.data.candlestore import CandleStore
+
+    store = CandleStore(args.store_path)
+    added = store.import_csv(args.file_path, args.symbol, args.timeframe, chunksize=args.chunksize)
+    print(f'imported {added} candles into {args.store_path} ({args.symbol} {args.timeframe}: {", ".join(store.partitions(args.symbol, args.timeframe))})')
+
+def download(args):
+    import pandas as pd
+
+    from ata.data.candledownloader import CandleDownloader, make_client
+    from ata.data.candlestore import CandleStore
+
+    downloader = CandleDownloader(
+        store=CandleStore(args.store_path),
+        client=make_client(base_url=args.base_url, connections=args.connections),
+        connections=args.connections
+    )
+    results = downloader.download(
+        symbols=args.symbols.split(',') if args.symbols is not None else None,
+        timeframes=args.timeframes.split(','),
+        since=pd.Timestamp(args.since).value // 10**6 if args.since is not None else None
+    )
+    failed = [f'{symbol} {timeframe}' for (symbol, timeframe), added in results.items() if added < 0]
+    print(f'downloaded {sum(added for added in results.values() if added > 0)} candles into {args.store_path}, failed: {len(failed)} {", ".join(failed)}')
+
+if __name__ == '__main__':
+    args = get_args()
+    if args.command == 'sweep':
+        sweep(args)
+    elif args.command == 'walkforward':
+        walkforward(args)
+    elif args.command == 'import':
+        import_candles(args)
+    elif args.command == 'download':
+        download(args)
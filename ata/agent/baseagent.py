@@ -10,6 +10,9 @@ from ata.utils.format import format_float
 from ata.utils.log import log, save_log
 
 class BaseAgent():
+    # _is_buy_timing, _is_sell_timing 에서 호가를 사용하는지 여부
+    prefetch_order_book = False
+    
     def __init__(
         self,
         exchange:BaseExchange,
@@ -31,6 +34,9 @@ class BaseAgent():
         self.log_path = log_path
         self.end_condition = end_condition
         self.start_value = self.top_value = 1
+        # 마지막 루프의 평가 금액, top_value 대비 최대 낙폭
+        self.last_value = 1
+        self.max_drawdown = 0
         
     def run(self):
         log('run ATA...')
@@ -39,6 +45,8 @@ class BaseAgent():
         self.exchange.init()
         self.start_value = self.exchange.get_total_balance()
         self.top_value = self.start_value
+        self.last_value = self.start_value
+        self.max_drawdown = 0
         log(f'trading start \ntotal: {format_float(self.exchange.get_total_balance(), 10):<10}')
         while True:
             start = time.time()
@@ -49,12 +57,17 @@ class BaseAgent():
                 if self.top_value < curr_total_balance:
                     self.top_value = curr_total_balance
                     log(f'Update top value: {format_float(self.top_value, 10):<10}, end value: {format_float(self.top_value * self.end_condition, 10):<10}')
+                self.last_value = curr_total_balance
+                self.max_drawdown = max(self.max_drawdown, 1 - curr_total_balance / self.top_value)
                 if self.exchange.get_total_balance() < self.top_value * self.end_condition:
                     log(f'Top value: {self.top_value}, Current balance: {self.exchange.get_total_balance()}')
                     break
                 market_events = self.exchange.get_market_events()
                 # 매수 주문 알고리즘
                 buying_candidates = monitoring_target.union(self._get_buying_candidates())
+                # 이번 루프에서 사용할 시세를 한 번에 받아온다
+                self.exchange.prefetch(buying_candidates.union(self.exchange.balance), order_book=self.prefetch_order_book)
+                self._prepare_timing(buying_candidates.union(self.exchange.balance))
                 for target in buying_candidates:
                     if not self.exchange.is_tradable(target):
                         continue
@@ -222,6 +235,13 @@ class BaseAgent():
     def total_profit_percent(self):
         return self.exchange.get_total_balance() / self.start_value * 100
                 
+    def _prepare_timing(self, items):
+        '''
+        루프마다 _is_buy_timing, _is_sell_timing 전에 한 번 호출
+        여러 종목의 지표를 한 번에 계산해 둘 때 사용
+        '''
+        pass
+    
     @abstractmethod
     def _is_buy_timing(self, item) -> bool:
         pass
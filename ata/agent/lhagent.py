@@ -5,17 +5,45 @@ low-high agent
 import numpy as np
 
 from ata.agent.baseagent import BaseAgent
+from ata.utils.featuregraph import FeaturePlan, FeatureStream, bollinger_mfi_features
 from ata.utils.markerorderpriceunit import upbit_price_unit
 from ata.utils import trade
 
 class LHAgent(BaseAgent):
+    def __init__(
+        self,
+        *args,
+        bollinger_period = 20,
+        bollinger_num_std_dev = 2,
+        mfi_peirod = 14,
+        **kwargs
+        ):
+        super().__init__(*args, **kwargs)
+        self.bollinger_params = (bollinger_period, bollinger_num_std_dev, mfi_peirod)
+        # 종목마다 FeatureStream 을 두고 새 캔들만 O(1) 로 반영한다
+        self.feature_plan = FeaturePlan(bollinger_mfi_features(*self.bollinger_params))
+        self.feature_streams: dict[str, FeatureStream] = {}
+        # 이번 루프에서 확인한 item: (oversold, overbought)
+        self.signals: dict[str, tuple[bool, bool]] = {}
+    
+    def _prepare_timing(self, items):
+        self.signals = {}
+    
+    def __get_signal(self, item) -> tuple[bool, bool]:
+        if item not in self.signals:
+            stream = self.feature_streams.get(item)
+            if stream is None:
+                stream = self.feature_streams[item] = self.feature_plan.stream()
+            values = stream.sync_frame(self.exchange.get_ohlcv_per_1m(item))
+            oversold, overbought = trade.check_bollinger_mfi_features(values, *self.bollinger_params)
+            self.signals[item] = (bool(oversold), bool(overbought))
+        return self.signals[item]
+    
     def _is_buy_timing(self, item) -> bool:
-        ohlcv_per_1m = self.exchange.get_ohlcv_per_1m(item)
-        return trade.check_oversold_by_bollinger_mfi(ohlcv_per_1m)
+        return self.__get_signal(item)[0]
     
     def _is_sell_timing(self, item) -> bool:
-        ohlcv_per_1m = self.exchange.get_ohlcv_per_1m(item)
-        return trade.check_overbought_by_bollinger_mfi(ohlcv_per_1m)
+        return self.__get_signal(item)[1]
     
     def _get_buying_candidates(self) -> set:
         buying_candidates = set()
@@ -10,6 +10,8 @@ from ata.utils import trade
 
 
 class SRAgent(BaseAgent):
+    prefetch_order_book = True
+    
     def _is_buy_timing(self, item) -> bool:
         ohlcv_1m = self.exchange.get_ohlcv_per_1m(item)
         # ohlcv_1m, keys = trade.calc_bollinger_bands(ohlcv_1m, 20, 2)
@@ -17,30 +19,34 @@ class SRAgent(BaseAgent):
         # lower_key = keys['lower_key']
         # b_key = keys['b_key']
         # ohlcv_1m, mfi_key = trade.calc_mfi(ohlcv_1m)
-        volume_mean = np.mean(ohlcv_1m['volume'].iloc[-6:-1])
-        volume_rise_rate = ohlcv_1m['volume'].iloc[-1] / volume_mean
-        price_rise_rate = ohlcv_1m['close'].iloc[-1] / ohlcv_1m['close'].iloc[-2]
-        order_book = self.exchange.get_order_book(item)
-        # 매수벽
-        bid_volume = sum(bid[1] for bid in order_book["bids"])
-        # 매도벽
-        ask_volume = sum(ask[1] for ask in order_book["asks"])
+        arrays = trade.to_ohlcv_arrays(ohlcv_1m)
+        volume_rise_rate, price_rise_rate = trade.indicator_cache.get_or_compute(
+            trade.get_indicator_key(item, '1m', ohlcv_1m, arrays, length=6) + ('rise_rate', (5,)),
+            lambda: self.__calc_rise_rates(arrays)
+        )
+        order_book = self.exchange.get_order_book_snapshot(item)
         if (
             volume_rise_rate >= 3
             and price_rise_rate >= 1.02
-            and bid_volume > ask_volume * 3
+            and order_book.bid_volume > order_book.ask_volume * 3
         ):
             return True
         return False
     
+    def __calc_rise_rates(self, arrays):
+        '''
+        return volume_rise_rate, price_rise_rate
+        '''
+        high, low, close, volume = arrays
+        volume_mean = np.mean(volume[-6:-1])
+        volume_rise_rate = volume[-1] / volume_mean
+        price_rise_rate = close[-1] / close[-2]
+        return volume_rise_rate, price_rise_rate
+    
     def _is_sell_timing(self, item) -> bool:
-        order_book = self.exchange.get_order_book(item)
-        # 매수벽
-        bid_volume = sum(bid[1] for bid in order_book["bids"])
-        # 매도벽
-        ask_volume = sum(ask[1] for ask in order_book["asks"])
+        order_book = self.exchange.get_order_book_snapshot(item)
         if(
-            bid_volume < ask_volume * 1.5
+            order_book.bid_volume < order_book.ask_volume * 1.5
         ):
             return True
         return False
@@ -0,0 +1,194 @@
+'''
+백테스트 파라미터 스윕
+파라미터 그리드의 모든 조합을 프로세스 풀로 병렬 백테스트하고 결과(수익, 낙폭)를 csv 한 파일에 모은다.
+    - 캔들 데이터는 부모 프로세스에서 한 번만 읽고 워커는 fork 로 같은 메모리를 읽기 전용으로 공유한다.
+    - 끝난 조합은 바로 결과 파일에 추가하므로 중단된 스윕을 같은 명령으로 다시 실행하면 남은 조합만 실행한다.
+      결과마다 engine 과 데이터(이름, 행 수, 마지막 캔들 시각)를 함께 기록하고, 같은 engine, 데이터의 결과만 이어서 사용한다.
+
+engine
+    event: OfflineExchangeSimulator + LHAgent (main.py --mod OfflineSimul 과 같음)
+    vector: SignalBacktester (같은 결과, 빠름)
+
+실행: python -m ata sweep --file-path BTC_Data.csv --grid end_condition=0.9,0.95 --grid bollinger_period=20,30
+'''
+import contextlib
+import itertools
+import multiprocessing as mp
+import os
+
+import pandas as pd
+
+from ata.agent.lhagent import LHAgent
+from ata.backtest.signalbacktester import SignalBacktester
+from ata.exchange.offlineexchangesimulator import OfflineExchangeSimulator, load_offline_data
+
+# 스윕할 수 있는 파라미터: 기본값
+PARAMETERS = {
+    'wait_time_for_buy_order': 60,
+    'wait_time_for_sell_order': 60,
+    'wait_time_for_cancel_sell_order': 60,
+    'end_condition': 0.9,
+    'bollinger_period': 20,
+    'bollinger_num_std_dev': 2,
+    'mfi_peirod': 14
+}
+RESULT_COLUMNS = ['final_value', 'total_return', 'profit', 'max_drawdown', 'stopped']
+# 결과를 만든 engine, 데이터 (data_id)
+META_COLUMNS = ['engine', 'data']
+ENGINES = ['event', 'vector']
+
+# 워커가 공유하는 캔들 데이터 (_init_worker)
+_data: pd.DataFrame = None
+
+def parse_grid(specs) -> dict[str, list]:
+    '''
+    specs: ['end_condition=0.9,0.95', 'bollinger_period=20,30', ...]
+    '''
+    grid = {}
+    for spec in specs:
+        key, _, values = spec.partition('=')
+        key = key.strip().replace('-', '_')
+        if key not in PARAMETERS:
+            raise KeyError(f'unknown parameter: {key} (available: {", ".join(PARAMETERS)})')
+        grid[key] = [_parse_value(value) for value in values.split(',') if value.strip() != '']
+        if len(grid[key]) == 0:
+            raise ValueError(f'empty values: {spec}')
+    return grid
+
+def expand_grid(grid: dict[str, list]) -> list[dict]:
+    '''
+    return: 그리드의 모든 조합, 그리드에 없는 파라미터는 기본값
+    '''
+    keys = list(grid.keys())
+    combinations = []
+    for values in itertools.product(*(grid[key] for key in keys)):
+        params = dict(PARAMETERS)
+        params.update(zip(keys, values))
+        combinations.append(params)
+    return combinations
+
+def run_backtest(params: dict, engine = 'event', data: pd.DataFrame = None, rows = None) -> dict:
+    '''
+    rows: data 의 (시작, 끝) 행만 사용, None 이면 전체
+    return: params + RESULT_COLUMNS
+    '''
+    data = _data if data is None else data
+    if rows is not None:
+        data = data.iloc[rows[0]:rows[1]].reset_index(drop=True)
+    params = dict(params)
+    if engine == 'vector':
+        result = SignalBacktester(data, **params).run()
+        row = {
+            'final_value': result.final_value,
+            'total_return': result.total_return,
+            'profit': result.profit,
+            'max_drawdown': result.max_drawdown,
+            'stopped': result.stopped
+        }
+    else:
+        exchange = OfflineExchangeSimulator(data=data)
+        agent = LHAgent(exchange=exchange, only_btc=True, debug=False, **params)
+        # 워커마다 매 분 로그가 쌓이지 않도록 버린다
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            agent.run()
+        row = {
+            'final_value': agent.last_value,
+            'total_return': agent.last_value / agent.start_value - 1,
+            'profit': sum(trading_data['profit'] for trading_data in agent.trading_data.values()),
+            'max_drawdown': agent.max_drawdown,
+            'stopped': agent.last_value < agent.top_value * agent.end_condition
+        }
+    params.update(row)
+    return params
+
+def data_id(data: pd.DataFrame, name = None) -> str:
+    '''
+    name: 데이터 이름 (ex. 파일 경로)
+    return: 'name|rows=행 수|last=마지막 캔들 시각', 같은 파일이라도 캔들이 추가되면 바뀐다
+    '''
+    if 'timestamp' in data.columns:
+        last = data['timestamp'].iloc[-1]
+    elif 'datetime' in data.columns:
+        last = data['datetime'].iloc[-1]
+    else:
+        last = data.index[-1]
+    return f'{name or ""}|rows={len(data)}|last={last}'
+
+def sweep(
+    data: pd.DataFrame,
+    grid: dict[str, list],
+    output_path,
+    engine = 'event',
+    processes = None,
+    data_name = None
+    ) -> pd.DataFrame:
+    '''
+    data_name: 결과 파일에 기록할 데이터 이름 (ex. 파일 경로), data_id 참고
+    output_path 에 같은 engine, 데이터로 이미 실행한 조합은 건너뛴다
+    return: output_path 에서 같은 engine, 데이터의 결과 (이전 실행 포함)
+    '''
+    assert engine in ENGINES, f'unknown engine: {engine}'
+    data = load_offline_data(data)
+    data_key = data_id(data, data_name)
+    combinations = expand_grid(grid)
+    done = _load_done(output_path, engine, data_key)
+    pending = [params for params in combinations if _param_key(params) not in done]
+    print(f'combinations: {len(combinations)}, done: {len(combinations) - len(pending)}, pending: {len(pending)}')
+
+    if len(pending) > 0:
+        write_header = not os.path.exists(output_path) or os.path.getsize(output_path) == 0
+        with open(output_path, 'a', newline='') as f:
+            tasks = [(params, engine, None) for params in pending]
+            for i, (_, row) in enumerate(run_tasks(data, tasks, processes)):
+                row.update({'engine': engine, 'data': data_key})
+                pd.DataFrame([row], columns=META_COLUMNS + list(PARAMETERS) + RESULT_COLUMNS).to_csv(f, header=write_header, index=False)
+                write_header = False
+                f.flush()
+                print(f'[{i + 1}/{len(pending)}] ' + ', '.join(f'{key}: {row[key]}' for key in grid) + f', total_return: {row["total_return"]:.4f}, max_drawdown: {row["max_drawdown"]:.4f}')
+    return _read_results(output_path, engine, data_key)
+
+def run_tasks(data: pd.DataFrame, tasks: list, processes = None):
+    '''
+    tasks: [(params, engine, rows), ...] (run_backtest 의 인자)
+    return: 끝나는 순서대로 (tasks 의 번호, 결과)
+    '''
+    if len(tasks) == 0:
+        return
+    processes = min(processes or os.cpu_count() or 1, len(tasks))
+    # fork 는 부모의 data 를 복사 없이 공유, fork 가 없는 환경은 워커마다 한 번 전달
+    context = mp.get_context('fork') if 'fork' in mp.get_all_start_methods() else mp.get_context()
+    with context.Pool(processes, initializer=_init_worker, initargs=(data,)) as pool:
+        yield from pool.imap_unordered(_run_task, list(enumerate(tasks)))
+
+def _init_worker(data):
+    global _data
+    _data = data
+
+def _run_task(task):
+    i, (params, engine, rows) = task
+    return i, run_backtest(params, engine, rows=rows)
+
+def _load_done(output_path, engine, data_key) -> set:
+    if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+        return set()
+    results = _read_results(output_path, engine, data_key)
+    return {_param_key(row) for row in results[list(PARAMETERS)].to_dict('records')}
+
+def _read_results(output_path, engine, data_key) -> pd.DataFrame:
+    results = pd.read_csv(output_path, dtype={'engine': str, 'data': str})
+    missing = [key for key in META_COLUMNS if key not in results.columns]
+    if len(missing) > 0:
+        # 어떤 engine, 데이터의 결과인지 알 수 없으므로 이어서 실행하지 않는다
+        raise ValueError(f'{output_path} has no {", ".join(missing)} column, use another output path')
+    return results[(results['engine'] == engine) & (results['data'] == data_key)].reset_index(drop=True)
+
+def _param_key(params) -> tuple:
+    # csv 에서 읽은 값과 비교하기 위해 float 로
+    return tuple(round(float(params[key]), 10) for key in PARAMETERS)
+
+def _parse_value(value):
+    value = value.strip()
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
@@ -0,0 +1,435 @@
+'''
+LHAgent 백테스터
+main.py --mod OfflineSimul 과 같은 매매 규칙(BaseAgent.run, LHAgent, OfflineExchangeSimulator 의 체결/수수료)을 따르지만
+지표와 매수/매도 신호, 지정가 주문의 체결 시점, 평가 금액은 전체 구간에 대해 배열로 한 번에 계산하고
+신호가 있거나 주문이 남아 있는 분에만 주문 로직을 실행한다.
+
+실행: python -m ata.backtest.signalbacktester --file-path BTC_Data.csv
+'''
+import argparse
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from ata.data.candlestore import read_candles
+from ata.exchange.offlineexchangesimulator import load_offline_data
+from ata.utils import trade
+from ata.utils.featuregraph import FeaturePlan, bollinger_mfi_features
+from ata.utils.markerorderpriceunit import upbit_price_unit
+
+# BaseExchangeSimulator 의 수수료
+FEE_RATE = 0.0005
+
+class BacktestResult:
+    '''
+    equity: 매 분 평가 금액 (index 는 data 의 행 번호)
+    trades: 체결된 주문 [{'idx', 'side', 'price', 'amount'}, ...]
+    '''
+    def __init__(
+        self,
+        equity: pd.Series,
+        trades: list,
+        start_value,
+        profit,
+        stopped
+        ):
+        self.equity = equity
+        self.trades = trades
+        self.start_value = start_value
+        self.profit = profit
+        # end_condition 으로 중간에 멈췄는지
+        self.stopped = stopped
+
+    @property
+    def final_value(self):
+        return self.equity.iloc[-1] if len(self.equity) > 0 else self.start_value
+
+    @property
+    def total_return(self):
+        return self.final_value / self.start_value - 1
+
+    @property
+    def max_drawdown(self):
+        if len(self.equity) == 0:
+            return 0.0
+        equity = self.equity.to_numpy()
+        top = np.maximum.accumulate(np.maximum(equity, self.start_value))
+        return float(np.max(1 - equity / top))
+
+    def summary(self) -> dict:
+        return {
+            'start_value': self.start_value,
+            'final_value': self.final_value,
+            'total_return': self.total_return,
+            'max_drawdown': self.max_drawdown,
+            'trades': len(self.trades),
+            'profit': self.profit,
+            'stopped': self.stopped
+        }
+
+
+class SignalBacktester:
+    def __init__(
+        self,
+        data: pd.DataFrame,
+        balance = 100000,
+        item = 'BTC',
+        wait_time_for_buy_order = 60,
+        wait_time_for_sell_order = 60,
+        wait_time_for_cancel_sell_order = 60,
+        end_condition = 0.9,
+        bollinger_period = 20,
+        bollinger_num_std_dev = 2,
+        mfi_peirod = 14,
+        ohlcv_len = 100
+        ):
+        '''
+        data: OfflineExchangeSimulator 와 같은 1분봉 csv 의 df ('close', 'percentage', 'volume' 또는 'baseVolume', ...)
+        '''
+        self.data = load_offline_data(data)
+        self.balance = balance
+        self.item = item
+        self.wait_time_for_buy_order = max(0, wait_time_for_buy_order)
+        self.wait_time_for_sell_order = max(0, wait_time_for_sell_order)
+        self.wait_time_for_cancel_sell_order = wait_time_for_cancel_sell_order
+        self.end_condition = end_condition
+        # OfflineExchangeSimulator 와 같이 60 * ohlcv_len 분부터 거래
+        self.start_idx = 60 * ohlcv_len
+
+        self.close = self.data['close'].to_numpy(dtype=np.float64)
+        self.percentage = self.data['percentage'].to_numpy(dtype=np.float64)
+        values = FeaturePlan(bollinger_mfi_features(bollinger_period, bollinger_num_std_dev, mfi_peirod)).compute(self.data)
+        self.oversold, self.overbought = trade.check_bollinger_mfi_features(values, bollinger_period, bollinger_num_std_dev, mfi_peirod)
+        # 매수/매도 신호가 있는 분
+        self.signal_idx = np.flatnonzero(self.oversold | self.overbought)
+
+    @classmethod
+    def from_file(cls, file_path, **kwargs):
+        '''
+        file_path: 캔들 csv 또는 CandleStore 디렉토리
+        '''
+        return cls(read_candles(file_path), **kwargs)
+
+    def run(self) -> BacktestResult:
+        n = len(self.close)
+        assert self.start_idx <= n, f"error: not enough offline data ({self.start_idx} {n})"
+        self.__reset()
+        equity = np.full(n, np.nan)
+        self.start_value = self.top_value = self.__total(self.start_idx - 1)
+
+        idx = self.start_idx
+        end = n
+        stopped = False
+        while idx < n:
+            event_idx = self.__next_event(idx)
+            # 신호와 주문이 없는 구간은 잔고가 그대로이므로 평가 금액만 계산
+            if event_idx > idx:
+                stop_idx = self.__fill_equity(equity, idx, event_idx)
+                if stop_idx is not None:
+                    end = stop_idx + 1
+                    stopped = True
+                    break
+                idx = event_idx
+                if idx >= n:
+                    break
+            if self.__step(equity, idx) is False:
+                end = idx + 1
+                stopped = True
+                break
+            idx += 1
+
+        start = self.start_idx
+        profit = self.trading_data['profit']
+        return BacktestResult(
+            equity=pd.Series(equity[start:end], index=pd.RangeIndex(start, end)),
+            trades=self.trades,
+            start_value=self.start_value,
+            profit=profit,
+            stopped=stopped
+        )
+
+    def __reset(self):
+        self.krw = {'free': self.balance, 'used': 0, 'total': self.balance}
+        self.coin = {'free': 0, 'used': 0, 'total': 0}
+        # 생성 순서대로의 미체결 주문
+        self.open_orders: list[dict] = []
+        self.trades = []
+        self.monitoring = False
+        self.trading_data = {
+            'buy_cnt' : 0,
+            'sell_cnt' : 0,
+            'buy_cnt_histories' : deque([0], maxlen=5),
+            'sell_cnt_histories' : deque([0], maxlen=5),
+            'buy_order_infos' : [],
+            'sell_order_infos' : [],
+            'buy_price_avg' : 0,
+            'buy_amount' : 0,
+            'profit' : 0,
+            'last_buy_time': 0,
+            'last_sell_time' : 0
+        }
+
+    def __total(self, idx):
+        return self.krw['total'] + self.coin['total'] * self.close[idx]
+
+    def __next_event(self, idx):
+        '''
+        idx 이후 주문 로직을 실행해야 하는 첫 분
+        '''
+        data = self.trading_data
+        if len(data['sell_order_infos']) > 0:
+            # 매도 주문은 다음 분에 체결되거나 시장가로 다시 주문된다
+            return idx
+        event_idx = len(self.close)
+        position = np.searchsorted(self.signal_idx, idx)
+        if position < len(self.signal_idx):
+            event_idx = self.signal_idx[position]
+        for order in self.open_orders:
+            if order['next_fill'] < idx:
+                order['next_fill'] = self.__next_fill(order, idx)
+            event_idx = min(event_idx, order['next_fill'])
+        return event_idx
+
+    def __next_fill(self, order, start):
+        '''
+        start 부터 처음으로 체결 조건(매수: 가격 >= 현재가, 매도: 가격 <= 현재가)을 만족하는 분
+        '''
+        n = len(self.close)
+        step = 1024
+        while start < n:
+            window = self.close[start:start + step]
+            if order['side'] == 'bid':
+                hits = np.flatnonzero(window <= order['price'])
+            else:
+                hits = np.flatnonzero(window >= order['price'])
+            if len(hits) > 0:
+                return start + int(hits[0])
+            start += step
+            step *= 2
+        return n
+
+    def __fill_equity(self, equity, start, end):
+        '''
+        return: end_condition 에 걸린 분, 없으면 None
+        '''
+        segment = self.krw['total'] + self.coin['total'] * self.close[start:end]
+        equity[start:end] = segment
+        top = np.maximum.accumulate(np.maximum(segment, self.top_value))
+        stop = np.flatnonzero(segment < top * self.end_condition)
+        if len(stop) > 0:
+            end = start + int(stop[0]) + 1
+            equity[end:] = np.nan
+            self.top_value = top[stop[0]]
+            return end - 1
+        self.top_value = top[-1]
+        return None
+
+    def __step(self, equity, idx):
+        '''
+        BaseAgent.run 의 루프 한 번
+        '''
+        self.__process_orders(idx)
+        total = self.__total(idx)
+        equity[idx] = total
+        if self.top_value < total:
+            self.top_value = total
+        if total < self.top_value * self.end_condition:
+            return False
+
+        now = (idx + 1) * 60
+        curr_price = self.close[idx]
+        data = self.trading_data
+
+        # 매수 주문 알고리즘
+        if (self.percentage[idx] > 0 or self.monitoring) and now - data['last_buy_time'] >= self.wait_time_for_buy_order and self.oversold[idx]:
+            self.monitoring = True
+            data['last_buy_time'] = now
+            data['buy_cnt'] += 1
+            data['sell_cnt_histories'].append(data['sell_cnt'])
+            data['sell_cnt'] = 0
+            criterion = np.median(data['buy_cnt_histories']) - 1
+            if data['buy_cnt'] > criterion:
+                buy_price = curr_price - upbit_price_unit(self.item, curr_price) * max(2 + criterion - data['buy_cnt'], 0)
+                buy_amount_krw = min(total / 5 * (data['buy_cnt'] - criterion), self.krw['free'] * 0.94)
+                buy_amount_item = buy_amount_krw / buy_price
+                if buy_amount_krw > 6000:
+                    order = self.__create_order(idx, 'bid', buy_price, buy_amount_item)
+                    if order is not None:
+                        data['buy_order_infos'].append({'order': order, 'time': now})
+
+        # 매도 주문 알고리즘
+        if now - data['last_sell_time'] >= self.wait_time_for_sell_order and self.overbought[idx]:
+            self.monitoring = False
+            data['last_sell_time'] = now
+
+            # 채결 안된 매수 주문 취소
+            buy_prices = []
+            buy_amounts = []
+            for order_info in data['buy_order_infos']:
+                order = order_info['order']
+                if order['status'] == 'open':
+                    self.__cancel_order(order)
+                if order['filled'] > 0:
+                    buy_prices.append(order['price'])
+                    buy_amounts.append(order['filled'])
+            data['buy_order_infos'].clear()
+            if len(buy_amounts) > 0:
+                buy_price_avg = np.average(buy_prices, weights=buy_amounts) * (1 + FEE_RATE)
+                buy_amount = np.sum(buy_amounts)
+                data['buy_price_avg'] = (data['buy_price_avg'] * data['buy_amount'] + buy_price_avg * buy_amount) / (data['buy_amount'] + buy_amount)
+                data['buy_amount'] += buy_amount
+            if data['buy_cnt'] > 0:
+                data['buy_cnt_histories'].append(data['buy_cnt'])
+            data['buy_cnt'] = 0
+
+            data['sell_cnt'] += 1
+            if data['sell_cnt'] > np.median(data['sell_cnt_histories']) - 2:
+                sell_price = curr_price + upbit_price_unit(self.item, curr_price) * max(0, 2 - data['sell_cnt'])
+                denominator = 2.0
+                weight = min(denominator, data['sell_cnt']) / denominator
+                sell_amount_item = self.coin['free'] * weight
+                if sell_amount_item * sell_price > 6000:
+                    order = self.__create_order(idx, 'ask', sell_price, sell_amount_item)
+                    data['sell_order_infos'].append({'order': order, 'time': now})
+
+        # 최종 거래 내역(매수 -> 매도까지)
+        sell_prices = []
+        sell_amounts = []
+        for order_info in data['sell_order_infos'][:]:
+            order = order_info['order']
+            if order['status'] == 'open' and now - order_info['time'] >= self.wait_time_for_cancel_sell_order:
+                self.__cancel_order(order)
+                market_order = self.__create_order(idx, 'ask', curr_price, order['amount'] - order['filled'])
+                # 시장가 주문은 현재가로 바로 체결
+                self.__process_order(market_order, idx)
+                self.__remove_open_order(market_order)
+                data['sell_order_infos'].append({'order': market_order, 'time': order_info['time']})
+            if order['status'] != 'open':
+                if order['filled'] > 0:
+                    sell_prices.append(order['price'])
+                    sell_amounts.append(order['filled'])
+                data['sell_order_infos'].remove(order_info)
+        if len(sell_amounts) > 0:
+            sell_price_avg = np.average(sell_prices, weights=sell_amounts) * (1 - FEE_RATE)
+            sell_amount = np.sum(sell_amounts)
+            data['profit'] += (sell_price_avg - data['buy_price_avg']) * min(sell_amount, data['buy_amount'])
+            data['buy_amount'] = max(0, data['buy_amount'] - sell_amount)
+        return True
+
+    def __create_order(self, idx, side, price, amount):
+        if side == 'bid':
+            krw = price * amount * (1 + FEE_RATE)
+            if krw > self.krw['free']:
+                # BaseExchangeSimulator 는 예외, 에이전트는 로그만 남긴다
+                return None
+            self.krw['free'] -= krw
+            self.krw['used'] += krw
+        else:
+            self.coin['free'] -= amount
+            self.coin['used'] += amount
+        order = {'side': side, 'price': price, 'amount': amount, 'filled': 0, 'status': 'open', 'next_fill': idx + 1}
+        self.open_orders.append(order)
+        return order
+
+    def __cancel_order(self, order):
+        if order['status'] != 'open':
+            return
+        self.__remove_open_order(order)
+        order['status'] = 'canceled'
+        if order['side'] == 'bid':
+            # 시뮬레이터와 같이 수수료분은 돌려받지 않는다
+            amount_krw = order['amount'] * order['price']
+            self.krw['free'] += amount_krw
+            self.krw['used'] -= amount_krw
+        else:
+            self.coin['free'] += order['amount']
+            self.coin['used'] -= order['amount']
+
+    def __remove_open_order(self, order):
+        for i, open_order in enumerate(self.open_orders):
+            if open_order is order:
+                del self.open_orders[i]
+                return
+
+    def __process_orders(self, idx):
+        # BaseExchangeSimulator.update(fill_model='close') 와 같이 현재가에 닿은 주문을 주문 순서대로 모두 체결
+        self.open_orders = [order for order in self.open_orders if not self.__process_order(order, idx)]
+
+    def __process_order(self, order, idx):
+        '''
+        return: 체결 여부 (체결된 주문은 호출한 곳에서 open_orders 에서 지운다)
+        '''
+        price = self.close[idx]
+        if order['side'] == 'bid' and order['price'] >= price:
+            amount_krw = order['amount'] * order['price'] * (1 + FEE_RATE)
+            self.coin['free'] += order['amount']
+            self.coin['total'] += order['amount']
+            self.krw['total'] -= amount_krw
+            self.krw['used'] -= amount_krw
+        elif order['side'] == 'ask' and order['price'] <= price:
+            amount_krw = order['amount'] * order['price'] * (1 - FEE_RATE)
+            self.krw['free'] += amount_krw
+            self.krw['total'] += amount_krw
+            self.coin['total'] -= order['amount']
+            self.coin['used'] -= order['amount']
+        else:
+            return False
+        order['filled'] = order['amount']
+        order['status'] = 'closed'
+        self.trades.append({'idx': idx, 'side': order['side'], 'price': order['price'], 'amount': order['amount']})
+        return True
+
+
+def get_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--file-path",
+        type=str,
+        default="BTC_Data.csv"
+    )
+
+    parser.add_argument(
+        '--balance',
+        type=float,
+        default=100000
+    )
+
+    parser.add_argument(
+        '--end-condition',
+        type=float,
+        default=0.9
+    )
+
+    parser.add_argument(
+        '--wait-time-for-buy-order',
+        type=float,
+        default=60
+    )
+
+    parser.add_argument(
+        '--wait-time-for-sell-order',
+        type=float,
+        default=60
+    )
+
+    parser.add_argument(
+        '--wait-time-for-cancel-sell-order',
+        type=float,
+        default=60
+    )
+
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = get_args()
+    result = SignalBacktester.from_file(
+        args.file_path,
+        balance=args.balance,
+        end_condition=args.end_condition,
+        wait_time_for_buy_order=args.wait_time_for_buy_order,
+        wait_time_for_sell_order=args.wait_time_for_sell_order,
+        wait_time_for_cancel_sell_order=args.wait_time_for_cancel_sell_order
+    ).run()
+    for key, value in result.summary().items():
+        print(f'{key}: {value}')
@@ -0,0 +1,117 @@
+'''
+워크 포워드 백테스트
+긴 1분봉 데이터를 거래 구간(window)으로 나누고, 각 구간 앞에 지표 계산용 warm-up(OfflineExchangeSimulator 와 같은 60 * 100 분)을 붙여
+구간마다 독립된 백테스트를 프로세스 풀로 병렬 실행한 뒤 구간 수익을 이어 붙인다.
+각 구간은 초기 잔고와 빈 거래 기록으로 시작한다 (이전 구간의 포지션은 이어지지 않는다).
+시뮬레이터가 지나는 분은 구간 경계에서 시작하므로 step 이 window 이면 구간끼리 겹치지 않고 이어진다.
+
+그리드를 주면 모든 조합을 모든 구간에서 실행하고, 구간 k 에서 가장 좋은 조합을 구간 k + 1 에서 평가한 결과(out-of-sample)를 이어 붙인다.
+
+실행: python -m ata walkforward --file-path BTC_Data.csv --window-days 30 --grid bollinger_period=20,30
+'''
+import pandas as pd
+
+from ata.backtest.parametersweep import expand_grid, run_tasks
+from ata.exchange.offlineexchangesimulator import load_offline_data
+
+# OfflineExchangeSimulator 의 첫 틱(init)까지 필요한 1분봉 수, 첫 틱은 data[WARMUP - 1]
+WARMUP = 60 * 100
+MINUTES_PER_DAY = 60 * 24
+
+def split_windows(n, window, step = None, warmup = WARMUP) -> list[tuple[int, int, int]]:
+    '''
+    n: 1분봉 수
+    window: 거래 구간 길이(분)
+    step: 구간 시작 간격(분), None 이면 window (겹치지 않음)
+    return: [(data_start, start, end), ...]
+        data[data_start:end] 로 백테스트하면 시뮬레이터는 start 부터 end - 1 까지 지난다.
+        start 는 시작 잔고를 정하는 첫 틱(init)이고 거래는 start + 1 부터 한다. (구간마다 거래할 분이 하나 이상)
+        거래할 수 없는 한 분만 남으면 마지막 구간에 붙인다.
+    '''
+    step = window if step is None else step
+    assert window > 0 and step > 0, f'error: window ({window}), step ({step})'
+    windows = []
+    for start in range(warmup - 1, n - 1, step):
+        end = min(start + window, n)
+        if n - end < 2:
+            end = n
+        windows.append((start - warmup + 1, start, end))
+        if end == n:
+            break
+    return windows
+
+def walk_forward(
+    data: pd.DataFrame,
+    window,
+    step = None,
+    grid: dict[str, list] = None,
+    engine = 'event',
+    processes = None,
+    sort_by = 'total_return'
+    ) -> tuple[pd.DataFrame, pd.DataFrame]:
+    '''
+    sort_by: 구간에서 가장 좋은 조합을 고르는 결과 컬럼, '-' 로 시작하면 작을수록 좋음 (ex. -max_drawdown)
+    return: results, evaluation
+        results: 구간 x 조합 전체 결과
+        evaluation: 이어 붙인 구간별 결과 (cumulative_return 포함)
+            grid 가 없거나 조합이 하나면 모든 구간,
+            아니면 두 번째 구간부터 이전 구간에서 sort_by 가 가장 좋은 조합의 결과
+        step < window 로 구간이 겹치면 cumulative_return 은 구간 수익을 단순히 곱한 값이다.
+    '''
+    data = load_offline_data(data)
+    windows = split_windows(len(data), window, step)
+    combinations = expand_grid(grid or {})
+    tasks = []
+    for data_start, start, end in windows:
+        for params in combinations:
+            tasks.append((params, engine, (data_start, end)))
+    print(f'windows: {len(windows)}, combinations: {len(combinations)}, tasks: {len(tasks)}')
+
+    rows = [None] * len(tasks)
+    for done, (i, row) in enumerate(run_tasks(data, tasks, processes)):
+        window_id, combination_id = divmod(i, len(combinations))
+        _, start, end = windows[window_id]
+        info = {'window': window_id, 'combination': combination_id, 'start': start, 'end': end}
+        if 'datetime' in data.columns:
+            info['start_time'] = data['datetime'].iloc[start]
+            info['end_time'] = data['datetime'].iloc[end - 1]
+        info.update(row)
+        rows[i] = info
+        print(f'[{done + 1}/{len(tasks)}] window: {window_id}, combination: {combination_id}, total_return: {row["total_return"]:.4f}, max_drawdown: {row["max_drawdown"]:.4f}')
+    results = pd.DataFrame(rows)
+    return results, _evaluate(results, len(combinations), sort_by)
+
+def _evaluate(results: pd.DataFrame, n_combinations, sort_by) -> pd.DataFrame:
+    if n_combinations == 1:
+        evaluation = results.copy()
+    else:
+        ascending = sort_by.startswith('-')
+        column = sort_by.lstrip('-')
+        picks = []
+        for window_id in sorted(results['window'].unique())[1:]:
+            in_sample = results[results['window'] == window_id - 1]
+            best = in_sample.sort_values(column, ascending=ascending, kind='stable').iloc[0]
+            out_of_sample = results[(results['window'] == window_id) & (results['combination'] == best['combination'])].iloc[0].copy()
+            out_of_sample['in_sample_' + column] = best[column]
+            picks.append(out_of_sample)
+        evaluation = pd.DataFrame(picks)
+    if len(evaluation) > 0:
+        evaluation = evaluation.sort_values('window').reset_index(drop=True)
+        evaluation['cumulative_return'] = (1 + evaluation['total_return']).cumprod() - 1
+    return evaluation
+
+def summarize(evaluation: pd.DataFrame) -> dict:
+    '''
+    이어 붙인 구간 수익 요약
+    '''
+    if len(evaluation) == 0:
+        return {'windows': 0}
+    return {
+        'windows': len(evaluation),
+        'cumulative_return': evaluation['cumulative_return'].iloc[-1],
+        'mean_return': evaluation['total_return'].mean(),
+        'positive_windows': int((evaluation['total_return'] > 0).sum()),
+        'worst_return': evaluation['total_return'].min(),
+        'worst_drawdown': evaluation['max_drawdown'].max(),
+        'profit': evaluation['profit'].sum()
+    }
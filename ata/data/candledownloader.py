@@ -0,0 +1,156 @@
+'''
+캔들 내려받기
+업비트 KRW 마켓 종목의 캔들(1m, 5m, 15m, 1h)을 최신부터 과거로 한 페이지(200개)씩 받아 CandleStore 에 쓴다.
+    - 종목 / 봉마다 하나의 작업, 작업들은 connections 개의 스레드로 동시에 요청하고 요청 수는 업비트 요청 그룹별 토큰 버킷으로 제한
+    - 저장된 캔들이 있으면 최신 ~ 마지막 저장 캔들, 처음 저장 캔들 ~ since(없으면 상장) 만 받는다 (중단 후 다시 실행하면 이어서 받음)
+    - 겹치는 페이지, 마지막 저장 캔들(받을 때 진행 중이던 봉)은 CandleStore.write 가 새 값으로 바꾼다
+since 없이 다시 실행하면 상장 시점까지 받았는지 확인하는 요청이 종목 / 봉마다 한 번 더 나간다.
+
+base_url 로 업비트 대신 같은 API 를 흉내 내는 로컬 서버에서 받을 수 있다 (테스트)
+
+실행: python -m ata download --store-path candles
+      python -m ata download --store-path candles --symbols BTC,ETH --timeframes 1m,1h --since 2024-01-01
+'''
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import ccxt
+import pandas as pd
+from requests.adapters import HTTPAdapter
+
+from ata.data.candlestore import TIMESTAMP, CandleStore
+from ata.exchange.upbitratelimitedclient import UpbitRateLimitedClient
+from ata.utils.log import log
+from ata.utils.ratelimiter import RateLimiter
+
+# 거래소 클래스가 사용하는 봉
+TIMEFRAMES = ['1m', '5m', '15m', '1h']
+# 업비트 캔들 요청 한 번의 최대 개수
+PAGE_LIMIT = 200
+OHLCV_COLUMNS = [TIMESTAMP, 'open', 'high', 'low', 'close', 'volume']
+
+def make_client(base_url = None, connections = 4, limiter: RateLimiter = None) -> UpbitRateLimitedClient:
+    '''
+    base_url: 업비트 API 주소 대신 사용할 주소 (ex. http://127.0.0.1:8000), /v1/market/all, /v1/candles/... 을 요청한다
+    '''
+    exchange = ccxt.upbit(config={'enableRateLimit': False})
+    if base_url is not None:
+        exchange.urls['api'] = {'public': base_url.rstrip('/'), 'private': base_url.rstrip('/')}
+    # 동시에 요청하는 스레드 수만큼 keep-alive 연결을 유지
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=connections)
+    exchange.session.mount('https://', adapter)
+    exchange.session.mount('http://', adapter)
+    return UpbitRateLimitedClient(exchange, limiter)
+
+class CandleDownloader:
+    def __init__(
+        self,
+        store: CandleStore,
+        client: UpbitRateLimitedClient,
+        connections = 4,
+        flush_rows = 50000,
+        retries = 3
+        ):
+        '''
+        flush_rows: 과거로 받는 중에 이만큼 모이면 저장 (중단돼도 저장된 구간이 끊기지 않음)
+        retries: 네트워크 오류 / 요청 제한 응답일 때 다시 요청하는 횟수
+        '''
+        self.store = store
+        self.client = client
+        self.connections = connections
+        self.flush_rows = flush_rows
+        self.retries = retries
+
+    def krw_symbols(self) -> list[str]:
+        self.client.limiter.acquire('market')
+        markets = self.client.load_markets()
+        return sorted(market['base'] for market in markets.values() if market['quote'] == 'KRW' and market.get('active', True) is not False)
+
+    def download(self, symbols: list[str] = None, timeframes: list[str] = TIMEFRAMES, since = None) -> dict[tuple[str, str], int]:
+        '''
+        symbols: None 이면 KRW 마켓 전체
+        since: 이 시각(ms) 이후만 받음, None 이면 상장 시점부터
+        return: {(종목, 봉): 새로 추가된 캔들 수}, 실패한 작업은 -1
+        '''
+        available = self.krw_symbols()
+        if symbols is None:
+            symbols = available
+        else:
+            unknown = [symbol for symbol in symbols if symbol not in available]
+            if len(unknown) > 0:
+                log(f'skip unknown symbols: {", ".join(unknown)}')
+            symbols = [symbol for symbol in symbols if symbol in available]
+        jobs = [(symbol, timeframe) for symbol in symbols for timeframe in timeframes]
+        log(f'download {len(symbols)} symbols x {len(timeframes)} timeframes ({len(jobs)} jobs, {self.connections} connections)')
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.connections) as executor:
+            futures = {executor.submit(self.download_one, symbol, timeframe, since): (symbol, timeframe) for symbol, timeframe in jobs}
+            for done, future in enumerate(as_completed(futures)):
+                symbol, timeframe = futures[future]
+                try:
+                    results[(symbol, timeframe)] = future.result()
+                    log(f'[{done + 1}/{len(jobs)}] {symbol} {timeframe}: {results[(symbol, timeframe)]} candles added')
+                except Exception as e:
+                    results[(symbol, timeframe)] = -1
+                    log(f'[{done + 1}/{len(jobs)}] {symbol} {timeframe}: error: {e}')
+        return results
+
+    def download_one(self, symbol, timeframe, since = None) -> int:
+        '''
+        return: 새로 추가된 캔들 수
+        '''
+        last = self.store.last_timestamp(symbol, timeframe)
+        if last is None:
+            return self.__download_backward(symbol, timeframe, end=None, stop=since, buffered=False)
+        # 최신 ~ 마지막 저장 캔들: 다 받은 뒤 한 번에 저장 (중간에 멈추면 빈 구간이 생기므로)
+        added = self.__download_backward(symbol, timeframe, end=None, stop=last, buffered=True)
+        first = self.store.first_timestamp(symbol, timeframe)
+        if since is None or since < first:
+            added += self.__download_backward(symbol, timeframe, end=first, stop=since, buffered=False)
+        return added
+
+    def __download_backward(self, symbol, timeframe, end, stop, buffered) -> int:
+        '''
+        end 이전(None 이면 최신) 캔들을 과거로 stop 까지 (stop 포함, None 이면 상장 시점까지)
+        '''
+        pages = []
+        rows = 0
+        added = 0
+        while True:
+            ohlcvs = self.__fetch_page(symbol, timeframe, end)
+            if len(ohlcvs) == 0:
+                break
+            oldest = min(ohlcv[0] for ohlcv in ohlcvs)
+            if stop is not None:
+                ohlcvs = [ohlcv for ohlcv in ohlcvs if ohlcv[0] >= stop]
+            pages.append(ohlcvs)
+            rows += len(ohlcvs)
+            if (stop is not None and oldest <= stop) or (end is not None and oldest >= end):
+                break
+            end = oldest
+            if not buffered and rows >= self.flush_rows:
+                added += self.__write(symbol, timeframe, pages)
+                pages = []
+                rows = 0
+        return added + self.__write(symbol, timeframe, pages)
+
+    def __fetch_page(self, symbol, timeframe, end) -> list[list]:
+        # 업비트는 to 이전의 캔들을 최대 count 개 반환한다 (거래가 없던 봉은 빠짐)
+        params = {} if end is None else {'to': self.client.iso8601(end)}
+        for attempt in range(self.retries + 1):
+            try:
+                return self.client.fetch_ohlcv(f'{symbol}/KRW', timeframe, limit=PAGE_LIMIT, params=params)
+            except ccxt.BaseError as e:
+                if attempt == self.retries or not _is_retryable(e):
+                    raise
+                time.sleep(attempt + 1)
+
+    def __write(self, symbol, timeframe, pages) -> int:
+        if len(pages) == 0:
+            return 0
+        df = pd.DataFrame([ohlcv for page in pages for ohlcv in page], columns=OHLCV_COLUMNS)
+        return self.store.write(symbol, timeframe, df)
+
+def _is_retryable(e: Exception) -> bool:
+    # 요청 제한 응답은 본문의 에러 이름에 따라 ExchangeError 로 올 수 있다
+    return isinstance(e, ccxt.NetworkError) or 'too_many_requests' in str(e)
@@ -0,0 +1,285 @@
+'''
+캔들 저장소
+종목 / 봉 / 월 단위로 나눠 컬럼마다 .npy 파일로 저장하고 np.load(mmap_mode='r') 로 연다.
+csv 를 파싱하지 않으므로 바로 열리고, 필요한 부분만 메모리에 올라오며 여러 프로세스가 같은 페이지를 공유한다.
+
+    root/
+        BTC/
+            1m/
+                2024-01/
+                    timestamp.npy       int64, ms (UTC)
+                    open.npy            float64
+                    high.npy, low.npy, close.npy, volume.npy, percentage.npy, ...
+
+한 달 안의 구간은 파일을 그대로 매핑하고(복사 없음), 여러 달은 컬럼마다 이어 붙인다.
+시간대가 없는 시각(캔들 csv 의 datetime, 날짜 문자열)은 업비트 거래소 클래스의 분봉 index 와 같은 KST 로 보고 UTC timestamp 로 바꿔 저장한다.
+
+csv 가져오기: python -m ata import --file-path BTC_Data.csv --store-path candles --symbol BTC
+'''
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+TIMESTAMP = 'timestamp'
+# 캔들 csv 에서 저장하지 않는 컬럼 (timestamp 로 저장)
+DATETIME = 'datetime'
+# 시간대가 없는 시각의 시간대
+TIMEZONE = 'Asia/Seoul'
+# 불러올 때 컬럼 순서, 나머지는 이름 순
+CANDLE_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+class CandleStore:
+    def __init__(self, root):
+        self.root = root
+
+    def symbols(self) -> list[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, name)))
+
+    def timeframes(self, symbol) -> list[str]:
+        path = os.path.join(self.root, symbol)
+        if not os.path.isdir(path):
+            return []
+        return sorted(name for name in os.listdir(path) if os.path.isdir(os.path.join(path, name)))
+
+    def partitions(self, symbol, timeframe = '1m') -> list[str]:
+        '''
+        return: 저장된 월 ['2024-01', '2024-02', ...]
+        '''
+        path = os.path.join(self.root, symbol, timeframe)
+        if not os.path.isdir(path):
+            return []
+        return sorted(name for name in os.listdir(path) if not name.startswith('.') and os.path.isdir(os.path.join(path, name)))
+
+    def columns(self, symbol, timeframe = '1m') -> list[str]:
+        partitions = self.partitions(symbol, timeframe)
+        if len(partitions) == 0:
+            return []
+        return list(self.open_partition(symbol, timeframe, partitions[-1]).keys())
+
+    def open_partition(self, symbol, timeframe, month) -> dict[str, np.ndarray]:
+        '''
+        return: 컬럼 이름: 읽기 전용 memmap (timestamp 가 처음)
+        '''
+        path = self.__partition_path(symbol, timeframe, month)
+        names = [os.path.splitext(name)[0] for name in os.listdir(path) if name.endswith('.npy')]
+        names = [key for key in CANDLE_COLUMNS if key in names] + sorted(key for key in names if key not in CANDLE_COLUMNS and key != TIMESTAMP)
+        return {name: np.load(os.path.join(path, name + '.npy'), mmap_mode='r') for name in [TIMESTAMP] + names}
+
+    def last_timestamp(self, symbol, timeframe = '1m'):
+        '''
+        return: 마지막 캔들의 timestamp(ms), 없으면 None
+        '''
+        partitions = self.partitions(symbol, timeframe)
+        if len(partitions) == 0:
+            return None
+        timestamps = self.open_partition(symbol, timeframe, partitions[-1])[TIMESTAMP]
+        return int(timestamps[-1]) if len(timestamps) > 0 else None
+
+    def first_timestamp(self, symbol, timeframe = '1m'):
+        partitions = self.partitions(symbol, timeframe)
+        if len(partitions) == 0:
+            return None
+        timestamps = self.open_partition(symbol, timeframe, partitions[0])[TIMESTAMP]
+        return int(timestamps[0]) if len(timestamps) > 0 else None
+
+    def series(self, symbol, timeframe = '1m') -> 'CandleSeries':
+        '''
+        월별 memmap 을 이어 붙이지 않고 시각으로 조회
+        '''
+        return CandleSeries([self.open_partition(symbol, timeframe, month) for month in self.partitions(symbol, timeframe)])
+
+    def load_arrays(self, symbol, timeframe = '1m', start = None, end = None, columns = None) -> dict[str, np.ndarray]:
+        '''
+        start, end: timestamp(UTC, ms) 또는 날짜 문자열 (시간대가 없으면 KST), [start, end) 구간
+        columns: 불러올 컬럼, None 이면 전체
+        return: 컬럼 이름: 배열, 한 달 안의 구간이면 memmap 의 view
+            여러 달에 걸치거나 달마다 컬럼이 다르면 np.concatenate 로 구간 전체를 메모리에 복사한다.
+            몇 달 이상의 긴 구간은 series() 의 CandleSeries 로 필요한 부분만 조회 (MultiOfflineExchangeSimulator)
+        '''
+        arrays = self.series(symbol, timeframe).between(_to_timestamp(start), _to_timestamp(end), columns)
+        if len(arrays[TIMESTAMP]) == 0:
+            raise KeyError(f'no candles: {symbol} {timeframe}')
+        return arrays
+
+    def load(self, symbol, timeframe = '1m', start = None, end = None, columns = None) -> pd.DataFrame:
+        '''
+        return: 'datetime'(시간대 없는 KST, datetime64[ms]) + 'timestamp'(UTC, ms) + 저장된 컬럼 df, 캔들 csv 를 read_csv 한 것과 같은 형식
+            timestamp 컬럼은 그대로 두므로 timestamp 를 가진 csv 에서 가져온 저장소도 같은 컬럼을 돌려준다.
+        '''
+        arrays = self.load_arrays(symbol, timeframe, start, end, columns)
+        data = {DATETIME: _timestamp_to_datetime(arrays[TIMESTAMP])}
+        data.update(arrays)
+        return pd.DataFrame(data, copy=False)
+
+    def write(self, symbol, timeframe, df: pd.DataFrame) -> int:
+        '''
+        df: 'timestamp'(UTC, ms) 또는 'datetime'(시간대가 없으면 KST) 컬럼을 가진 캔들 df
+        이미 있는 캔들과 합치고 같은 timestamp 는 새 값으로 바꾼다 (겹치는 구간 중복 제거)
+        return: 새로 추가된 캔들 수
+        '''
+        df = _normalize(df)
+        if len(df) == 0:
+            return 0
+        months = df[TIMESTAMP].to_numpy().astype('datetime64[ms]').astype('datetime64[M]')
+        added = 0
+        for month in np.unique(months):
+            part = df[months == month]
+            name = str(month)
+            path = self.__partition_path(symbol, timeframe, name)
+            _recover_partition(path)
+            previous = 0
+            if os.path.isdir(path):
+                existing = pd.DataFrame({key: np.asarray(value) for key, value in self.open_partition(symbol, timeframe, name).items()})
+                previous = len(existing)
+                part = pd.concat([existing, part], ignore_index=True)
+            part = part.drop_duplicates(subset=TIMESTAMP, keep='last').sort_values(TIMESTAMP, kind='stable')
+            self.__write_partition(path, part)
+            added += len(part) - previous
+        return added
+
+    def import_csv(self, file_path, symbol, timeframe = '1m', chunksize = 1000000) -> int:
+        '''
+        캔들 csv (datetime, open, high, low, close, baseVolume, ...) 를 저장소로 가져온다
+        return: 가져온 캔들 수
+        '''
+        added = 0
+        for chunk in pd.read_csv(file_path, chunksize=chunksize):
+            added += self.write(symbol, timeframe, chunk)
+        return added
+
+    def __partition_path(self, symbol, timeframe, month):
+        return os.path.join(self.root, symbol, timeframe, month)
+
+    def __write_partition(self, path, df):
+        # 다른 디렉토리에 모두 쓴 뒤 바꿔서 중간에 멈춰도 월 단위로 온전하게 남도록
+        directory, month = os.path.split(path)
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = os.path.join(directory, f'.{month}.tmp')
+        old_path = os.path.join(directory, f'.{month}.old')
+        for stale in (tmp_path, old_path):
+            if os.path.isdir(stale):
+                shutil.rmtree(stale)
+        os.makedirs(tmp_path)
+        for key in df.columns:
+            dtype = np.int64 if key == TIMESTAMP else np.float64
+            np.save(os.path.join(tmp_path, key + '.npy'), df[key].to_numpy(dtype=dtype))
+        if os.path.isdir(path):
+            os.rename(path, old_path)
+        os.rename(tmp_path, path)
+        if os.path.isdir(old_path):
+            shutil.rmtree(old_path)
+
+
+class CandleSeries:
+    '''
+    한 종목 캔들의 시각 조회
+    partitions: 시각 순서의 배열 묶음 [{'timestamp': ..., 'open': ..., ...}, ...] (CandleStore 의 월 또는 df 하나)
+    '''
+    def __init__(self, partitions: list[dict[str, np.ndarray]]):
+        self.partitions = [arrays for arrays in partitions if len(arrays[TIMESTAMP]) > 0]
+        self.columns = list(dict.fromkeys(key for arrays in self.partitions for key in arrays))
+        self.__firsts = np.array([arrays[TIMESTAMP][0] for arrays in self.partitions], dtype=np.int64)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'CandleSeries':
+        df = _normalize(df)
+        return cls([{key: df[key].to_numpy(dtype=np.int64 if key == TIMESTAMP else np.float64) for key in df.columns}])
+
+    def __len__(self):
+        return sum(len(arrays[TIMESTAMP]) for arrays in self.partitions)
+
+    @property
+    def first_timestamp(self):
+        return int(self.partitions[0][TIMESTAMP][0]) if len(self.partitions) > 0 else None
+
+    @property
+    def last_timestamp(self):
+        return int(self.partitions[-1][TIMESTAMP][-1]) if len(self.partitions) > 0 else None
+
+    def between(self, start = None, end = None, columns = None) -> dict[str, np.ndarray]:
+        '''
+        return: [start, end) 구간의 컬럼 이름: 배열 ('timestamp' 포함), 한 partition 안이면 view
+            여러 partition 에 걸치면 이어 붙인 복사본 (없는 컬럼은 nan)
+        '''
+        keys = [TIMESTAMP] + [key for key in self.columns if key != TIMESTAMP and (columns is None or key in columns)]
+        first = 0 if start is None else max(int(np.searchsorted(self.__firsts, start, side='right')) - 1, 0)
+        chunks = []
+        for arrays in self.partitions[first:]:
+            timestamps = arrays[TIMESTAMP]
+            if end is not None and timestamps[0] >= end:
+                break
+            lo = 0 if start is None else int(np.searchsorted(timestamps, start, side='left'))
+            hi = len(timestamps) if end is None else int(np.searchsorted(timestamps, end, side='left'))
+            if lo < hi:
+                chunks.append((arrays, lo, hi))
+        if len(chunks) == 1:
+            arrays, lo, hi = chunks[0]
+            if all(key in arrays for key in keys):
+                return {key: arrays[key][lo:hi] for key in keys}
+        return {
+            key: np.concatenate([arrays[key][lo:hi] if key in arrays else np.full(hi - lo, np.nan) for arrays, lo, hi in chunks])
+                if len(chunks) > 0 else np.zeros(0, dtype=np.int64 if key == TIMESTAMP else np.float64)
+            for key in keys
+        }
+
+    def last_before(self, timestamp, key = 'close'):
+        '''
+        return: timestamp 전 마지막 캔들의 값, 없으면 None
+        '''
+        p = int(np.searchsorted(self.__firsts, timestamp, side='left')) - 1
+        if p < 0:
+            return None
+        arrays = self.partitions[p]
+        i = int(np.searchsorted(arrays[TIMESTAMP], timestamp, side='left')) - 1
+        return float(arrays[key][i])
+
+
+def read_candles(file_path, symbol = 'BTC', timeframe = '1m') -> pd.DataFrame:
+    '''
+    file_path: 캔들 csv 또는 CandleStore 디렉토리
+    return: 'volume' 컬럼 이름으로 바꾼 캔들 df
+    '''
+    if os.path.isdir(file_path):
+        data = CandleStore(file_path).load(symbol, timeframe)
+    else:
+        data = pd.read_csv(file_path)
+    if 'baseVolume' in data.columns:
+        data = data.rename(columns={"baseVolume": "volume"})
+    return data
+
+def _recover_partition(path):
+    # 이전 쓰기가 기존 월을 치운 뒤 멈췄으면 되돌린다
+    directory, month = os.path.split(path)
+    old_path = os.path.join(directory, f'.{month}.old')
+    if not os.path.isdir(path) and os.path.isdir(old_path):
+        os.rename(old_path, path)
+
+def _normalize(df: pd.DataFrame) -> pd.DataFrame:
+    # timestamp(ms) + 숫자 컬럼, 'baseVolume' 은 'volume' 으로
+    df = df.rename(columns={"baseVolume": "volume"})
+    if TIMESTAMP not in df.columns:
+        df = df.assign(**{TIMESTAMP: _datetime_to_timestamp(df[DATETIME])})
+    df = df.drop(columns=[DATETIME], errors='ignore')
+    columns = [TIMESTAMP] + [key for key in df.columns if key != TIMESTAMP and pd.api.types.is_numeric_dtype(df[key])]
+    return df[columns]
+
+def _datetime_to_timestamp(values) -> np.ndarray:
+    # 시간대가 없는 시각은 TIMEZONE, 저장하는 timestamp 는 UTC
+    values = pd.to_datetime(values)
+    if values.dt.tz is None:
+        values = values.dt.tz_localize(TIMEZONE)
+    return values.dt.tz_convert(None).to_numpy().astype('datetime64[ms]').astype(np.int64)
+
+def _timestamp_to_datetime(timestamps) -> np.ndarray:
+    # UTC timestamp(ms) 를 TIMEZONE 의 시간대 없는 시각으로 (load 에서 csv 의 datetime 과 같은 시각)
+    values = pd.to_datetime(np.asarray(timestamps), unit='ms', utc=True).tz_convert(TIMEZONE).tz_localize(None)
+    return values.to_numpy().astype('datetime64[ms]')
+
+def _to_timestamp(value):
+    if value is None or isinstance(value, (int, np.integer)):
+        return value
+    return int(_datetime_to_timestamp(pd.Series([value]))[0])
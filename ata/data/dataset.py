@@ -6,30 +6,27 @@ import torch
 from torch.utils.data import Dataset
 import torchvision.transforms as transforms
 
-from ata.algorithm import trading
+from ata.data.candlestore import read_candles
+from ata.utils import trade
+from ata.utils.featuregraph import FeaturePlan, bollinger_keys, bollinger_mfi_features
 
 class OfflineDataset(Dataset):
     def __init__(self, file_path, sequence_len):
-        self.data = pd.read_csv(file_path)
-        self.data = self.data.rename(columns={"baseVolume": "volume"})
+        # 캔들 csv 또는 CandleStore 디렉토리
+        self.data = read_candles(file_path)
         self.sequence_len = sequence_len
         
         self.bollinger_period = 20
         self.bollinger_num_std_dev = 2
-        self.data, bollinger_keys = trading.calc_bollinger_bands(
-            df=self.data, 
-            period=self.bollinger_period, 
-            num_std_dev=self.bollinger_num_std_dev
-            )
-        self.upper_key = bollinger_keys['upper_key']
-        self.lower_key = bollinger_keys['lower_key']
-        self.b_key = bollinger_keys['b_key']
-        
         self.mfi_peirod = 14
-        self.data, self.mfi_key = trading.calc_mfi(
-            df=self.data, 
-            period=self.mfi_peirod
-            )
+        # 볼린저 밴드와 mfi 를 한 번에 계산 (sma, std 등 중간 결과 포함)
+        self.feature_plan = FeaturePlan(bollinger_mfi_features(self.bollinger_period, self.bollinger_num_std_dev, self.mfi_peirod))
+        self.data = self.feature_plan.apply(self.data)
+        keys = bollinger_keys(self.bollinger_period, self.bollinger_num_std_dev)
+        self.upper_key = keys['upper_key']
+        self.lower_key = keys['lower_key']
+        self.b_key = keys['b_key']
+        self.mfi_key = f'mfi{self.mfi_peirod}'
         
         # self.idx_offset = max([self.bollinger_period, self.mfi_peirod]) - 1
         self.idx_offset = max([self.bollinger_period, self.mfi_peirod]) - 1
@@ -54,7 +51,8 @@ class OfflineDataset(Dataset):
         end = self.idx_offset + idx + self.sequence_len
         data = self.data[start:end]
         label = data[self.label_key].iloc[-1]
-        data = data.drop(columns=['datetime', self.label_key])
+        # 시각 컬럼은 특징에서 뺀다 (csv 와 저장소의 특징 수가 같도록)
+        data = data.drop(columns=['datetime', 'timestamp', self.label_key], errors='ignore')
         data = data.iloc[::-1].reset_index(drop=True).values
         
         # 각 열에 대해 min-max 정규화 (최댓값 - 최솟값이 0인 경우 처리)
@@ -79,9 +77,14 @@ class OfflineDataset(Dataset):
         oversold_idx = []
         overbought_idx = []
         
+        # 지표 컬럼은 이미 계산되어 있으므로 구간마다 다시 계산하지 않는다
+        oversold, overbought = trade.check_bollinger_mfi_features(
+            df, self.bollinger_period, self.bollinger_num_std_dev, self.mfi_peirod
+        )
+        oversold = oversold.to_numpy()
+        overbought = overbought.to_numpy()
         for idx in range(start_idx, len(df)):
-            param = (df[idx - self.idx_offset:idx + 1], self.bollinger_period, self.bollinger_num_std_dev, self.mfi_peirod)
-            if trading.check_oversold_by_bollinger_mfi(*param):
+            if oversold[idx]:
                 if len(overbought_idx) > 0:
                     for buy_idx in oversold_idx:
                         if df['close'][buy_idx] < df['close'][overbought_idx[0]]:
@@ -95,7 +98,7 @@ class OfflineDataset(Dataset):
                     overbought_idx.clear() 
                 
                 oversold_idx.append(idx)
-            elif trading.check_overbought_by_bollinger_mfi(*param):
+            elif overbought[idx]:
                 overbought_idx.append(idx)
         
         label_key = 'label'
@@ -0,0 +1,177 @@
+import time
+
+from ata.utils.log import log
+
+class BalanceLedger:
+    '''
+    거래소 잔고를 로컬에서 관리하는 장부
+    주문 접수/체결을 받을 때마다 잔고를 직접 갱신하고, reconcile_interval 초마다 또는 잔고가 맞지 않을 때만 fetch_balance 로 맞춘다.
+    balance 는 ccxt fetch_balance 와 같은 형태
+        {'KRW': {'free', 'used', 'total'}, ..., 'free': {...}, 'used': {...}, 'total': {...}}
+    '''
+    def __init__(
+        self,
+        exchange,
+        reconcile_interval = 60,
+        fee_rate = 0.0005,
+        tolerance = 1e-8
+        ):
+        self.exchange = exchange
+        self.reconcile_interval = reconcile_interval
+        self.fee_rate = fee_rate
+        self.tolerance = tolerance
+        self.balance: dict = {}
+        # 종료되지 않은 주문 order_id: {'item', 'side', 'locked', 'filled', 'cost', 'fee'}
+        self.__orders: dict[str, dict] = {}
+        self.__reconciled_at = None
+        self.__dirty = True
+
+    def update(self) -> dict:
+        if self.__dirty or time.monotonic() - self.__reconciled_at >= self.reconcile_interval:
+            self.reconcile()
+        return self.balance
+
+    def reconcile(self):
+        fetched = self.exchange.fetch_balance()
+        # 다른 곳에서 참조하고 있을 수 있으므로 같은 dict 를 갱신
+        self.balance.clear()
+        self.balance.update(fetched)
+        if len(self.__orders) > 0:
+            self.__rebase_orders()
+        self.__reconciled_at = time.monotonic()
+        self.__dirty = False
+        return self.balance
+
+    def mark_dirty(self):
+        '''
+        다음 update() 에서 거래소 잔고로 다시 맞춘다
+        '''
+        self.__dirty = True
+
+    def apply_ack(self, order_id, item, side, amount_item = None, price = None, amount_krw = None):
+        '''
+        주문 접수 시 주문에 묶이는 잔고를 반영
+        side: 'buy' | 'sell'
+        지정가 매수: price, amount_item / 시장가 매수: amount_krw / 매도: amount_item
+        '''
+        if side == 'buy':
+            if amount_krw is None:
+                amount_krw = price * amount_item
+            locked = amount_krw * (1 + self.fee_rate)
+            self.__add('KRW', free=-locked, used=locked)
+        else:
+            locked = amount_item
+            self.__add(item, free=-locked, used=locked)
+        self.__orders[order_id] = {
+            'item': item, 'side': side, 'locked': locked,
+            'filled': 0, 'cost': 0, 'fee': 0
+        }
+        self.__check()
+
+    def apply_order(self, order):
+        '''
+        fetch_order / cancel_order 로 받은 주문의 체결량 변화와 종료를 반영
+        '''
+        tracked = self.__orders.get(order['id'])
+        if tracked is None:
+            return
+        item = tracked['item']
+
+        filled, cost, fee_cost = self.__fill_state(order)
+        d_filled = filled - tracked['filled']
+        d_cost = cost - tracked['cost']
+        d_fee = fee_cost - tracked['fee']
+
+        if d_filled > 0 or d_cost > 0:
+            if tracked['side'] == 'buy':
+                spent = d_cost + d_fee
+                self.__add(item, free=d_filled, total=d_filled)
+                self.__add('KRW', used=-spent, total=-spent)
+                tracked['locked'] -= spent
+            else:
+                received = d_cost - d_fee
+                self.__add(item, used=-d_filled, total=-d_filled)
+                self.__add('KRW', free=received, total=received)
+                tracked['locked'] -= d_filled
+            tracked['filled'] = filled
+            tracked['cost'] = cost
+            tracked['fee'] = fee_cost
+
+        if order.get('status') in ('closed', 'canceled', 'expired', 'rejected'):
+            # 남은 묶인 잔고 해제
+            currency = 'KRW' if tracked['side'] == 'buy' else item
+            if abs(tracked['locked']) > self.tolerance:
+                self.__add(currency, free=tracked['locked'], used=-tracked['locked'])
+            del self.__orders[order['id']]
+            self.__remove_empty(item)
+        self.__check()
+
+    def __fill_state(self, order):
+        '''
+        return: (체결량, 체결 금액, 수수료)
+        '''
+        filled = order.get('filled') or 0
+        cost = order.get('cost')
+        if cost is None:
+            cost = filled * (order.get('average') or order.get('price') or 0)
+        fee = order.get('fee') or {}
+        fee_cost = fee.get('cost')
+        if fee_cost is None:
+            fee_cost = cost * self.fee_rate
+        return filled, cost, fee_cost
+
+    def __rebase_orders(self):
+        '''
+        fetch_balance 에 이미 반영된 체결이 apply_order 에서 다시 더해지지 않도록 추적 중인 주문의 기준(체결량, 묶인 잔고)을 거래소 상태로 맞춘다
+        잔고를 먼저 받으므로 그 사이의 체결은 다음 reconcile 까지 빠질 수는 있어도 두 번 더해지지는 않는다
+        '''
+        open_orders = {order['id']: order for order in self.exchange.fetch_open_orders()}
+        for order_id, tracked in list(self.__orders.items()):
+            order = open_orders.get(order_id)
+            if order is None:
+                # 종료된 주문은 묶인 잔고 해제까지 fetch_balance 에 반영되어 있다
+                del self.__orders[order_id]
+                continue
+            filled, cost, fee_cost = self.__fill_state(order)
+            if tracked['side'] == 'buy':
+                tracked['locked'] -= (cost + fee_cost) - (tracked['cost'] + tracked['fee'])
+            else:
+                tracked['locked'] -= filled - tracked['filled']
+            tracked['filled'] = filled
+            tracked['cost'] = cost
+            tracked['fee'] = fee_cost
+
+    def __add(self, currency, free = 0, used = 0, total = None):
+        if total is None:
+            total = free + used
+        if currency not in self.balance:
+            self.balance[currency] = {'free': 0, 'used': 0, 'total': 0}
+        entry = self.balance[currency]
+        entry['free'] += free
+        entry['used'] += used
+        entry['total'] += total
+        for key in ('free', 'used', 'total'):
+            if key in self.balance and isinstance(self.balance[key], dict):
+                self.balance[key][currency] = entry[key]
+
+    def __remove_empty(self, currency):
+        entry = self.balance.get(currency)
+        if entry is None or currency == 'KRW':
+            return
+        if abs(entry['free']) <= self.tolerance and abs(entry['used']) <= self.tolerance:
+            del self.balance[currency]
+            for key in ('free', 'used', 'total'):
+                if key in self.balance and isinstance(self.balance[key], dict):
+                    self.balance[key].pop(currency, None)
+
+    def __check(self):
+        # 로컬 잔고가 음수가 되면 놓친 체결/주문이 있는 것이므로 다음 루프에 다시 맞춘다
+        for currency, entry in self.balance.items():
+            if currency in ('info', 'free', 'used', 'total') or not isinstance(entry, dict):
+                continue
+            scale = max(1.0, abs(entry.get('total') or 0))
+            if (entry.get('free') or 0) < -self.tolerance * scale or (entry.get('used') or 0) < -self.tolerance * scale:
+                if not self.__dirty:
+                    log(f'balance discrepancy {currency}: {entry}')
+                self.__dirty = True
+                return
@@ -1,10 +1,17 @@
 from abc import abstractmethod
 
+from ata.exchange.orderbooksnapshot import OrderBookSnapshot
+from ata.exchange.priceoracle import PriceOracle
+
 class BaseExchange:
     def __init__(
         self,
         ):
         self.balance: dict = {}
+        self.__order_book_snapshots: dict[str, OrderBookSnapshot] = {}
+        self.price_oracle = PriceOracle(clock=self.get_time)
+        self.__total_balance = 0
+        self.__total_balance_key = None
     
     def create_sell_all_order(self, item, price):
         return self.create_sell_order(item=item, price=price, amount_item=self.balance[item]['free'])
@@ -13,11 +20,63 @@ class BaseExchange:
         return self.create_sell_order_at_market_price(item=item,amount_item=self.balance[item]['free'])
     
     def get_current_price(self, item):
+        price = self.price_oracle.get(item)
+        if price is not None:
+            return price
         ohlcv = self.get_ohlcv_per_1m(item)
         if ohlcv is None:
             return 0
         return ohlcv['close'].iloc[-1]
     
+    def get_total_balance(self):
+        # 잔고와 가격이 그대로이고 가격이 오래되지 않았으면 이전에 계산한 평가 금액을 사용
+        totals = self._get_balance_totals()
+        key = (self.price_oracle.version, totals)
+        if key == self.__total_balance_key and self.price_oracle.is_fresh():
+            return self.__total_balance
+        total = 0
+        cacheable = True
+        for item, amount in totals:
+            if item == 'KRW':
+                total += amount
+                continue
+            price = self.price_oracle.get(item)
+            if price is None:
+                # 시세가 없거나 오래된 경우 캔들로 계산하고 캐시하지 않음
+                price = self.get_current_price(item)
+                cacheable = False
+            total += amount * price
+        self.__total_balance = total
+        self.__total_balance_key = key if cacheable else None
+        return total
+    
+    def _get_balance_totals(self) -> tuple:
+        '''
+        ((item, total), ...)
+        '''
+        if isinstance(self.balance.get('total'), dict):
+            # ccxt fetch_balance 형식
+            return tuple(self.balance['total'].items())
+        return tuple((item, self.balance[item]['total']) for item in self.balance)
+    
+    def get_order_book_snapshot(self, item) -> OrderBookSnapshot:
+        '''
+        get_order_book 결과가 바뀌지 않았다면 이전에 계산한 스냅샷을 그대로 반환
+        '''
+        order_book = self.get_order_book(item)
+        snapshot = self.__order_book_snapshots.get(item)
+        if snapshot is None or snapshot.order_book is not order_book:
+            snapshot = OrderBookSnapshot(order_book)
+            self.__order_book_snapshots[item] = snapshot
+        return snapshot
+    
+    def prefetch(self, items, order_book = False):
+        '''
+        이번 루프에서 사용할 items 의 시세를 미리 받아둔다.
+        원격 거래소는 동시에 받아오도록 재정의하고, 그 외에는 아무것도 하지 않는다.
+        '''
+        pass
+    
     def is_tradable(self, item):
         if self.get_ohlcv_per_1m(item) is None:
             return False
@@ -63,10 +122,6 @@ class BaseExchange:
     def get_ohlcv_per_1h(self, item):
         pass
 
-    @abstractmethod
-    def get_total_balance(self):
-        pass
-    
     @abstractmethod
     def get_order(self, order_id):
         pass
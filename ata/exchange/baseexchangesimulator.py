@@ -1,128 +1,298 @@
 from abc import abstractmethod
+import heapq
 
 from ata.exchange.baseexchange import BaseExchange
 
+'''
+체결 방식 (fill_model)
+    close: 매 update 에서 현재가에 닿은 지정가 주문(매수: 가격 >= 현재가, 매도: 가격 <= 현재가)을 주문 순서대로 모두 체결
+    bar: 1분봉의 저가 / 고가가 지나간 주문(매수: 가격 >= 저가, 매도: 가격 <= 고가)을 가격 우선, 주문 순서대로
+         봉 거래량 * volume_ratio 까지만 체결 (나머지는 부분 체결로 남아 다음 봉에서 체결)
+         update 마다 주문 이후에 시작해서 마감된 봉이 있어야 하므로 오프라인 시뮬레이터(supports_bar_fill)만 지원한다.
+         실시간 / 재생 거래소의 마지막 1분봉은 진행 중인 봉이라 주문 전의 고가 / 저가와 거래량이 섞인다.
+시장가 주문은 두 방식 모두 현재가로 바로 전부 체결된다.
+미체결 주문은 종목마다 가격 순서의 매수 / 매도 힙에 두고 현재가 / 봉에 닿은 주문만 꺼내므로
+update 비용은 미체결 주문 수가 아니라 체결되는 주문 수에 비례한다.
+'''
+FILL_MODELS = ['close', 'bar']
+
+class SimulatedOrder:
+    '''
+    시뮬레이터 주문, 에이전트는 ccxt 주문처럼 order['status'], order['filled'] 로 읽는다
+    '''
+    __slots__ = ('id', 'symbol', 'side', 'price', 'amount', 'filled', 'status', 'seq')
+
+    def __init__(self, id, symbol, side, price, amount, seq):
+        self.id = id
+        self.symbol = symbol
+        self.side = side
+        self.price = price
+        self.amount = amount
+        self.filled = 0
+        self.status = 'open'
+        self.seq = seq
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key, default = None):
+        return getattr(self, key, default)
+
+    @property
+    def remaining(self):
+        return self.amount - self.filled
+
+
+class SimulatedOrderBook:
+    '''
+    한 종목의 미체결 주문 힙, 취소된 주문은 힙에서 꺼낼 때 버린다
+    bids: (-가격, 주문 번호, 주문), asks: (가격, 주문 번호, 주문)
+    '''
+    __slots__ = ('bids', 'asks', 'stale')
+
+    def __init__(self):
+        self.bids: list[tuple] = []
+        self.asks: list[tuple] = []
+        self.stale = 0
+
+    def __len__(self):
+        return len(self.bids) + len(self.asks) - self.stale
+
+    def push(self, order: SimulatedOrder):
+        if order.side == 'bid':
+            heapq.heappush(self.bids, (-order.price, order.seq, order))
+        else:
+            heapq.heappush(self.asks, (order.price, order.seq, order))
+
+    def pop_crossed(self, side, price) -> SimulatedOrder:
+        '''
+        side 힙에서 price 에 닿은 가장 우선하는 주문을 꺼냄, 없으면 None
+        '''
+        heap = self.bids if side == 'bid' else self.asks
+        while len(heap) > 0:
+            key, _, order = heap[0]
+            if order.status != 'open':
+                heapq.heappop(heap)
+                self.stale -= 1
+                continue
+            if (side == 'bid' and -key < price) or (side == 'ask' and key > price):
+                return None
+            heapq.heappop(heap)
+            return order
+        return None
+
+    def compact(self):
+        # 취소된 주문이 절반을 넘으면 힙을 다시 만든다
+        if self.stale * 2 <= len(self.bids) + len(self.asks):
+            return
+        self.bids = [entry for entry in self.bids if entry[2].status == 'open']
+        self.asks = [entry for entry in self.asks if entry[2].status == 'open']
+        heapq.heapify(self.bids)
+        heapq.heapify(self.asks)
+        self.stale = 0
+
+
 class BaseExchangeSimulator(BaseExchange):
+    # fill_model='bar' 지원 여부, 지원하는 시뮬레이터는 _get_bar 를 구현한다
+    supports_bar_fill = False
+
     def __init__(
         self,
-        balance = 1000000
+        balance = 1000000,
+        fill_model = 'close',
+        volume_ratio = 1.0
         ):
+        '''
+        fill_model: 'close' 또는 'bar' (위 설명)
+        volume_ratio: bar 체결에서 주문이 가져갈 수 있는 봉 거래량 비율
+        '''
         super().__init__()
-        
+        if fill_model not in FILL_MODELS:
+            raise ValueError(f'unknown fill_model: {fill_model}')
+        if fill_model == 'bar' and not self.supports_bar_fill:
+            raise ValueError(f'{type(self).__name__} does not support fill_model: bar')
+
         self.balance = {
                 'KRW': {'free': balance, 'used': 0, 'total': balance}
             }
-        
-        self.__order = {}
-        self.__open_order_id = []
+        self.fill_model = fill_model
+        self.volume_ratio = volume_ratio
+
+        self.__order: dict[str, SimulatedOrder] = {}
+        self.__books: dict[str, SimulatedOrderBook] = {}
+        # 종목별 (봉 key, 남은 매수 체결 가능량, 남은 매도 체결 가능량)
+        self.__bar_volumes: dict[str, list] = {}
         self.ohlcvs_1m: dict = {}
         self.ohlcvs_15m: dict = {}
         self.ohlcvs_1h: dict = {}
         self.__id_cnt = 0
-    
+
     def init(self):
         self.update()
         return True
-    
+
     def update(self) -> bool:
-        for order_id in self.__open_order_id:
-            self.__process_order(order_id)
-        
+        for item in list(self.__books):
+            self.__match(item)
+
         return True
-    
+
     def create_buy_order(self, item, price, amount_item):
         krw = price * amount_item * 1.0005
-        if krw > self.balance['KRW']['free']: 
+        if krw > self.balance['KRW']['free']:
             raise Exception(f'KRW 초과(request: {krw}, remained: {self.balance["KRW"]["free"]})')
         self.balance['KRW']['free'] -= krw
         self.balance['KRW']['used'] += krw
-        order_id = self.__make_order(item, status='open', side='bid', price=price, amount=amount_item, filled=0)
-        return order_id
-    
+        order = self.__make_order(item, side='bid', price=price, amount=amount_item)
+        self.__book(item).push(order)
+        return order.id
+
     def create_buy_order_at_market_price(self, item, amount_krw):
         curr_price = self.get_current_price(item=item)
         order_id = self.create_buy_order(item=item, price=curr_price,amount_item=amount_krw / curr_price * 10000 / 10005)
-        self.__process_order(order_id)
+        self.__fill_at_market_price(order_id)
         return order_id
-    
+
     def create_sell_order(self, item, price, amount_item):
         if amount_item > self.balance[item]['free']:
             raise Exception(f'{item} 부족(request: {amount_item}, remained: {self.balance[item]["free"]})')
         self.balance[item]['free'] -= amount_item
         self.balance[item]['used'] += amount_item
-        order_id = self.__make_order(item, status='open', side='ask', price=price, amount=amount_item, filled=0)
-        return order_id
-    
+        order = self.__make_order(item, side='ask', price=price, amount=amount_item)
+        self.__book(item).push(order)
+        return order.id
+
     def create_sell_order_at_market_price(self, item, amount_item):
         order_id = self.create_sell_order(item=item, price=self.get_current_price(item=item), amount_item=amount_item)
-        self.__process_order(order_id)
+        self.__fill_at_market_price(order_id)
         return order_id
-    
-    def get_total_balance(self):
-        total = 0
-        for item in self.balance:
-            if item == 'KRW':
-                total += self.balance[item]['total']
-            else:
-                total += (self.balance[item]['total'] * self.get_current_price(item=item))
-        return total
-    
+
     def get_order(self, order_id):
         return self.__order[order_id]
-    
+
     def cancel_order_by_id(self, order_id):
-        if order_id in self.__open_order_id:
-            self.__open_order_id.remove(order_id)
-            order = self.get_order(order_id=order_id)
-            if order['status'] == 'open':
-                order['status'] = 'canceled'
-                # 매수 
-                if order['side'] == 'bid':
-                    amount_krw = order['amount'] * order['price']
-                    self.balance['KRW']['free'] += amount_krw
-                    self.balance['KRW']['used'] -= amount_krw
-                else:
-                    item = order['symbol'].split('/')[0]
-                    self.balance[item]['free'] += order['amount']
-                    self.balance[item]['used'] -= order['amount']
-    
-    
-    def __make_order(self, item, status, side, price, amount, filled):
+        order = self.__order.get(order_id)
+        if order is None or order.status != 'open':
+            return
+        order.status = 'canceled'
+        # 체결되지 않은 만큼 돌려준다
+        if order.side == 'bid':
+            amount_krw = order.remaining * order.price
+            self.balance['KRW']['free'] += amount_krw
+            self.balance['KRW']['used'] -= amount_krw
+        else:
+            item = order.symbol.split('/')[0]
+            self.balance[item]['free'] += order.remaining
+            self.balance[item]['used'] -= order.remaining
+        book = self.__books.get(order.symbol.split('/')[0])
+        if book is not None:
+            book.stale += 1
+            book.compact()
+
+    def _get_bar(self, item):
+        '''
+        bar 체결에 사용하는 1분봉, 이번 update 에서 새로 마감된(이전 update 이후에 시작한) 봉이어야 한다
+        return: (봉 key, 고가, 저가, 거래량), 봉이 없으면 None
+        '''
+        raise NotImplementedError(f'{type(self).__name__} does not support fill_model: bar')
+
+    def __make_order(self, item, side, price, amount) -> SimulatedOrder:
         order_id = f'{self.__id_cnt}'
+        order = SimulatedOrder(order_id, item+'/KRW', side, price, amount, self.__id_cnt)
         self.__id_cnt += 1
-        self.__order[order_id] = {'status': status, 'side': side, 'price': price, 'amount': amount, 'filled': filled,
-                                  'id': order_id, 'symbol': item+'/KRW'}
-        if status == 'open':
-            self.__open_order_id.append(order_id)
-        return order_id
-        
-    def __process_order(self, order_id):
+        self.__order[order_id] = order
+        return order
+
+    def __book(self, item) -> SimulatedOrderBook:
+        book = self.__books.get(item)
+        if book is None:
+            book = SimulatedOrderBook()
+            self.__books[item] = book
+        return book
+
+    def __match(self, item):
+        book = self.__books[item]
+        if item not in self.balance:
+            self.balance[item] = {'free': 0, 'used': 0, 'total': 0}
+        if self.fill_model == 'close':
+            price = self.get_current_price(item)
+            crossed = []
+            for side in ('bid', 'ask'):
+                order = book.pop_crossed(side, price)
+                while order is not None:
+                    crossed.append(order)
+                    order = book.pop_crossed(side, price)
+            # 주문 순서대로 (이전과 같은 잔고 계산 순서)
+            for order in sorted(crossed, key=lambda order: order.seq):
+                self.__fill(order, order.remaining)
+        else:
+            bar = self._get_bar(item)
+            if bar is not None:
+                key, high, low, volume = bar
+                volumes = self.__bar_volumes.get(item)
+                if volumes is None or volumes[0] != key:
+                    volumes = [key, volume * self.volume_ratio, volume * self.volume_ratio]
+                    self.__bar_volumes[item] = volumes
+                volumes[1] = self.__fill_crossed(book, 'bid', low, volumes[1])
+                volumes[2] = self.__fill_crossed(book, 'ask', high, volumes[2])
+        if len(book) == 0:
+            del self.__books[item]
+            self.__bar_volumes.pop(item, None)
+
+    def __fill_crossed(self, book: SimulatedOrderBook, side, price, available):
+        '''
+        return: 남은 체결 가능량
+        '''
+        while available > 0:
+            order = book.pop_crossed(side, price)
+            if order is None:
+                break
+            amount = min(order.remaining, available)
+            self.__fill(order, amount)
+            available -= amount
+            if order.status == 'open':
+                # 부분 체결, 같은 우선순위로 다시 넣는다
+                book.push(order)
+        return available
+
+    def __fill_at_market_price(self, order_id):
         order = self.__order[order_id]
-        item = order['symbol'].split('/')[0]
+        item = order.symbol.split('/')[0]
         if item not in self.balance:
             self.balance[item] = {'free': 0, 'used': 0, 'total': 0}
-        if order['status'] == 'open':
-            # 매수 주문
-            if order['side'] == 'bid' and order['price'] >= self.get_current_price(item):
-                amount_krw = order['amount'] * order['price'] * 1.0005
-                self.balance[item]['free'] += order['amount']
-                self.balance[item]['total'] += order['amount']
-                self.balance['KRW']['total'] -= amount_krw
-                self.balance['KRW']['used'] -= amount_krw
-                order['filled'] = order['amount']
-                order['status'] = 'closed'
-                self.__open_order_id.remove(order_id)
-            
-            # 매도 주문    
-            elif order['side'] == 'ask' and order['price'] <= self.get_current_price(item):
-                amount_krw = order['amount'] * order['price'] * 0.9995
-                self.balance['KRW']['free'] += amount_krw
-                self.balance['KRW']['total'] += amount_krw
-                self.balance[item]['total'] -= order['amount']
-                self.balance[item]['used'] -= order['amount']
-                order['filled'] = order['amount']
-                order['status'] = 'closed'
-                self.__open_order_id.remove(order_id)
+        # 힙에 남은 항목은 꺼낼 때 버린다
+        self.__fill(order, order.remaining)
+        book = self.__books[item]
+        book.stale += 1
+        book.compact()
+        if len(book) == 0:
+            del self.__books[item]
+            self.__bar_volumes.pop(item, None)
+
+    def __fill(self, order: SimulatedOrder, amount):
+        item = order.symbol.split('/')[0]
+        # 매수 주문
+        if order.side == 'bid':
+            amount_krw = amount * order.price * 1.0005
+            self.balance[item]['free'] += amount
+            self.balance[item]['total'] += amount
+            self.balance['KRW']['total'] -= amount_krw
+            self.balance['KRW']['used'] -= amount_krw
+        # 매도 주문
+        else:
+            amount_krw = amount * order.price * 0.9995
+            self.balance['KRW']['free'] += amount_krw
+            self.balance['KRW']['total'] += amount_krw
+            self.balance[item]['total'] -= amount
+            self.balance[item]['used'] -= amount
+        if amount >= order.remaining:
+            order.filled = order.amount
+            order.status = 'closed'
+        else:
+            order.filled += amount
 
     def get_tickers(self):
         return self.tickers
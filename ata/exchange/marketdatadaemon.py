@@ -0,0 +1,284 @@
+'''
+여러 에이전트 프로세스가 함께 사용하는 시세 데몬
+데몬 하나가 업비트 연결을 가지고 tickers, 캔들, 호가, 종목 경고 정보를 받아오고,
+에이전트 프로세스는 유닉스 소켓(윈도우는 named pipe)으로 데몬에 요청한다.
+같은 데이터를 여러 프로세스가 요청해도 ttl 안에서는 업비트에 한 번만 요청한다.
+
+보안
+    - 소켓은 소유자만 접근할 수 있는 디렉토리(0700)에 만들고 소켓 파일도 0600 으로 바꾼다
+    - 연결할 때 authkey 로 인증한다, authkey 는 환경 변수 ATA_MARKET_DATA_AUTHKEY 또는
+      데몬이 시작할 때 무작위로 만들어 소켓 옆에 쓰는 authkey 파일(0600)을 사용한다 (기본값 없음)
+    - 요청 / 응답은 pickle 이 아닌 json 으로 주고받는다
+
+실행: python -m ata.exchange.marketdatadaemon
+'''
+import argparse
+import builtins
+import json
+import os
+import secrets
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+
+import ccxt
+
+from ata.exchange.ohlcvstore import OHLCVStore
+from ata.exchange.upbitmarketevents import UpbitMarketEventService
+from ata.exchange.upbitratelimitedclient import UpbitRateLimitedClient
+from ata.utils.log import log
+
+AUTHKEY_ENV = 'ATA_MARKET_DATA_AUTHKEY'
+if sys.platform == 'win32':
+    DEFAULT_DIR = os.path.join(tempfile.gettempdir(), 'ata')
+    DEFAULT_ADDRESS = r'\\.\pipe\ata_market_data'
+else:
+    DEFAULT_DIR = os.path.join(tempfile.gettempdir(), f'ata-{os.getuid()}')
+    DEFAULT_ADDRESS = os.path.join(DEFAULT_DIR, 'market_data.sock')
+
+def is_pipe(address) -> bool:
+    return address.startswith('\\\\')
+
+def authkey_path(address) -> str:
+    '''
+    데몬이 authkey 를 쓰는 파일 (소켓과 같은 디렉토리)
+    '''
+    if is_pipe(address):
+        return os.path.join(DEFAULT_DIR, 'authkey')
+    return os.path.join(os.path.dirname(os.path.abspath(address)), 'authkey')
+
+def make_private_dir(path):
+    '''
+    path 를 소유자만 접근할 수 있는 디렉토리로 만든다, 다른 사용자가 먼저 만든 디렉토리면 예외
+    '''
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    if sys.platform != 'win32':
+        stat = os.stat(path)
+        if stat.st_uid != os.getuid() or stat.st_mode & 0o077:
+            raise PermissionError(f'{path} must be a directory owned by the current user with mode 0700')
+
+def load_authkey(address) -> bytes:
+    '''
+    환경 변수 ATA_MARKET_DATA_AUTHKEY, 없으면 데몬이 쓴 authkey 파일
+    '''
+    authkey = os.environ.get(AUTHKEY_ENV)
+    if authkey:
+        return authkey.encode()
+    path = authkey_path(address)
+    try:
+        with open(path, 'rb') as f:
+            authkey = f.read().strip()
+    except FileNotFoundError:
+        raise RuntimeError(f'market data authkey not found: set {AUTHKEY_ENV} or start the daemon first ({path})') from None
+    if len(authkey) == 0:
+        raise RuntimeError(f'empty market data authkey: {path}')
+    return authkey
+
+class MarketDataDaemon:
+    def __init__(
+        self,
+        address = DEFAULT_ADDRESS,
+        authkey: bytes = None,
+        tickers_ttl = 1.0,
+        ohlcv_ttl = 1.0,
+        order_book_ttl = 0.5,
+        market_events_ttl = 60
+        ):
+        '''
+        authkey: None 이면 환경 변수 ATA_MARKET_DATA_AUTHKEY, 없으면 무작위로 만들어 authkey 파일에 쓴다
+        '''
+        self.address = address
+        self.authkey = authkey
+        self.ttls = {
+            'fetch_tickers': tickers_ttl,
+            'fetch_ohlcv': ohlcv_ttl,
+            'fetch_order_book': order_book_ttl,
+        }
+        self.exchange = UpbitRateLimitedClient(ccxt.upbit(config={'enableRateLimit': False}))
+        self.ohlcv_store = OHLCVStore(self.exchange)
+        self.market_event_service = UpbitMarketEventService(ttl=market_events_ttl, limiter=self.exchange.limiter)
+
+        self.__cache: dict[tuple, tuple[float, object]] = {}
+        self.__key_locks: dict[tuple, threading.Lock] = {}
+        self.__lock = threading.Lock()
+        self.__listener: Listener = None
+
+    def serve_forever(self):
+        if not is_pipe(self.address):
+            make_private_dir(os.path.dirname(os.path.abspath(self.address)))
+            if os.path.exists(self.address):
+                os.remove(self.address)
+        if self.authkey is None:
+            self.authkey = os.environ.get(AUTHKEY_ENV, '').encode() or self.__write_authkey()
+        self.__listener = Listener(self.address, authkey=self.authkey)
+        if not is_pipe(self.address):
+            os.chmod(self.address, 0o600)
+        log(f'market data daemon listening on {self.address}')
+        try:
+            while True:
+                try:
+                    conn = self.__listener.accept()
+                except OSError:
+                    break
+                except Exception as e:
+                    log(f'market data daemon accept fail: {e}')
+                    continue
+                threading.Thread(target=self.__serve, args=(conn,), daemon=True).start()
+        finally:
+            self.close()
+
+    def close(self):
+        if self.__listener is not None:
+            self.__listener.close()
+            self.__listener = None
+
+    def __write_authkey(self) -> bytes:
+        make_private_dir(DEFAULT_DIR if is_pipe(self.address) else os.path.dirname(os.path.abspath(self.address)))
+        authkey = secrets.token_hex(32).encode()
+        path = authkey_path(self.address)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            os.chmod(path, 0o600)
+            f.write(authkey)
+        return authkey
+
+    def __serve(self, conn):
+        with conn:
+            while True:
+                try:
+                    request = json.loads(conn.recv_bytes())
+                except (EOFError, OSError):
+                    return
+                except ValueError as e:
+                    request = None
+                    response = {'status': 'error', 'type': 'ValueError', 'message': f'invalid request: {e}'}
+                if request is not None:
+                    try:
+                        response = {'status': 'ok', 'result': self.__handle(request['method'], request['args'])}
+                    except Exception as e:
+                        response = {'status': 'error', 'type': type(e).__name__, 'message': str(e)}
+                try:
+                    conn.send_bytes(json.dumps(response).encode())
+                except (EOFError, OSError):
+                    return
+
+    def __handle(self, method, args):
+        if method == 'fetch_tickers':
+            return self.__cached(('fetch_tickers',), self.exchange.fetch_tickers)
+        if method == 'fetch_order_book':
+            symbol, = args
+            return self.__cached(('fetch_order_book', symbol), lambda: self.exchange.fetch_order_book(symbol=symbol))
+        if method == 'fetch_ohlcv':
+            symbol, timeframe, since, limit = args
+            candles = self.__cached(('fetch_ohlcv', symbol, timeframe), lambda: self.__refresh_ohlcv(symbol, timeframe))
+            if since is not None:
+                candles = [candle for candle in candles if candle[0] >= since]
+            if limit is not None:
+                candles = candles[-limit:]
+            return candles
+        if method == 'get_market_events':
+            return self.market_event_service.get()
+        raise ValueError(f'unknown method: {method}')
+
+    def __refresh_ohlcv(self, symbol, timeframe):
+        self.ohlcv_store.refresh(symbol=symbol, timeframe=timeframe)
+        candles = self.ohlcv_store.get_candles(symbol, timeframe)
+        return [] if candles is None else candles
+
+    def __cached(self, key, fetch):
+        # 같은 키의 동시 요청은 한 번만 업비트에 요청
+        with self.__lock:
+            key_lock = self.__key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            cached = self.__cache.get(key)
+            if cached is not None and time.monotonic() - cached[0] < self.ttls[key[0]]:
+                return cached[1]
+            value = fetch()
+            self.__cache[key] = (time.monotonic(), value)
+            return value
+
+
+class MarketDataClient:
+    '''
+    MarketDataDaemon 에 요청하는 클라이언트
+    ccxt 의 시세 조회 메서드와 같은 이름을 사용하므로 UpbitExchange, UpbitExchangeSimulator 에서 ccxt 대신 시세 조회에 사용할 수 있다.
+    스레드마다 연결을 따로 만든다.
+    '''
+    def __init__(
+        self,
+        address = DEFAULT_ADDRESS,
+        authkey: bytes = None
+        ):
+        '''
+        authkey: None 이면 연결할 때마다 load_authkey (데몬이 재시작하면서 새로 만든 authkey 를 사용)
+        '''
+        self.address = address
+        self.authkey = authkey
+        self.__local = threading.local()
+
+    def fetch_tickers(self):
+        return self.__request('fetch_tickers')
+
+    def fetch_ohlcv(self, symbol, timeframe = '1m', since = None, limit = None):
+        return self.__request('fetch_ohlcv', symbol, timeframe, since, limit)
+
+    def fetch_order_book(self, symbol):
+        return self.__request('fetch_order_book', symbol)
+
+    def get_market_events(self):
+        return self.__request('get_market_events')
+
+    def milliseconds(self):
+        return int(time.time() * 1000)
+
+    def __request(self, method, *args):
+        conn = getattr(self.__local, 'conn', None)
+        if conn is None:
+            authkey = self.authkey if self.authkey is not None else load_authkey(self.address)
+            conn = Client(self.address, authkey=authkey)
+            self.__local.conn = conn
+        try:
+            conn.send_bytes(json.dumps({'method': method, 'args': args}).encode())
+            response = json.loads(conn.recv_bytes())
+        except (EOFError, OSError):
+            # 데몬이 재시작된 경우 다음 요청에서 다시 연결
+            self.__local.conn = None
+            conn.close()
+            raise
+        if response['status'] == 'error':
+            raise _to_exception(response['type'], response['message'])
+        return response['result']
+
+
+def _to_exception(name, message) -> Exception:
+    # 데몬에서 난 ccxt / 내장 예외는 같은 종류로 다시 만든다
+    cls = getattr(ccxt, name, None) or getattr(builtins, name, None)
+    if isinstance(cls, type) and issubclass(cls, Exception):
+        return cls(message)
+    return Exception(f'{name}: {message}')
+
+
+def get_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--address',
+        type=str,
+        default=DEFAULT_ADDRESS
+    )
+
+    parser.add_argument(
+        '--market-events-ttl',
+        type=float,
+        default=60
+    )
+
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = get_args()
+    MarketDataDaemon(
+        address=args.address,
+        market_events_ttl=args.market_events_ttl
+    ).serve_forever()
@@ -0,0 +1,127 @@
+'''
+시세 기록
+실시간 세션(UpbitSimul)에서 거래소가 받은 tickers, 캔들, 호가, 종목 경고 응답을 추가만 하는 로그 파일에 기록한다.
+ReplayExchange 가 같은 응답을 같은 순서로 다시 돌려주므로 같은 에이전트를 실시간보다 빠르게 반복 실행할 수 있다.
+
+로그: gzip 으로 압축한 pickle 레코드의 나열, 이전 값과 달라진 것만 기록
+    ('init',)                                         거래소 init, 이후 레코드는 이전 값과 비교하지 않고 다시 기록 (재생도 이때 초기화)
+    ('tick', time, tickers, removed, market_events)   update, tickers 는 바뀐 종목만, market_events 는 바뀐 경우만 (아니면 None)
+    ('ohlcv', item, timeframe, None)                  캔들 없음
+    ('ohlcv', item, timeframe, frame)                 전체 df
+    ('ohlcv', item, timeframe, (start, keep, index, values))
+                                                      이전 df 의 start 부터 keep 개 행 + 새 행 (index, values)
+    ('order_book', item, order_book)
+틱마다 flush 하므로 세션이 중간에 멈춰도 마지막 틱까지 읽을 수 있다.
+세션마다 새 파일에 기록한다. (이전 세션이 잘린 gzip member 로 끝났으면 뒤에 이어 쓴 세션을 읽을 수 없으므로 이미 있는 로그에는 이어 쓰지 않는다)
+pickle 이므로 직접 기록한 파일만 읽어야 한다.
+'''
+import gzip
+import os
+import pickle
+import threading
+import zlib
+
+import numpy as np
+import pandas as pd
+
+class MarketRecorder:
+    def __init__(
+        self,
+        file_path,
+        compresslevel = 6
+        ):
+        self.file_path = file_path
+        if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
+            raise FileExistsError(f'market record already exists: {file_path} (use a new file per session)')
+        self.__file = gzip.open(file_path, 'wb', compresslevel=compresslevel)
+        self.__lock = threading.Lock()
+        self.__tickers: dict[str, dict] = {}
+        self.__market_events = None
+        self.__frames: dict[tuple[str, str], pd.DataFrame] = {}
+        self.__order_books: dict[str, dict] = {}
+
+    def record_init(self):
+        with self.__lock:
+            # 재생은 init 에서 시세를 비우므로 이후 값은 처음부터 다시 기록
+            self.__tickers = {}
+            self.__market_events = None
+            self.__frames = {}
+            self.__order_books = {}
+            pickle.dump(('init',), self.__file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def record_tick(self, time, tickers: dict, market_events: dict):
+        with self.__lock:
+            # 이전 틱의 캔들 / 호가까지 디스크에 반영
+            self.__file.flush()
+            changed = {symbol: ticker for symbol, ticker in tickers.items() if _changed(self.__tickers.get(symbol), ticker)}
+            removed = [symbol for symbol in self.__tickers if symbol not in tickers]
+            events = market_events if _changed(self.__market_events, market_events) else None
+            self.__tickers = dict(tickers)
+            self.__market_events = market_events
+            pickle.dump(('tick', time, changed, removed, events), self.__file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def record_ohlcv(self, item, timeframe, frame: pd.DataFrame):
+        key = (item, timeframe)
+        with self.__lock:
+            previous = self.__frames.get(key)
+            if frame is previous:
+                return
+            self.__frames[key] = frame
+            data = None if frame is None else _encode_frame(previous, frame)
+            pickle.dump(('ohlcv', item, timeframe, data), self.__file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def record_order_book(self, item, order_book: dict):
+        with self.__lock:
+            if not _changed(self.__order_books.get(item), order_book):
+                return
+            self.__order_books[item] = order_book
+            pickle.dump(('order_book', item, order_book), self.__file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def close(self):
+        with self.__lock:
+            self.__file.close()
+
+
+def read_market_records(file_path):
+    '''
+    MarketRecorder 로그의 레코드를 순서대로, 기록 중 멈춘 마지막 부분은 건너뛴다
+    '''
+    with gzip.open(file_path, 'rb') as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except (EOFError, gzip.BadGzipFile, zlib.error, pickle.UnpicklingError):
+                return
+
+def apply_frame(previous: pd.DataFrame, data) -> pd.DataFrame:
+    '''
+    record_ohlcv 로 기록한 data 를 이전 df 에 반영
+    '''
+    if data is None or isinstance(data, pd.DataFrame):
+        return data
+    start, keep, index, values = data
+    return pd.DataFrame(
+        np.vstack([previous.to_numpy()[start:start + keep], values]),
+        index=previous.index[start:start + keep].append(index),
+        columns=previous.columns
+    )
+
+def _changed(previous, value) -> bool:
+    return value is not previous and value != previous
+
+def _encode_frame(previous: pd.DataFrame, frame: pd.DataFrame):
+    # 캔들은 마지막(진행 중인) 봉 이후만 바뀌므로 이전 df 와 겹치는 앞부분은 기록하지 않는다
+    if previous is None or len(frame) == 0 or len(previous) == 0 or not previous.columns.equals(frame.columns) or not previous.index.is_unique:
+        return frame
+    start = previous.index.get_indexer(frame.index[:1])[0]
+    if start < 0:
+        return frame
+    keep = min(len(previous) - 1 - start, len(frame))
+    values = frame.to_numpy()
+    if (
+        keep < 0
+        or not previous.index[start:start + keep].equals(frame.index[:keep])
+        or not np.array_equal(previous.to_numpy()[start:start + keep], values[:keep], equal_nan=True)
+    ):
+        return frame
+    return (start, keep, frame.index[keep:], values[keep:])
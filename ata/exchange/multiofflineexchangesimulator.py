@@ -0,0 +1,307 @@
+'''
+여러 종목 오프라인 시뮬레이터
+디렉토리(CandleStore 또는 종목별 캔들 csv: BTC.csv, ETH.csv, ...)의 1분봉을 같은 1분 시계로 맞춰 재생한다.
+    - 캔들이 없는 분은 직전 종가로 채운 봉(거래량 0)으로 보고, 첫 캔들 전과 마지막 캔들 후에는 거래할 수 없다 (상장 전, 상장 폐지)
+    - tickers 의 percentage(전일 종가 대비 %)와 acc_trade_price_24h(24시간 거래대금)는 매 분 증분으로 갱신한다
+    - 분봉과 호가는 요청한 종목만 원본 배열에서 잘라 만든다
+원본 배열은 CandleStore 의 memmap 을 그대로 사용하고, 시계에 맞춘 배열은 block_minutes 분씩만 만들기 때문에
+종목 수가 많아도 메모리는 (종목 수 x block_minutes) 정도만 사용한다.
+
+호가는 없으므로 마지막 1분봉으로 추정한다 (매수 잔량: 거래량 * (종가 - 저가) / (고가 - 저가), 나머지는 매도 잔량).
+'''
+import os
+
+import numpy as np
+import pandas as pd
+
+from ata.data.candlestore import TIMESTAMP, CandleSeries, CandleStore, read_candles
+from ata.exchange.baseexchangesimulator import BaseExchangeSimulator
+from ata.utils.markerorderpriceunit import upbit_price_unit
+
+MINUTE = 60 * 1000
+DAY_MINUTES = 60 * 24
+CANDLE_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+class MultiOfflineExchangeSimulator(BaseExchangeSimulator):
+    supports_bar_fill = True
+
+    def __init__(
+        self,
+        file_path,
+        balance = 100000,
+        symbols = None,
+        start = None,
+        end = None,
+        ohlcv_len = 100,
+        day_offset_hours = 9,
+        block_minutes = DAY_MINUTES,
+        fill_model = 'close',
+        volume_ratio = 1.0
+        ):
+        '''
+        file_path: CandleStore 디렉토리 또는 종목별 캔들 csv 디렉토리
+        symbols: 사용할 종목 ['BTC', 'ETH', ...], None 이면 전체
+        start, end: 재생 구간 timestamp(ms), None 이면 전체 (OfflineExchangeSimulator 와 같이 start 부터 60 * ohlcv_len 분 뒤에 거래 시작)
+        day_offset_hours: 캔들 시각 + day_offset_hours 가 0시인 분에 전일 종가를 갱신
+            캔들 시각은 UTC (CandleStore 는 csv 의 시간대 없는 KST 도 UTC 로 바꿔 저장) 이므로 업비트 KST 기준은 9
+        fill_model, volume_ratio: BaseExchangeSimulator 의 체결 방식
+        '''
+        super().__init__(balance=balance, fill_model=fill_model, volume_ratio=volume_ratio)
+        self.__series = self.__load_series(file_path, symbols)
+        assert len(self.__series) > 0, f'error: no candles in {file_path}'
+        self.symbols = sorted(self.__series.keys())
+        self.__index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.__markets = [f'{symbol}/KRW' for symbol in self.symbols]
+        self.__firsts = np.array([self.__series[symbol].first_timestamp for symbol in self.symbols], dtype=np.int64)
+        self.__lasts = np.array([self.__series[symbol].last_timestamp for symbol in self.symbols], dtype=np.int64)
+        self.__t0 = (int(self.__firsts.min()) if start is None else int(start)) // MINUTE * MINUTE
+        t_end = int(self.__lasts.max()) + MINUTE if end is None else int(end)
+        self.__n = max((t_end - self.__t0) // MINUTE, 0)
+        self.__ohlcv_len = ohlcv_len
+        self.__day_offset = int(day_offset_hours * 60 * MINUTE)
+        self.__block_minutes = block_minutes
+        # 매 틱 만드는 분봉 df 가 같이 쓰는 컬럼
+        self.__columns = pd.Index(CANDLE_COLUMNS)
+
+        self.balance = {'KRW': {'free': balance, 'used': 0, 'total': balance}}
+        if 'BTC' in self.__index:
+            # OfflineExchangeSimulator 와 같이 BTC 는 처음부터 잔고에 둔다
+            self.balance['BTC'] = {'free': 0, 'used': 0, 'total': 0}
+        self.market_events = {symbol: self.__make_market_event() for symbol in self.symbols}
+
+        n_symbols = len(self.symbols)
+        self.__block = None
+        self.__block_start = 0
+        self.__last_close = np.full(n_symbols, np.nan)
+        self.__prev_day_close = np.full(n_symbols, np.nan)
+        self.__percentage = np.full(n_symbols, np.nan)
+        # 최근 24시간 분당 거래대금과 합
+        self.__trade_prices = np.zeros((n_symbols, DAY_MINUTES))
+        self.__acc_trade_price = np.zeros(n_symbols)
+        self.__frames = {}
+        self.__candles = {}
+        self.__order_books = {}
+
+        offset = 60 * self.__ohlcv_len
+        assert offset <= self.__n, f"error: not enough offline data ({offset} {self.__n})"
+        # 거래 시작 전까지의 지표(tickers)를 미리 반영
+        self.idx = -1
+        while self.idx < offset - 2:
+            self.idx += 1
+            self.__step()
+        self.tickers = {}
+
+    def init(self):
+        return super().init()
+
+    def update(self) -> bool:
+        if self.idx + 1 >= self.__n:
+            return False
+        self.idx += 1
+        self.__step()
+        self.__frames = {}
+        self.__candles = {}
+        self.__order_books = {}
+        self.tickers = self.__make_tickers()
+        self.price_oracle.update(self.tickers)
+        return super().update()
+
+    def get_time(self):
+        return (self.__t0 + (self.idx + 1) * MINUTE) / 1000
+
+    def get_ohlcv_per_1m(self, item):
+        return self.__get_frame(item, 1)
+
+    def get_ohlcv_per_5m(self, item):
+        return self.__get_frame(item, 5)
+
+    def get_ohlcv_per_15m(self, item):
+        return self.__get_frame(item, 15)
+
+    def get_ohlcv_per_1h(self, item):
+        return self.__get_frame(item, 60)
+
+    def get_market_events(self):
+        return self.market_events
+
+    def _get_bar(self, item):
+        # update 에서 시계가 먼저 넘어가므로 마지막 1분봉은 이전 update 이후의 마감된 봉
+        ohlcv = self.get_ohlcv_per_1m(item)
+        if ohlcv is None or len(ohlcv) == 0:
+            return None
+        return ohlcv.index[-1], float(ohlcv['high'].iat[-1]), float(ohlcv['low'].iat[-1]), float(ohlcv['volume'].iat[-1])
+
+    def get_order_book(self, item):
+        if item in self.__order_books:
+            return self.__order_books[item]
+        if self.get_ohlcv_per_1m(item) is None:
+            raise KeyError(item + '/KRW')
+        _, high, low, close, volume = (float(value) for value in self.__candles[(item, 1)][-1])
+        bid = volume * (close - low) / (high - low) if high > low else volume / 2
+        order_book = {
+            'symbol': item + '/KRW',
+            'bids': [[close, bid]],
+            'asks': [[close + upbit_price_unit(item, close), volume - bid]],
+            'timestamp': int(self.get_time() * 1000)
+        }
+        self.__order_books[item] = order_book
+        return order_book
+
+    def is_listed(self, item) -> bool:
+        '''
+        현재 시각에 캔들이 있는 구간(상장 ~ 마지막 캔들)인지
+        '''
+        i = self.__index.get(item)
+        if i is None:
+            return False
+        now = self.__now()
+        return bool(self.__firsts[i] <= now <= self.__lasts[i])
+
+    def __now(self):
+        # 현재 분의 캔들 시각
+        return self.__t0 + self.idx * MINUTE
+
+    def __step(self):
+        j = self.idx - self.__block_start
+        if self.__block is None or j >= self.__block_minutes:
+            self.__load_block(self.idx)
+            j = 0
+        close = self.__block['close'][:, j]
+        volume = self.__block['volume'][:, j]
+        if (self.__now() + self.__day_offset) % (DAY_MINUTES * MINUTE) == 0:
+            # 하루의 첫 분: 직전 분까지의 종가가 전일 종가
+            self.__prev_day_close = self.__last_close.copy()
+        has_candle = ~np.isnan(close)
+        np.copyto(self.__last_close, close, where=has_candle)
+
+        # 24시간 거래대금: 새 분을 더하고 24시간 전 분을 뺀다, 하루마다 오차를 없애기 위해 다시 합산
+        position = self.idx % DAY_MINUTES
+        trade_price = np.where(has_candle, close * volume, 0.0)
+        self.__acc_trade_price += trade_price - self.__trade_prices[:, position]
+        self.__trade_prices[:, position] = trade_price
+        if position == DAY_MINUTES - 1:
+            self.__acc_trade_price = self.__trade_prices.sum(axis=1)
+
+        percentage = self.__block['percentage'][:, j]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.__percentage = np.where(np.isnan(percentage), (self.__last_close / self.__prev_day_close - 1) * 100, percentage)
+
+    def __load_block(self, start):
+        '''
+        시계의 start 부터 block_minutes 분의 close, volume, percentage (캔들이 없는 분은 nan)
+        '''
+        n_symbols = len(self.symbols)
+        self.__block_start = start
+        block = {key: np.full((n_symbols, self.__block_minutes), np.nan) for key in ['close', 'volume', 'percentage']}
+        block_t0 = self.__t0 + start * MINUTE
+        block_t1 = block_t0 + self.__block_minutes * MINUTE
+        for i, symbol in enumerate(self.symbols):
+            if self.__lasts[i] < block_t0 or self.__firsts[i] >= block_t1:
+                continue
+            arrays = self.__series[symbol].between(block_t0, block_t1, ['close', 'volume', 'percentage'])
+            positions = (arrays[TIMESTAMP] - block_t0) // MINUTE
+            for key in block:
+                if key in arrays:
+                    block[key][i, positions] = arrays[key]
+        self.__block = block
+
+    def __make_tickers(self) -> dict:
+        now = self.__now()
+        listed = (self.__firsts <= now) & (now <= self.__lasts) & ~np.isnan(self.__last_close)
+        tickers = {}
+        for i in np.flatnonzero(listed):
+            close = float(self.__last_close[i])
+            acc_trade_price = float(self.__acc_trade_price[i])
+            tickers[self.__markets[i]] = {
+                'symbol': self.__markets[i],
+                'close': close,
+                'percentage': float(self.__percentage[i]),
+                'quoteVolume': acc_trade_price,
+                'info': {'acc_trade_price_24h': acc_trade_price}
+            }
+        return tickers
+
+    def __get_frame(self, item, minute):
+        if item == 'KRW' or not self.is_listed(item):
+            return None
+        key = (item, minute)
+        if key in self.__frames:
+            return self.__frames[key]
+        i = self.__index[item]
+        if minute == 1:
+            start = self.idx - self.__ohlcv_len + 1
+        else:
+            start = (self.idx // minute - self.__ohlcv_len + 1) * minute
+        listing = -(-(int(self.__firsts[i]) - self.__t0) // MINUTE)
+        start = max(start, listing, 0)
+        candles = self.__make_candles(self.__series[item], start, minute)
+        index = pd.RangeIndex(start, self.idx + 1) if minute == 1 else pd.RangeIndex(len(candles))
+        self.__candles[key] = candles
+        self.__frames[key] = pd.DataFrame(candles, index=index, columns=self.__columns, copy=False)
+        return self.__frames[key]
+
+    def __make_candles(self, series: CandleSeries, start, minute) -> np.ndarray:
+        '''
+        시계의 start ~ idx 분 캔들을 minute 분봉으로 (마지막 봉은 진행 중)
+        return: [봉 수, CANDLE_COLUMNS]
+        '''
+        t_start = self.__t0 + start * MINUTE
+        arrays = series.between(t_start, self.__t0 + (self.idx + 1) * MINUTE, CANDLE_COLUMNS)
+        length = self.idx - start + 1
+        positions = (arrays[TIMESTAMP] - t_start) // MINUTE
+        candles = np.full((length, len(CANDLE_COLUMNS)), np.nan)
+        for j, key in enumerate(CANDLE_COLUMNS):
+            candles[positions, j] = arrays[key]
+
+        # 캔들이 없는 분: 직전 종가로 채우고 거래량 0
+        missing = np.isnan(candles[:, 3])
+        if missing.any():
+            seed = series.last_before(t_start)
+            last_valid = np.maximum.accumulate(np.where(missing, -1, np.arange(length)))
+            filled = np.where(last_valid >= 0, candles[np.maximum(last_valid, 0), 3], np.nan if seed is None else seed)
+            candles[missing, :4] = filled[missing, None]
+            candles[missing, 4] = 0.0
+
+        if minute == 1:
+            return candles
+        groups = np.arange(start, self.idx + 1) // minute
+        starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+        ends = np.r_[starts[1:] - 1, length - 1]
+        return np.column_stack([
+            candles[starts, 0],
+            np.maximum.reduceat(candles[:, 1], starts),
+            np.minimum.reduceat(candles[:, 2], starts),
+            candles[ends, 3],
+            np.add.reduceat(candles[:, 4], starts)
+        ])
+
+    @staticmethod
+    def __load_series(file_path, symbols) -> dict[str, CandleSeries]:
+        series = {}
+        csv_files = sorted(name for name in os.listdir(file_path) if name.lower().endswith('.csv'))
+        if len(csv_files) > 0:
+            # 종목별 csv 디렉토리
+            for name in csv_files:
+                symbol = os.path.splitext(name)[0].upper()
+                if symbols is None or symbol in symbols:
+                    series[symbol] = CandleSeries.from_frame(read_candles(os.path.join(file_path, name)))
+        else:
+            store = CandleStore(file_path)
+            for symbol in store.symbols():
+                if (symbols is None or symbol in symbols) and len(store.partitions(symbol, '1m')) > 0:
+                    series[symbol] = store.series(symbol, '1m')
+        return {symbol: value for symbol, value in series.items() if len(value) > 0}
+
+    @staticmethod
+    def __make_market_event():
+        return {
+            'warning': False,
+            'caution':
+            {
+                'CONCENTRATION_OF_SMALL_ACCOUNTS': False,
+                'DEPOSIT_AMOUNT_SOARING': False,
+                'GLOBAL_PRICE_DIFFERENCES': False,
+                'PRICE_FLUCTUATIONS': False,
+                'TRADING_VOLUME_SOARING': False
+            },
+        }
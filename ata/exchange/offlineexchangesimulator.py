@@ -1,20 +1,42 @@
+import numpy as np
 import pandas as pd
 
+from ata.data.candlestore import read_candles
 from ata.exchange.baseexchangesimulator import BaseExchangeSimulator
+from ata.utils.ohlcvbuffer import OHLCVBuffer
+
+def load_offline_data(data: pd.DataFrame) -> pd.DataFrame:
+    '''
+    캔들 csv 의 df 를 시뮬레이터 형식으로 ('baseVolume' -> 'volume'), 이미 바뀐 df 는 그대로 반환
+    '''
+    if 'baseVolume' in data.columns:
+        data = data.rename(columns={"baseVolume": "volume"})
+    return data
 
 class OfflineExchangeSimulator(BaseExchangeSimulator):
+    supports_bar_fill = True
+
     def __init__(
         self,
-        file_path,
-        balance = 100000
+        file_path = None,
+        balance = 100000,
+        data: pd.DataFrame = None,
+        fill_model = 'close',
+        volume_ratio = 1.0
         ):
-        super().__init__(balance=balance)
-        try:
-            self.data = pd.read_csv(file_path)
-            self.data = self.data.rename(columns={"baseVolume": "volume"})
-        except Exception as e:
-            print(f"Data file read error: {e}")
-            quit()
+        '''
+        file_path: 캔들 csv 또는 CandleStore 디렉토리
+        data: file_path 대신 이미 읽은 df, 복사하지 않고 읽기만 한다 (여러 시뮬레이터가 같은 df 를 공유)
+        fill_model, volume_ratio: BaseExchangeSimulator 의 체결 방식
+        '''
+        super().__init__(balance=balance, fill_model=fill_model, volume_ratio=volume_ratio)
+        if data is None:
+            try:
+                data = read_candles(file_path)
+            except Exception as e:
+                print(f"Data file read error: {e}")
+                quit()
+        self.data = load_offline_data(data)
         
         self.balance = {
                 'KRW': {'free': balance, 'used': 0, 'total': balance},
@@ -27,6 +49,15 @@ class OfflineExchangeSimulator(BaseExchangeSimulator):
         assert offset <= len(self.data), f"error: not enough offline data ({offset} {len(self.data)})"
         self.idx = offset - 2
         
+        # 5분, 15분, 1시간봉은 처음에 한 번만 계산해 두고 매 틱에는 마지막 봉만 버퍼에 반영한다
+        # 버퍼는 진행 중인 봉을 포함한 최근 self.__ohlcv_len 개 봉
+        # 이전의 groupby 는 최근 minute * self.__ohlcv_len 분을 잘라서 묶었기 때문에 구간이 봉 경계에서 시작하지 않으면
+        # 앞에 그 봉의 뒷부분 분만 담긴 봉이 하나 더 있었다 (시가, 거래량이 실제 봉과 다름). 그 봉은 만들지 않는다
+        self.__bars = {minute: self.__precompute_bars(minute) for minute in (5, 15, 60)}
+        self.__bars[1] = {key: self.data[key].to_numpy(dtype=np.float64) for key in ['open', 'high', 'low', 'close', 'volume']}
+        self.__buffers: dict[int, OHLCVBuffer] = {}
+        self.__buffer_idx = None
+        
     def init(self):
         return super().init()
     
@@ -35,53 +66,95 @@ class OfflineExchangeSimulator(BaseExchangeSimulator):
         if len(self.data) <= self.idx:
             return False
         
-        self.ohlcvs_1m = {'BTC/KRW':self.data.iloc[self.idx + 1 - self.__ohlcv_len:self.idx + 1].copy()}
-        self.ohlcvs_5m = {'BTC/KRW':self.__to_per_minute(5)}
-        self.ohlcvs_15m = {'BTC/KRW':self.__to_per_minute(15)}
-        self.ohlcvs_1h = {'BTC/KRW':self.__to_per_minute(60)}
+        self.__update_buffers()
         self.tickers = {'BTC/KRW': self.data.iloc[self.idx]}
-        
+        self.price_oracle.update(self.tickers)
         
         return super().update()
 
     def get_ohlcv_per_1m(self, item):
         if item == 'KRW':
             return None
-        return self.ohlcvs_1m[item+'/KRW']
+        return self.__get_frame(item, 1)
     
     def get_ohlcv_per_5m(self, item):
         if item == 'KRW':
             return None
-        return self.ohlcvs_5m[item+'/KRW']
+        return self.__get_frame(item, 5)
     
     def get_ohlcv_per_15m(self, item):
         if item == 'KRW':
             return None
-        return self.ohlcvs_15m[item+'/KRW']
+        return self.__get_frame(item, 15)
     
     def get_ohlcv_per_1h(self, item):
         if item == 'KRW':
             return None
-        return self.ohlcvs_1h[item+'/KRW']
+        return self.__get_frame(item, 60)
     
     def get_time(self):
         return (self.idx + 1) * 60
     
-    def __to_per_minute(self, minute):
-        columns_to_resample = ['open', 'high', 'low', 'close', 'volume']
-        temp_data = self.data[columns_to_resample].iloc[max(self.idx + 1 - (minute * self.__ohlcv_len), 0):self.idx + 1]
-        group = temp_data.index // minute
-        return (
-            temp_data
-            .groupby(group)
-            .agg({
-                'open': 'first',
-                'high': 'max',
-                'low': 'min',
-                'close': 'last',
-                'volume': 'sum'
-        }).reset_index(drop=True)).copy()  # 그룹 컬럼 제거
+    def get_ohlcv_buffer(self, item, minute = 1) -> OHLCVBuffer:
+        if item != 'BTC':
+            raise KeyError(item + '/KRW')
+        return self.__buffers[minute]
+    
+    def _get_bar(self, item):
+        # 버퍼의 마지막 1분봉과 같은 값을 원본 배열에서 바로 읽는다
+        if item != 'BTC':
+            return None
+        bars = self.__bars[1]
+        return self.idx, bars['high'][self.idx], bars['low'][self.idx], bars['volume'][self.idx]
+    
+    def __get_frame(self, item, minute):
+        # 버퍼가 바뀌지 않았다면 같은 df 를 사용
+        return self.get_ohlcv_buffer(item, minute).frame
+    
+    def __update_buffers(self):
+        # 1분봉의 timestamp 는 원본 데이터의 행 번호, 나머지는 봉 번호
+        if self.__buffer_idx is None or self.idx != self.__buffer_idx + 1:
+            # 처음이거나 틱을 건너뛴 경우 구간 전체를 다시 채운다
+            for minute, bars in self.__bars.items():
+                if minute == 1:
+                    positions = np.arange(self.idx + 1 - self.__ohlcv_len, self.idx + 1)
+                    buffer = OHLCVBuffer(capacity=self.__ohlcv_len, frame_index='timestamp')
+                else:
+                    group = self.idx // minute
+                    first_end = max(group - self.__ohlcv_len + 1, 0) * minute + minute - 1
+                    positions = np.append(np.arange(first_end, self.idx, minute), self.idx)
+                    buffer = OHLCVBuffer(capacity=self.__ohlcv_len, frame_index='range')
+                for position in positions:
+                    buffer.append(position // minute, *(bars[key][position] for key in ['open', 'high', 'low', 'close', 'volume']))
+                self.__buffers[minute] = buffer
+        else:
+            for minute, bars in self.__bars.items():
+                self.__buffers[minute].push(self.idx // minute, *(bars[key][self.idx] for key in ['open', 'high', 'low', 'close', 'volume']))
+        self.__buffer_idx = self.idx
+    
+    def __precompute_bars(self, minute):
+        '''
+        i 번째 값은 i 분까지 반영된(진행중인) minute 분봉
+        완성된 봉은 각 그룹의 마지막 분의 값과 같다
+        '''
+        n = len(self.data)
+        pad = (-n) % minute
+        def grouped(column, pad_value):
+            values = self.data[column].to_numpy(dtype=np.float64)
+            return np.concatenate([values, np.full(pad, pad_value)]).reshape(-1, minute)
         
+        bars = {
+            'open': np.repeat(grouped('open', np.nan)[:, 0], minute),
+            'high': np.maximum.accumulate(grouped('high', -np.inf), axis=1),
+            'low': np.minimum.accumulate(grouped('low', np.inf), axis=1),
+            'close': grouped('close', np.nan),
+            'volume': np.cumsum(grouped('volume', 0), axis=1),
+        }
+        for key in bars:
+            bars[key] = bars[key].ravel()[:n]
+            bars[key].flags.writeable = False
+        return bars
+    
     def get_market_events(self):
         return {
             'BTC': 
@@ -0,0 +1,90 @@
+import pandas as pd
+
+from ata.utils.ohlcvbuffer import OHLCVBuffer
+
+TIMEFRAME_MS = {
+    '1m': 60 * 1000,
+    '5m': 5 * 60 * 1000,
+    '15m': 15 * 60 * 1000,
+    '1h': 60 * 60 * 1000,
+}
+
+class OHLCVStore:
+    '''
+    (symbol, timeframe) 별 캔들을 계속 유지하는 저장소
+    마지막으로 저장된 캔들 이후의 캔들만 받아오고, 아직 끝나지 않은 마지막 캔들은 새 값으로 덮어쓴다.
+    캔들은 OHLCVBuffer 에 보관한다.
+    '''
+    def __init__(
+        self,
+        exchange,
+        maxlen = 200
+        ):
+        self.exchange = exchange
+        self.maxlen = maxlen
+        self.__buffers: dict[tuple[str, str], OHLCVBuffer] = {}
+
+    def refresh(self, symbol, timeframe) -> pd.DataFrame:
+        '''
+        새 캔들을 반영한 df 반환, 캔들이 없으면 None
+        캔들이 바뀌기 전까지는 같은 df 를 반환한다
+        '''
+        buffer = self.refresh_buffer(symbol, timeframe)
+        if buffer is None:
+            return None
+        return buffer.frame
+
+    def refresh_buffer(self, symbol, timeframe) -> OHLCVBuffer:
+        key = (symbol, timeframe)
+        buffer = self.__buffers.get(key)
+        if buffer is not None:
+            since = int(buffer.last('timestamp'))
+            elapsed = (self.exchange.milliseconds() - since) // TIMEFRAME_MS[timeframe]
+            if elapsed + 1 > self.maxlen:
+                # since 이후 maxlen 개는 가장 오래된 캔들이므로 최신 캔들까지 닿지 않는다, 처음부터 다시 받는다
+                buffer = None
+        if buffer is None:
+            ohlcv = self.exchange.fetch_ohlcv(
+                symbol=symbol,
+                timeframe=timeframe,
+                limit=self.maxlen
+            )
+            if len(ohlcv) == 0:
+                # 캔들이 없는 경우 다음 요청에서 처음부터 다시 받는다
+                return None
+            buffer = OHLCVBuffer.from_ohlcv(ohlcv, capacity=self.maxlen, frame_index='datetime')
+            self.__buffers[key] = buffer
+            return buffer
+
+        # 마지막 캔들(진행중)부터 현재까지의 캔들만 요청
+        ohlcv = self.exchange.fetch_ohlcv(
+            symbol=symbol,
+            timeframe=timeframe,
+            since=since,
+            limit=int(max(elapsed + 1, 1))
+        )
+        for candle in ohlcv:
+            if candle[0] >= since:
+                buffer.push(*candle)
+        return buffer
+
+    def get(self, symbol, timeframe) -> pd.DataFrame:
+        buffer = self.__buffers.get((symbol, timeframe))
+        if buffer is None:
+            return None
+        return buffer.frame
+
+    def get_buffer(self, symbol, timeframe) -> OHLCVBuffer:
+        return self.__buffers.get((symbol, timeframe))
+
+    def get_candles(self, symbol, timeframe) -> list:
+        '''
+        [[timestamp, open, high, low, close, volume], ...] 형식의 캔들 목록
+        '''
+        buffer = self.__buffers.get((symbol, timeframe))
+        if buffer is None:
+            return None
+        return [[int(candle[0])] + candle[1:] for candle in buffer.tolist()]
+
+    def clear(self):
+        self.__buffers.clear()
@@ -0,0 +1,48 @@
+import numpy as np
+
+class OrderBookSnapshot:
+    '''
+    호가(ccxt fetch_order_book 형식)를 numpy 배열로 바꾸고 자주 쓰는 지표를 한 번만 계산해 둔다.
+    bid_volume, ask_volume: 매수벽, 매도벽 (전체 잔량)
+    weighted_bid_volume, weighted_ask_volume: 최우선 호가에 가까울수록 큰 가중치(1 / 호가 순위)를 준 잔량
+    imbalance: bid_volume / ask_volume
+    weighted_imbalance: weighted_bid_volume / weighted_ask_volume
+    '''
+    __slots__ = (
+        'order_book', 'bid_prices', 'bid_sizes', 'ask_prices', 'ask_sizes',
+        'bid_volume', 'ask_volume', 'weighted_bid_volume', 'weighted_ask_volume',
+        'imbalance', 'weighted_imbalance'
+    )
+
+    def __init__(self, order_book):
+        self.order_book = order_book
+        bids = self.__to_array(order_book['bids'])
+        asks = self.__to_array(order_book['asks'])
+        self.bid_prices = bids[:, 0]
+        self.bid_sizes = bids[:, 1]
+        self.ask_prices = asks[:, 0]
+        self.ask_sizes = asks[:, 1]
+
+        self.bid_volume = float(self.bid_sizes.sum())
+        self.ask_volume = float(self.ask_sizes.sum())
+        self.weighted_bid_volume = float(self.bid_sizes @ self.__depth_weights(len(self.bid_sizes)))
+        self.weighted_ask_volume = float(self.ask_sizes @ self.__depth_weights(len(self.ask_sizes)))
+        self.imbalance = self.__ratio(self.bid_volume, self.ask_volume)
+        self.weighted_imbalance = self.__ratio(self.weighted_bid_volume, self.weighted_ask_volume)
+
+    @staticmethod
+    def __to_array(levels):
+        array = np.asarray(levels, dtype=np.float64)
+        if array.size == 0:
+            return np.zeros((0, 2))
+        return array[:, :2]
+
+    @staticmethod
+    def __depth_weights(n):
+        return 1.0 / np.arange(1, n + 1)
+
+    @staticmethod
+    def __ratio(a, b):
+        if b == 0:
+            return np.inf if a > 0 else 0.0
+        return a / b
@@ -0,0 +1,63 @@
+class OrderManager:
+    '''
+    주문 상태를 한 곳에서 관리
+    루프마다 refresh() 에서 미체결 주문을 fetch_open_orders 한 번으로 갱신하고,
+    미체결 목록에서 사라진 주문만 fetch_closed_orders / fetch_canceled_orders 로 확인한다.
+    종료된 주문은 더 바뀌지 않으므로 다시 조회하지 않고, get() 은 메모리에서 반환한다.
+    '''
+    def __init__(
+        self,
+        exchange,
+        on_update = None
+        ):
+        self.exchange = exchange
+        # 주문이 갱신될 때마다 호출 (ex: BalanceLedger.apply_order)
+        self.on_update = on_update
+        self.__orders: dict[str, dict] = {}
+        self.__open_ids: set[str] = set()
+        self.__stale_ids: set[str] = set()
+
+    def track(self, order):
+        self.__set(order)
+
+    def get(self, order_id) -> dict:
+        if order_id not in self.__orders or order_id in self.__stale_ids:
+            self.__set(self.exchange.fetch_order(id=order_id))
+        return self.__orders[order_id]
+
+    def mark_stale(self, order_id):
+        '''
+        취소 요청처럼 상태가 곧 바뀌는 주문은 다음 get() 에서 다시 조회
+        '''
+        self.__stale_ids.add(order_id)
+
+    def refresh(self):
+        if len(self.__open_ids) == 0:
+            return
+        open_ids = set(self.__open_ids)
+        for order in self.exchange.fetch_open_orders():
+            if order['id'] in self.__orders:
+                self.__set(order)
+                open_ids.discard(order['id'])
+
+        # 미체결 목록에서 사라진 주문은 체결 또는 취소된 주문
+        for fetch in (self.exchange.fetch_closed_orders, self.exchange.fetch_canceled_orders):
+            if len(open_ids) == 0:
+                break
+            for order in fetch():
+                if order['id'] in open_ids:
+                    self.__set(order)
+                    open_ids.discard(order['id'])
+        for order_id in open_ids:
+            self.__set(self.exchange.fetch_order(id=order_id))
+
+    def __set(self, order):
+        order_id = order['id']
+        self.__orders[order_id] = order
+        self.__stale_ids.discard(order_id)
+        if order['status'] == 'open':
+            self.__open_ids.add(order_id)
+        else:
+            self.__open_ids.discard(order_id)
+        if self.on_update is not None:
+            self.on_update(order)
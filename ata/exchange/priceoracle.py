@@ -0,0 +1,41 @@
+class PriceOracle:
+    '''
+    tickers 로 받은 현재가를 보관
+    update() 이후 max_staleness 초가 지난 가격은 반환하지 않는다.
+    clock: 현재 시각(초)을 반환하는 함수, 거래소의 get_time 을 사용하므로 오프라인 / 재생에서는 가상 시계 기준
+    version 은 가격이 하나라도 바뀔 때마다 증가하므로 가격으로 계산한 값의 캐시 키로 사용할 수 있다.
+    '''
+    def __init__(
+        self,
+        clock,
+        max_staleness = 10
+        ):
+        self.clock = clock
+        self.max_staleness = max_staleness
+        self.version = 0
+        self.__prices: dict[str, float] = {}
+        self.__updated_at = None
+
+    def update(self, tickers):
+        changed = False
+        for symbol, ticker in tickers.items():
+            if not symbol.endswith('/KRW'):
+                continue
+            price = ticker['last'] if 'last' in ticker else ticker['close']
+            if price is None:
+                continue
+            item = symbol.split('/')[0]
+            if self.__prices.get(item) != price:
+                self.__prices[item] = price
+                changed = True
+        if changed:
+            self.version += 1
+        self.__updated_at = self.clock()
+
+    def is_fresh(self) -> bool:
+        return self.__updated_at is not None and self.clock() - self.__updated_at <= self.max_staleness
+
+    def get(self, item):
+        if not self.is_fresh():
+            return None
+        return self.__prices.get(item)
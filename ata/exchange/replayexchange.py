@@ -0,0 +1,104 @@
+'''
+기록 재생 거래소
+MarketRecorder 로 기록한 실시간 세션의 응답을 틱 단위로 다시 돌려준다.
+주문 체결은 UpbitExchangeSimulator 와 같이 BaseExchangeSimulator 가 처리하므로 같은 에이전트, 같은 기록이면 결과가 항상 같다.
+get_time 은 기록된 틱 시각(가상 시계)이고 기다리지 않으므로 기록 시간보다 훨씬 빠르게 실행된다.
+
+기록에 없는 캔들 / 호가(에이전트 설정이 달라서 새로 요청한 종목)는 그 시점까지 마지막으로 기록된 값, 한 번도 없으면 None / KeyError.
+기록된 init 을 만나면 tickers, 캔들, 호가, 종목 경고를 비운다. (기록한 세션의 거래소가 다시 init 된 시점)
+'''
+from ata.exchange.baseexchangesimulator import BaseExchangeSimulator
+from ata.exchange.marketrecorder import apply_frame, read_market_records
+
+class ReplayExchange(BaseExchangeSimulator):
+    def __init__(
+        self,
+        file_path,
+        balance = 100000,
+        fill_model = 'close',
+        volume_ratio = 1.0
+        ):
+        '''
+        fill_model, volume_ratio: BaseExchangeSimulator 의 체결 방식 (기록한 세션과 달라도 됨)
+        '''
+        super().__init__(balance=balance, fill_model=fill_model, volume_ratio=volume_ratio)
+        self.file_path = file_path
+        self.tickers = {}
+        self.market_events = {}
+        self.__records = read_market_records(file_path)
+        self.__next = next(self.__records, None)
+        self.__time = None
+        self.__frames = {}
+        self.__order_books = {}
+
+    def init(self):
+        # 기록한 UpbitExchangeSimulator.init 과 같이 update 를 두 번 (init 기록 이후의 두 틱)
+        if self.__next is not None and self.__next[0] == 'init':
+            self.__reset_market()
+            self.__next = next(self.__records, None)
+        self.update()
+        return super().init()
+
+    def update(self) -> bool:
+        if not self.__read_tick():
+            return False
+        self.price_oracle.update(self.tickers)
+        return super().update()
+
+    def get_ohlcv_per_1m(self, item):
+        return self.__frames.get((item, '1m'))
+
+    def get_ohlcv_per_5m(self, item):
+        return self.__frames.get((item, '5m'))
+
+    def get_ohlcv_per_15m(self, item):
+        return self.__frames.get((item, '15m'))
+
+    def get_ohlcv_per_1h(self, item):
+        return self.__frames.get((item, '1h'))
+
+    def get_time(self):
+        return self.__time
+
+    def get_market_events(self):
+        return self.market_events
+
+    def get_order_book(self, item):
+        return self.__order_books[item]
+
+    def __read_tick(self) -> bool:
+        '''
+        다음 틱과 그 틱 동안 기록된 캔들 / 호가를 반영, 기록이 끝났으면 False
+        '''
+        while self.__next is not None and self.__next[0] != 'tick':
+            if self.__next[0] == 'init':
+                self.__reset_market()
+            self.__next = next(self.__records, None)
+        if self.__next is None:
+            return False
+        _, self.__time, changed, removed, market_events = self.__next
+        tickers = dict(self.tickers)
+        for symbol in removed:
+            tickers.pop(symbol, None)
+        tickers.update(changed)
+        self.tickers = tickers
+        if market_events is not None:
+            self.market_events = market_events
+
+        self.__next = next(self.__records, None)
+        while self.__next is not None and self.__next[0] not in ('tick', 'init'):
+            record = self.__next
+            if record[0] == 'ohlcv':
+                _, item, timeframe, data = record
+                self.__frames[(item, timeframe)] = apply_frame(self.__frames.get((item, timeframe)), data)
+            elif record[0] == 'order_book':
+                _, item, order_book = record
+                self.__order_books[item] = order_book
+            self.__next = next(self.__records, None)
+        return True
+
+    def __reset_market(self):
+        self.tickers = {}
+        self.market_events = {}
+        self.__frames = {}
+        self.__order_books = {}
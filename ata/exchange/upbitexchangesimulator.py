@@ -1,20 +1,47 @@
 import ccxt
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, wait
 import time
-import requests
 
 from ata.exchange.baseexchangesimulator import BaseExchangeSimulator
+from ata.exchange.marketdatadaemon import MarketDataClient
+from ata.exchange.marketrecorder import MarketRecorder
+from ata.exchange.ohlcvstore import OHLCVStore
+from ata.exchange.upbitmarketevents import UpbitMarketEventService
+from ata.exchange.upbitratelimitedclient import UPBIT_RATE_LIMITS, UpbitRateLimitedClient
+from ata.exchange.upbitwebsocketfeed import UpbitWebSocketFeed
 from ata.utils.log import log, save_log
+from ata.utils.ratelimiter import RateLimiter
 
 class UpbitExchangeSimulator(BaseExchangeSimulator):
     def __init__(
         self,
         file_path,
-        balance = 100000
+        balance = 100000,
+        feed: UpbitWebSocketFeed = None,
+        market_data_client: MarketDataClient = None,
+        max_workers = 8,
+        market_events_ttl = 60,
+        recorder: MarketRecorder = None,
+        fill_model = 'close',
+        volume_ratio = 1.0
         ):
-        super().__init__(balance=balance)
+        '''
+        recorder: 받은 시세를 기록 (ReplayExchange 로 재생)
+        fill_model, volume_ratio: BaseExchangeSimulator 의 체결 방식
+        '''
+        super().__init__(balance=balance, fill_model=fill_model, volume_ratio=volume_ratio)
         self.file_path = file_path
+        self.feed = feed
+        # 시세 데몬을 사용하는 경우 시세 조회는 데몬에, 주문/잔고 조회는 업비트에 요청
+        self.market_data_client = market_data_client
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.market_events_ttl = market_events_ttl
+        self.market_event_service: UpbitMarketEventService = None
+        # init 을 다시 호출해도 같은 토큰 버킷으로 업비트 요청 수를 센다
+        self.limiter = RateLimiter(UPBIT_RATE_LIMITS)
         self.exchange: ccxt.upbit = None
+        self.ohlcv_store: OHLCVStore = None
+        self.recorder = recorder
     
     def init(self):
         log('init upbit exchange...')
@@ -25,16 +52,30 @@ class UpbitExchangeSimulator(BaseExchangeSimulator):
                     api_key = lines[0].strip()
                     api_secret = lines[1].strip()
 
-                self.exchange = ccxt.upbit(config={
+                # 요청 제한은 업비트 요청 그룹별 토큰 버킷으로 관리
+                self.exchange = UpbitRateLimitedClient(ccxt.upbit(config={
                     'apiKey': api_key,
                     'secret': api_secret,
-                    'enableRateLimit': True
+                    'enableRateLimit': False
                     }
-                )
+                ), limiter=self.limiter)
                 self.exchange.options['createMarketBuyOrderRequiresPrice'] = False
+                self.market_data = self.exchange if self.market_data_client is None else self.market_data_client
+                # 에이전트는 예외가 날 때마다 init 을 다시 호출하므로 받아 둔 캔들은 유지한다
+                if self.ohlcv_store is None:
+                    self.ohlcv_store = OHLCVStore(self.market_data)
+                else:
+                    self.ohlcv_store.exchange = self.market_data
+                if self.market_event_service is None:
+                    self.market_event_service = UpbitMarketEventService(ttl=self.market_events_ttl, limiter=self.limiter)
                 break
             except:
                 log('login fail')
+        if self.feed is not None:
+            markets = self.exchange.load_markets()
+            self.feed.start([symbol for symbol in markets if symbol.endswith('/KRW')])
+        if self.recorder is not None:
+            self.recorder.record_init()
         self.update()
         log('done')       
         return super().init()
@@ -44,95 +85,97 @@ class UpbitExchangeSimulator(BaseExchangeSimulator):
         self.ohlcvs_5m = {}
         self.ohlcvs_15m = {}
         self.ohlcvs_1h = {}
+        self.order_books = {}
         self.market_events = self.__get_market_events()
-        self.tickers = self.exchange.fetch_tickers()
+        self.tickers = self.__fetch_tickers()
+        now = self.get_time()
+        if self.recorder is not None:
+            self.recorder.record_tick(now, self.tickers, self.market_events)
+        self.price_oracle.update(self.tickers)
         
         return super().update()
 
+    def prefetch(self, items, order_book = False):
+        # 후보 수가 늘어도 루프 시간이 늘지 않도록 동시에 요청하고, 요청 수는 UpbitRateLimitedClient 가 제한한다
+        futures = []
+        for item in items:
+            if item == 'KRW':
+                continue
+            futures.append(self.executor.submit(self.get_ohlcv_per_1m, item))
+            if order_book:
+                futures.append(self.executor.submit(self.__prefetch_order_book, item))
+        wait(futures)
+    
     def get_ohlcv_per_1m(self, item):
-        if not item in self.ohlcvs_1m:
-            try:
-                ohlcv = self.exchange.fetch_ohlcv(
-                    symbol=f'{item}/KRW',
-                    timeframe='1m'
-                )
-                self.ohlcvs_1m[item] = self.__preprocess_ohlcv(ohlcv)
-            except:
-                return None
-        return self.ohlcvs_1m[item]
+        return self.__get_ohlcv(item, '1m', self.ohlcvs_1m)
     
     def get_ohlcv_per_5m(self, item):
-        if not item in self.ohlcvs_5m:
-            try:
-                ohlcv = self.exchange.fetch_ohlcv(
-                    symbol=f'{item}/KRW',
-                    timeframe='5m'
-                )
-                self.ohlcvs_5m[item] = self.__preprocess_ohlcv(ohlcv)
-            except:
-                return None
-        return self.ohlcvs_5m[item]
+        return self.__get_ohlcv(item, '5m', self.ohlcvs_5m)
     
     def get_ohlcv_per_15m(self, item):
-        if not item in self.ohlcvs_15m:
-            try:
-                ohlcv = self.exchange.fetch_ohlcv(
-                    symbol=f'{item}/KRW',
-                    timeframe='15m'
-                )
-                self.ohlcvs_15m[item] = self.__preprocess_ohlcv(ohlcv)
-            except:
-                return None
-        return self.ohlcvs_15m[item]
+        return self.__get_ohlcv(item, '15m', self.ohlcvs_15m)
     
     def get_ohlcv_per_1h(self, item):
-        if not item in self.ohlcvs_1h:
-            try:
-                ohlcv = self.exchange.fetch_ohlcv(
-                    symbol=f'{item}/KRW',
-                    timeframe='1h'
-                )
-                self.ohlcvs_1h[item] = self.__preprocess_ohlcv(ohlcv)
-            except:
-                return None
-        return self.ohlcvs_1h[item]
+        return self.__get_ohlcv(item, '1h', self.ohlcvs_1h)
     
     def get_time(self):
         return time.time()
     
-    def __preprocess_ohlcv(self, ohlcv):
-        df = pd.DataFrame(ohlcv, columns=['datetime', 'open', 'high', 'low', 'close', 'volume'])
-        pd_ts = pd.to_datetime(df['datetime'], utc=True, unit='ms')     # unix timestamp to pandas Timeestamp
-        pd_ts = pd_ts.dt.tz_convert("Asia/Seoul")                       # convert timezone
-        pd_ts = pd_ts.dt.tz_localize(None)
-        df.set_index(pd_ts, inplace=True)
-        df = df[['open', 'high', 'low', 'close', 'volume']]
-        return df
+    def __fetch_tickers(self):
+        # 피드가 모든 심볼의 시세를 받기 전까지는 REST 로 조회
+        if self.feed is not None:
+            tickers = self.feed.get_tickers()
+            if len(tickers) >= len(self.feed.symbols):
+                return tickers
+        return self.market_data.fetch_tickers()
     
-    def __get_market_events(self) -> dict:
-        url = "https://api.upbit.com/v1/market/all?is_details=true"
-        headers = {"accept": "application/json"}
-        res = requests.get(url, headers=headers)
-        infos = res.json()
-        result = {}
-        for info in infos:
-            data = {
-                'warning': info['market_event']['warning'],
-                'caution':
-                {
-                    'CONCENTRATION_OF_SMALL_ACCOUNTS': info['market_event']['caution']['CONCENTRATION_OF_SMALL_ACCOUNTS'],
-                    'DEPOSIT_AMOUNT_SOARING': info['market_event']['caution']['DEPOSIT_AMOUNT_SOARING'],
-                    'GLOBAL_PRICE_DIFFERENCES': info['market_event']['caution']['GLOBAL_PRICE_DIFFERENCES'],
-                    'PRICE_FLUCTUATIONS': info['market_event']['caution']['PRICE_FLUCTUATIONS'],
-                    'TRADING_VOLUME_SOARING': info['market_event']['caution']['TRADING_VOLUME_SOARING']
-                },
-            }
-            
-            result[info['market'].split('-')[-1]] = data
-        return result
+    def __get_ohlcv(self, item, timeframe, ohlcvs):
+        # 한 루프 안에서는 같은 df 를 사용하고, 루프마다 저장소에서 새 캔들만 반영한다
+        if not item in ohlcvs:
+            try:
+                if self.feed is not None and timeframe == '1m':
+                    ohlcv = self.__get_ohlcv_from_feed(symbol=f'{item}/KRW')
+                else:
+                    ohlcv = self.ohlcv_store.refresh(symbol=f'{item}/KRW', timeframe=timeframe)
+            except:
+                ohlcv = None
+            if self.recorder is not None:
+                self.recorder.record_ohlcv(item, timeframe, ohlcv)
+            if ohlcv is None:
+                return None
+            ohlcvs[item] = ohlcv
+        return ohlcvs[item]
+    
+    def __get_ohlcv_from_feed(self, symbol):
+        # 피드는 구독 이후의 체결만 알고 있으므로 처음 한 번은 REST 캔들로 과거를 채운다
+        if not self.feed.is_seeded(symbol):
+            self.feed.seed_ohlcv(symbol, self.market_data.fetch_ohlcv(symbol=symbol, timeframe='1m'))
+        return self.feed.get_ohlcv_per_1m(symbol)
+    
+    def __get_market_events(self):
+        if self.market_data_client is not None:
+            return self.market_data_client.get_market_events()
+        return self.market_event_service.get()
     
     def get_market_events(self):
         return self.market_events
     
+    def __prefetch_order_book(self, item):
+        try:
+            self.get_order_book(item)
+        except:
+            pass
+    
     def get_order_book(self, item):
-        return self.exchange.fetch_order_book(symbol=f'{item}/KRW')
\ No newline at end of file
+        if item in self.order_books:
+            return self.order_books[item]
+        if self.feed is not None:
+            order_book = self.feed.get_order_book(f'{item}/KRW')
+            if order_book is not None:
+                if self.recorder is not None:
+                    self.recorder.record_order_book(item, order_book)
+                return order_book
+        self.order_books[item] = self.market_data.fetch_order_book(symbol=f'{item}/KRW')
+        if self.recorder is not None:
+            self.recorder.record_order_book(item, self.order_books[item])
+        return self.order_books[item]
\ No newline at end of file
@@ -0,0 +1,103 @@
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ata.utils.log import log
+from ata.utils.ratelimiter import RateLimiter
+
+UPBIT_MARKET_ALL_URL = 'https://api.upbit.com/v1/market/all?is_details=true'
+
+CAUTION_KEYS = [
+    'CONCENTRATION_OF_SMALL_ACCOUNTS',
+    'DEPOSIT_AMOUNT_SOARING',
+    'GLOBAL_PRICE_DIFFERENCES',
+    'PRICE_FLUCTUATIONS',
+    'TRADING_VOLUME_SOARING',
+]
+
+class UpbitMarketEventService:
+    '''
+    업비트 종목 경고/주의 정보 캐시
+    ttl 초 동안은 요청 없이 캐시를 반환하고, ttl 이 지나면 이전 값을 반환하면서 백그라운드에서 갱신한다.
+    갱신할 때는 keep-alive 세션을 재사용하고, 응답이 같으면 파싱을 건너뛰며 바뀐 종목만 다시 만든다.
+    '''
+    def __init__(
+        self,
+        ttl = 60,
+        url = UPBIT_MARKET_ALL_URL,
+        limiter: RateLimiter = None,
+        pool_maxsize = 4
+        ):
+        self.ttl = ttl
+        self.url = url
+        self.limiter = limiter
+        self.session = requests.Session()
+        self.session.headers.update({'accept': 'application/json'})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.market_events: dict[str, dict] = {}
+        self.__raw_events: dict[str, dict] = {}
+        self.__etag = None
+        self.__digest = None
+        self.__updated_at = None
+        self.__lock = threading.Lock()
+        self.__executor = ThreadPoolExecutor(max_workers=1)
+        self.__refreshing = None
+
+    def get(self) -> dict:
+        if self.__updated_at is None:
+            self.refresh()
+        elif time.monotonic() - self.__updated_at >= self.ttl:
+            if self.__refreshing is None or self.__refreshing.done():
+                self.__refreshing = self.__executor.submit(self.__refresh_in_background)
+        return self.market_events
+
+    def refresh(self):
+        if self.limiter is not None:
+            self.limiter.acquire('market')
+        headers = {}
+        if self.__etag is not None:
+            headers['If-None-Match'] = self.__etag
+        res = self.session.get(self.url, headers=headers, timeout=10)
+        if res.status_code == 304:
+            self.__updated_at = time.monotonic()
+            return self.market_events
+        res.raise_for_status()
+        self.__etag = res.headers.get('ETag')
+
+        # 응답이 이전과 같으면 파싱하지 않는다
+        digest = hashlib.md5(res.content).digest()
+        if digest != self.__digest:
+            self.__apply(res.json())
+            self.__digest = digest
+        self.__updated_at = time.monotonic()
+        return self.market_events
+
+    def __refresh_in_background(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            log(f'market event refresh fail: {e}')
+
+    def __apply(self, infos):
+        with self.__lock:
+            # 바뀐 종목만 새로 만들고, 다른 종목은 기존 dict 를 그대로 사용
+            market_events = dict(self.market_events)
+            raw_events = {info['market'].split('-')[-1]: info['market_event'] for info in infos}
+            for item, raw_event in raw_events.items():
+                if self.__raw_events.get(item) == raw_event and item in market_events:
+                    continue
+                market_events[item] = {
+                    'warning': raw_event['warning'],
+                    'caution': {key: raw_event['caution'][key] for key in CAUTION_KEYS},
+                }
+            for item in set(market_events) - set(raw_events):
+                del market_events[item]
+            self.__raw_events = raw_events
+            self.market_events = market_events
@@ -0,0 +1,50 @@
+from ata.utils.ratelimiter import RateLimiter
+
+# https://docs.upbit.com/docs/user-request-guide
+UPBIT_RATE_LIMITS = {
+    'market': 10,
+    'candle': 10,
+    'trade': 10,
+    'ticker': 10,
+    'orderbook': 10,
+    'order': 8,
+    'default': 30,
+}
+
+UPBIT_REQUEST_GROUPS = {
+    'fetch_markets': 'market',
+    'fetch_ohlcv': 'candle',
+    'fetch_trades': 'trade',
+    'fetch_ticker': 'ticker',
+    'fetch_tickers': 'ticker',
+    'fetch_order_book': 'orderbook',
+    'fetch_order_books': 'orderbook',
+    'create_order': 'order',
+    'create_limit_buy_order': 'order',
+    'create_limit_sell_order': 'order',
+    'create_market_buy_order': 'order',
+    'create_market_sell_order': 'order',
+}
+
+class UpbitRateLimitedClient:
+    '''
+    ccxt.upbit 을 감싸서 요청 전에 업비트 요청 그룹별 토큰 버킷을 통과시킨다.
+    여러 스레드가 같은 클라이언트를 사용해도 그룹별 초당 요청 수를 넘지 않는다.
+    '''
+    def __init__(
+        self,
+        exchange,
+        limiter: RateLimiter = None
+        ):
+        self.exchange = exchange
+        self.limiter = RateLimiter(UPBIT_RATE_LIMITS) if limiter is None else limiter
+
+    def __getattr__(self, name):
+        attr = getattr(self.exchange, name)
+        if not callable(attr) or not name.startswith(('fetch_', 'create_', 'cancel_')):
+            return attr
+        group = UPBIT_REQUEST_GROUPS.get(name, 'default')
+        def request(*args, **kwargs):
+            self.limiter.acquire(group)
+            return attr(*args, **kwargs)
+        return request
@@ -0,0 +1,268 @@
+'''
+업비트 웹소켓 시세 피드
+ticker / trade / orderbook 채널을 구독하여 메모리에 최신 상태를 유지하고, 체결 내역으로 1분봉을 직접 만든다.
+연결이 끊기면 받은 시세 / 호가를 버리고(다시 연결하면 구독 시점의 스냅샷을 다시 받는다) 캔들은 다음 조회 때 REST 로 다시 채우게 한다.
+max_age 초 동안 아무 메시지도 받지 못하면 시세 / 호가를 반환하지 않으므로 거래소 클래스는 REST 로 조회한다.
+'''
+import asyncio
+import json
+import threading
+import time
+import uuid
+from collections import deque
+
+import aiohttp
+import pandas as pd
+
+from ata.utils.log import log
+
+UPBIT_WEBSOCKET_URL = 'wss://api.upbit.com/websocket/v1'
+
+class UpbitWebSocketFeed:
+    def __init__(
+        self,
+        url = UPBIT_WEBSOCKET_URL,
+        maxlen = 200,
+        reconnect_delay = 1.0,
+        max_age = 30.0
+        ):
+        '''
+        max_age: 마지막 메시지 이후 이 시간(초)이 지나면 시세 / 호가가 오래된 것으로 보고 반환하지 않는다
+        '''
+        self.url = url
+        self.maxlen = maxlen
+        self.reconnect_delay = reconnect_delay
+        self.max_age = max_age
+        self.symbols: list[str] = []
+
+        self.__lock = threading.Lock()
+        self.__tickers: dict[str, dict] = {}
+        self.__order_books: dict[str, dict] = {}
+        self.__candles: dict[str, deque] = {}
+        self.__frames: dict[str, pd.DataFrame] = {}
+        self.__seeded: set[str] = set()
+        self.__connected = False
+        self.__last_message: float = None
+
+        self.__loop: asyncio.AbstractEventLoop = None
+        self.__thread: threading.Thread = None
+        self.__ws = None
+        self.__running = False
+
+    def start(self, symbols):
+        '''
+        symbols: 'BTC/KRW' 형식의 심볼 목록
+        '''
+        self.symbols = list(symbols)
+        if self.__thread is not None:
+            self.subscribe(self.symbols)
+            return
+        self.__running = True
+        self.__loop = asyncio.new_event_loop()
+        self.__thread = threading.Thread(target=self.__run_loop, daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        self.__running = False
+        if self.__loop is not None and self.__ws is not None:
+            asyncio.run_coroutine_threadsafe(self.__ws.close(), self.__loop).result(timeout=5)
+        if self.__thread is not None:
+            self.__thread.join(timeout=5)
+        self.__thread = None
+        self.__loop = None
+        self.__ws = None
+
+    def subscribe(self, symbols):
+        self.symbols = list(symbols)
+        if self.__loop is not None and self.__ws is not None:
+            asyncio.run_coroutine_threadsafe(self.__send_subscription(self.__ws), self.__loop)
+
+    def is_seeded(self, symbol):
+        '''
+        False 이면 REST 캔들로 seed_ohlcv 를 호출해야 한다 (연결이 끊겨 있는 동안은 항상 False)
+        '''
+        return self.__connected and symbol in self.__seeded
+
+    def seed_ohlcv(self, symbol, ohlcv):
+        '''
+        REST 로 받은 1분봉([timestamp, open, high, low, close, volume] 목록)으로 과거 캔들을 채운다.
+        겹치는 캔들은 REST 값을 기준으로 하되 구독 이후 갱신된 고가/저가/종가를 반영한다.
+        '''
+        with self.__lock:
+            live = {candle[0]: candle for candle in self.__candles.get(symbol, [])}
+            candles = deque(maxlen=self.maxlen)
+            for candle in ohlcv:
+                candle = list(candle)
+                if candle[0] in live:
+                    live_candle = live.pop(candle[0])
+                    candle[2] = max(candle[2], live_candle[2])
+                    candle[3] = min(candle[3], live_candle[3])
+                    candle[4] = live_candle[4]
+                    candle[5] = max(candle[5], live_candle[5])
+                candles.append(candle)
+            for timestamp in sorted(live):
+                if len(candles) == 0 or candles[-1][0] < timestamp:
+                    candles.append(live[timestamp])
+            self.__candles[symbol] = candles
+            self.__frames.pop(symbol, None)
+            self.__seeded.add(symbol)
+
+    def is_fresh(self) -> bool:
+        '''
+        연결되어 있고 max_age 초 안에 메시지를 받았는지
+        '''
+        return self.__connected and self.__last_message is not None and time.monotonic() - self.__last_message <= self.max_age
+
+    def get_tickers(self) -> dict:
+        with self.__lock:
+            if not self.is_fresh():
+                return {}
+            return dict(self.__tickers)
+
+    def get_ticker(self, symbol) -> dict:
+        if not self.is_fresh():
+            return None
+        return self.__tickers.get(symbol)
+
+    def get_order_book(self, symbol) -> dict:
+        if not self.is_fresh():
+            return None
+        return self.__order_books.get(symbol)
+
+    def get_ohlcv_per_1m(self, symbol) -> pd.DataFrame:
+        '''
+        체결 내역으로 만든 1분봉 df, 캔들이 없으면 None
+        새 체결이 들어오기 전까지는 같은 df 를 반환하므로 수정하려면 복사해서 사용해야 함
+        '''
+        with self.__lock:
+            frame = self.__frames.get(symbol)
+            if frame is None:
+                candles = self.__candles.get(symbol)
+                if candles is None or len(candles) == 0:
+                    return None
+                frame = self.__to_frame(candles)
+                self.__frames[symbol] = frame
+            return frame
+
+    def handle_message(self, message: dict):
+        msg_type = message.get('type')
+        code = message.get('code')
+        if code is None:
+            return
+        symbol = self.__to_symbol(code)
+        with self.__lock:
+            self.__last_message = time.monotonic()
+            if msg_type == 'ticker':
+                self.__tickers[symbol] = self.__parse_ticker(symbol, message)
+            elif msg_type == 'orderbook':
+                self.__order_books[symbol] = self.__parse_order_book(symbol, message)
+            elif msg_type == 'trade':
+                self.__apply_trade(symbol, message)
+
+    def __run_loop(self):
+        asyncio.set_event_loop(self.__loop)
+        self.__loop.run_until_complete(self.__consume())
+        self.__loop.close()
+
+    async def __consume(self):
+        async with aiohttp.ClientSession() as session:
+            while self.__running:
+                try:
+                    async with session.ws_connect(self.url, heartbeat=30) as ws:
+                        self.__ws = ws
+                        await self.__send_subscription(ws)
+                        with self.__lock:
+                            # 연결되기 전에 REST 로 채운 캔들 이후의 체결도 놓쳤으므로 다시 채운다
+                            self.__seeded.clear()
+                            self.__connected = True
+                        async for msg in ws:
+                            if msg.type == aiohttp.WSMsgType.BINARY:
+                                self.handle_message(json.loads(msg.data.decode('utf-8')))
+                            elif msg.type == aiohttp.WSMsgType.TEXT:
+                                self.handle_message(json.loads(msg.data))
+                            elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                                break
+                except Exception as e:
+                    log(f'websocket error: {e}')
+                self.__ws = None
+                self.__on_disconnect()
+                if self.__running:
+                    await asyncio.sleep(self.reconnect_delay)
+
+    def __on_disconnect(self):
+        # 끊긴 동안의 체결은 받지 못하므로 캔들은 다시 seed_ohlcv 로 채우고, 시세 / 호가는 다시 연결한 뒤의 스냅샷을 사용한다
+        with self.__lock:
+            self.__connected = False
+            self.__tickers.clear()
+            self.__order_books.clear()
+            self.__seeded.clear()
+
+    async def __send_subscription(self, ws):
+        codes = [self.__to_code(symbol) for symbol in self.symbols]
+        await ws.send_str(json.dumps([
+            {'ticket': str(uuid.uuid4())},
+            {'type': 'ticker', 'codes': codes},
+            {'type': 'trade', 'codes': codes},
+            {'type': 'orderbook', 'codes': codes},
+            {'format': 'DEFAULT'}
+        ]))
+
+    def __apply_trade(self, symbol, message):
+        price = float(message['trade_price'])
+        volume = float(message['trade_volume'])
+        timestamp = int(message['trade_timestamp']) // 60000 * 60000
+        candles = self.__candles.setdefault(symbol, deque(maxlen=self.maxlen))
+        if len(candles) > 0 and candles[-1][0] == timestamp:
+            candle = candles[-1]
+            candle[2] = max(candle[2], price)
+            candle[3] = min(candle[3], price)
+            candle[4] = price
+            candle[5] += volume
+        elif len(candles) == 0 or candles[-1][0] < timestamp:
+            candles.append([timestamp, price, price, price, price, volume])
+        else:
+            # 순서가 뒤바뀐 체결은 무시
+            return
+        self.__frames.pop(symbol, None)
+
+    def __parse_ticker(self, symbol, message):
+        return {
+            'symbol': symbol,
+            'timestamp': message.get('trade_timestamp', message.get('timestamp')),
+            'last': message['trade_price'],
+            'close': message['trade_price'],
+            'open': message.get('opening_price'),
+            'high': message.get('high_price'),
+            'low': message.get('low_price'),
+            'change': message.get('signed_change_price'),
+            'percentage': message.get('signed_change_rate', 0) * 100,
+            'baseVolume': message.get('acc_trade_volume_24h'),
+            'quoteVolume': message.get('acc_trade_price_24h'),
+            'info': message
+        }
+
+    def __parse_order_book(self, symbol, message):
+        units = message.get('orderbook_units', [])
+        return {
+            'symbol': symbol,
+            'timestamp': message.get('timestamp'),
+            'bids': [[unit['bid_price'], unit['bid_size']] for unit in units],
+            'asks': [[unit['ask_price'], unit['ask_size']] for unit in units]
+        }
+
+    def __to_frame(self, candles):
+        df = pd.DataFrame(list(candles), columns=['datetime', 'open', 'high', 'low', 'close', 'volume'])
+        pd_ts = pd.to_datetime(df['datetime'], utc=True, unit='ms')     # unix timestamp to pandas Timeestamp
+        pd_ts = pd_ts.dt.tz_convert("Asia/Seoul")                       # convert timezone
+        pd_ts = pd_ts.dt.tz_localize(None)
+        df.set_index(pd_ts, inplace=True)
+        df = df[['open', 'high', 'low', 'close', 'volume']]
+        return df
+
+    def __to_code(self, symbol):
+        base, quote = symbol.split('/')
+        return f'{quote}-{base}'
+
+    def __to_symbol(self, code):
+        quote, base = code.split('-')
+        return f'{base}/{quote}'
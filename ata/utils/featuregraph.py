@@ -0,0 +1,309 @@
+'''
+지표 계산 계획 (feature graph)
+전략과 데이터셋은 필요한 지표 이름(trade.calc_* 의 컬럼 이름과 같음)만 선언하고,
+FeaturePlan 이 sma, std, typical price 같은 중간 결과를 한 번만, 의존 순서대로 계산한다.
+같은 계획으로
+    compute / apply: 전체 구간을 한 번에 계산 (과거 데이터)
+    stream: 캔들이 들어올 때마다 O(1) 로 갱신 (실시간)
+할 수 있다.
+
+ex)
+    plan = FeaturePlan(bollinger_mfi_features(20, 2, 14))
+    df = plan.apply(df)                     # sma20, std20, upper_band20_2, lower_band20_2, bollinger_b20_2, mfi14 컬럼 추가
+    stream = plan.stream()
+    stream.sync_frame(ohlcv_per_1m)         # stream.values['mfi14']
+'''
+import re
+
+import numpy as np
+import pandas as pd
+
+from ata.utils import indicatorkernel
+from ata.utils.streamingindicator import StreamingEMA, StreamingMFI, StreamingSMA, StreamingSTD, StreamingWilliamsR
+
+# 캔들 컬럼
+CANDLE_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+class Feature:
+    '''
+    name: 결과 이름
+    inputs: 캔들 컬럼 또는 다른 Feature 이름
+    batch: 입력 배열로 전체 구간을 계산하는 함수
+    make_state: 캔들마다 갱신하는 객체(update, revise)를 만드는 함수, None 이면 batch 를 값 하나에 그대로 사용
+    internal: 중간 결과, apply 에서 df 에 쓰지 않는다
+    '''
+    __slots__ = ('name', 'inputs', 'batch', 'make_state', 'internal')
+
+    def __init__(
+        self,
+        name,
+        inputs,
+        batch,
+        make_state = None,
+        internal = False
+        ):
+        self.name = name
+        self.inputs = tuple(inputs)
+        self.batch = batch
+        self.make_state = make_state
+        self.internal = internal
+
+
+def bollinger_keys(period = 20, num_std_dev = 2):
+    '''
+    return: calc_bollinger_bands 와 같은 이름
+    '''
+    return {
+        'upper_key': f'upper_band{period}_{num_std_dev}',
+        'lower_key': f'lower_band{period}_{num_std_dev}',
+        'b_key': f'bollinger_b{period}_{num_std_dev}'
+    }
+
+def bollinger_mfi_features(bollinger_period = 20, bollinger_num_std_dev = 2, mfi_peirod = 14):
+    '''
+    check_*_by_bollinger_mfi 에 필요한 지표
+    '''
+    keys = bollinger_keys(bollinger_period, bollinger_num_std_dev)
+    return [keys['upper_key'], keys['lower_key'], keys['b_key'], f'mfi{mfi_peirod}']
+
+def resolve(name) -> Feature:
+    '''
+    지표 이름으로 Feature 를 만든다
+    '''
+    for pattern, factory in _FACTORIES:
+        match = re.fullmatch(pattern, name)
+        if match is not None:
+            return factory(name, *match.groups())
+    raise KeyError(f'unknown feature: {name}')
+
+
+class FeaturePlan:
+    def __init__(self, features):
+        '''
+        features: 필요한 지표 이름 목록
+        '''
+        self.features = list(features)
+        self.nodes: list[Feature] = []
+        # 사용하는 캔들 컬럼
+        self.candle_inputs: list[str] = []
+        visited = set()
+        for name in self.features:
+            self.__visit(name, visited, set())
+
+    def compute(self, data) -> dict[str, np.ndarray]:
+        '''
+        data: 캔들 컬럼을 가진 df 또는 dict
+        return: 지표 이름: 배열 (중간 결과 포함)
+        '''
+        values = {key: np.asarray(data[key], dtype=np.float64) for key in self.candle_inputs}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for node in self.nodes:
+                values[node.name] = node.batch(*(values[key] for key in node.inputs))
+        return values
+
+    def apply(self, df):
+        '''
+        계산한 지표를 df 컬럼으로 추가 (internal 제외), 같은 이름의 컬럼이 있어도 다시 계산한다
+        '''
+        values = self.compute(df)
+        for node in self.nodes:
+            if not node.internal:
+                df[node.name] = values[node.name]
+        return df
+
+    def stream(self):
+        return FeatureStream(self)
+
+    def __visit(self, name, visited, visiting):
+        if name in visited or name in CANDLE_COLUMNS:
+            if name in CANDLE_COLUMNS and name not in self.candle_inputs:
+                self.candle_inputs.append(name)
+            return
+        if name in visiting:
+            raise ValueError(f'cyclic feature: {name}')
+        visiting.add(name)
+        node = resolve(name)
+        for key in node.inputs:
+            self.__visit(key, visited, visiting)
+        visiting.discard(name)
+        visited.add(name)
+        self.nodes.append(node)
+
+
+class FeatureStream:
+    '''
+    FeaturePlan 을 캔들마다 갱신
+    update: 새 캔들, revise: 마지막 캔들 변경 (진행 중인 봉)
+    values: 지표 이름: 마지막 캔들의 값 (캔들 컬럼 포함)
+    '''
+    def __init__(self, plan: FeaturePlan):
+        self.plan = plan
+        self.values: dict[str, float] = {}
+        self.last_timestamp = None
+        self.__states = {node.name: node.make_state() for node in plan.nodes if node.make_state is not None}
+
+    def reset(self):
+        self.__init__(self.plan)
+
+    def update(self, timestamp, candle) -> dict:
+        '''
+        candle: 캔들 컬럼: 값
+        '''
+        self.__step(candle, revise=False)
+        self.last_timestamp = timestamp
+        return self.values
+
+    def revise(self, candle) -> dict:
+        self.__step(candle, revise=True)
+        return self.values
+
+    def push(self, timestamp, candle) -> dict:
+        '''
+        마지막 캔들과 timestamp 가 같으면 revise, 아니면 update
+        '''
+        if self.last_timestamp is not None and timestamp == self.last_timestamp:
+            return self.revise(candle)
+        return self.update(timestamp, candle)
+
+    def sync(self, timestamps, columns) -> dict:
+        '''
+        timestamps: 캔들 시각(또는 순서) 배열, 오래된 것부터
+        columns: 캔들 컬럼: 배열
+        마지막으로 반영한 캔들 이후만 반영, 마지막으로 반영한 캔들이 구간에 없으면 처음부터 다시 계산
+        '''
+        n = len(timestamps)
+        start = 0
+        if self.last_timestamp is not None:
+            i = n - 1
+            while i >= 0 and timestamps[i] > self.last_timestamp:
+                i -= 1
+            if i >= 0 and timestamps[i] == self.last_timestamp:
+                self.revise({key: float(array[i]) for key, array in columns.items()})
+                start = i + 1
+            else:
+                self.reset()
+        for i in range(start, n):
+            self.update(timestamps[i], {key: float(array[i]) for key, array in columns.items()})
+        return self.values
+
+    def sync_frame(self, df) -> dict:
+        return self.sync(df.index.to_numpy(), {key: df[key].to_numpy() for key in self.plan.candle_inputs})
+
+    def __step(self, candle, revise):
+        values = self.values
+        for key in self.plan.candle_inputs:
+            values[key] = candle[key]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.__step_nodes(values, revise)
+
+    def __step_nodes(self, values, revise):
+        for node in self.plan.nodes:
+            inputs = [values[key] for key in node.inputs]
+            state = self.__states.get(node.name)
+            if state is None:
+                values[node.name] = _scalar(node.batch(*inputs))
+            elif revise:
+                values[node.name] = state.revise(*inputs)
+            else:
+                values[node.name] = state.update(*inputs)
+
+
+class _TypicalPriceMFI:
+    # typical price 를 입력으로 받는 StreamingMFI
+    __slots__ = ('mfi',)
+
+    def __init__(self, period):
+        self.mfi = StreamingMFI(period)
+
+    def update(self, tp, volume):
+        return self.mfi.update_typical_price(tp, volume)
+
+    def revise(self, tp, volume):
+        return self.mfi.revise_typical_price(tp, volume)
+
+
+def _scalar(value):
+    # 값 하나로 계산한 numpy 결과를 float 로
+    return float(value)
+
+def _rolling(values, period):
+    return pd.Series(values).rolling(window=period)
+
+def _sma(name, period):
+    period = int(period)
+    return Feature(
+        name, ['close'],
+        batch=lambda close: _rolling(close, period).mean().to_numpy(),
+        make_state=lambda: StreamingSMA(period)
+    )
+
+def _rolling_std(close, period):
+    rolling = _rolling(close, period)
+    std = rolling.std().to_numpy()
+    # 구간의 값이 모두 같으면 pandas 의 누적 오차와 상관없이 0 (StreamingSTD 와 같은 값)
+    return np.where((rolling.max() == rolling.min()).to_numpy() & ~np.isnan(std), 0.0, std)
+
+def _std(name, period):
+    period = int(period)
+    return Feature(
+        name, ['close'],
+        batch=lambda close: _rolling_std(close, period),
+        make_state=lambda: StreamingSTD(period)
+    )
+
+def _ema(name, period):
+    period = int(period)
+    return Feature(
+        name, ['close'],
+        batch=lambda close: pd.Series(close).ewm(span=period, adjust=False).mean().to_numpy(),
+        make_state=lambda: StreamingEMA(period)
+    )
+
+def _upper_band(name, period, num_std_dev):
+    k = float(num_std_dev)
+    return Feature(name, [f'sma{period}', f'std{period}'], batch=lambda sma, std: sma + std * k)
+
+def _lower_band(name, period, num_std_dev):
+    k = float(num_std_dev)
+    return Feature(name, [f'sma{period}', f'std{period}'], batch=lambda sma, std: sma - std * k)
+
+def _bollinger_b(name, period, num_std_dev):
+    return Feature(
+        name, ['close', f'upper_band{period}_{num_std_dev}', f'lower_band{period}_{num_std_dev}'],
+        batch=lambda close, upper, lower: np.divide(close - lower, upper - lower)
+    )
+
+def _typical_price(name):
+    return Feature(name, ['high', 'low', 'close'], batch=lambda high, low, close: (high + low + close) / 3, internal=True)
+
+def _mfi(name, period):
+    period = int(period)
+    return Feature(
+        name, ['typical_price', 'volume'],
+        batch=lambda tp, volume: indicatorkernel.rolling_mfi_from_typical_price(tp, volume, period),
+        make_state=lambda: _TypicalPriceMFI(period)
+    )
+
+def _williams_r(name, period):
+    period = int(period)
+    return Feature(
+        name, ['high', 'low', 'close'],
+        batch=lambda high, low, close: indicatorkernel.rolling_williams_r(high, low, close, period),
+        make_state=lambda: StreamingWilliamsR(period)
+    )
+
+def _deviation_sma(name, period):
+    return Feature(name, ['close', f'sma{period}'], batch=lambda close, sma: ((close - sma) / sma) * 100)
+
+_FACTORIES = [
+    (r'sma(\d+)', _sma),
+    (r'std(\d+)', _std),
+    (r'ema(\d+)', _ema),
+    (r'upper_band(\d+)_([\d.]+)', _upper_band),
+    (r'lower_band(\d+)_([\d.]+)', _lower_band),
+    (r'bollinger_b(\d+)_([\d.]+)', _bollinger_b),
+    (r'typical_price', _typical_price),
+    (r'mfi(\d+)', _mfi),
+    (r'williams_r(\d+)', _williams_r),
+    (r'deviation_sma(\d+)', _deviation_sma),
+]
@@ -0,0 +1,67 @@
+from collections import OrderedDict
+
+class IndicatorCache:
+    '''
+    지표 계산 결과 LRU 캐시
+    key: (symbol, timeframe, 캔들 구간, indicator, params) (ata.utils.trade.get_indicator_key)
+        캔들 구간은 마지막 캔들 시각과 지표가 사용하는 캔들 값의 해시이므로
+        진행 중인 봉이 바뀌거나 구간 안의 이전 봉이 수정되면 다시 계산한다.
+    maxsize 를 넘으면 가장 오래 사용하지 않은 결과부터 지운다.
+    '''
+    def __init__(
+        self,
+        maxsize = 4096
+        ):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.__items: OrderedDict = OrderedDict()
+
+    def __len__(self):
+        return len(self.__items)
+
+    def get(self, key, default = None):
+        try:
+            value = self.__items[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self.__items.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.__items[key] = value
+        self.__items.move_to_end(key)
+        while len(self.__items) > self.maxsize:
+            self.__items.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        try:
+            value = self.__items[key]
+        except KeyError:
+            self.misses += 1
+            value = compute()
+            self.put(key, value)
+            return value
+        self.__items.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def clear(self):
+        self.__items.clear()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.0
+
+    def stats(self) -> dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self.__items),
+            'hit_rate': self.hit_rate
+        }
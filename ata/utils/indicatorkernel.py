@@ -0,0 +1,263 @@
+'''
+전체 구간 지표 계산 커널 (calc_mfi, calc_williams_r 에서 사용)
+numba 가 설치되어 있으면 한 번의 반복문으로 계산하는 컴파일된 커널을, 없으면 numpy 로 벡터화한 커널을 사용한다.
+import 할 때 BACKEND 가 정해지며 환경 변수 ATA_INDICATOR_BACKEND=numpy 로 numpy 커널을 강제할 수 있다.
+
+벤치마크: python -m ata.utils.indicatorkernel --rows 1000000
+'''
+import argparse
+import os
+import time
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+if njit is not None and os.environ.get('ATA_INDICATOR_BACKEND', 'numba') != 'numpy':
+    BACKEND = 'numba'
+else:
+    BACKEND = 'numpy'
+
+def _mfi_loop(typical_price, volume, period):
+    n = len(typical_price)
+    mfi = np.full(n, np.nan)
+    positive_flows = np.zeros(n)
+    negative_flows = np.zeros(n)
+    positive_sum = 0.0
+    negative_sum = 0.0
+    # 구간 안의 0 이 아닌 money flow, nan 개수 (합이 정확히 0 인지, nan 이 있는지 판단)
+    positive_cnt = 0
+    negative_cnt = 0
+    nan_cnt = 0
+    prev_tp = np.nan
+    for i in range(n):
+        tp = typical_price[i]
+        raw_money_flow = tp * volume[i]
+        positive = raw_money_flow if tp > prev_tp else 0.0
+        negative = raw_money_flow if tp < prev_tp else 0.0
+        prev_tp = tp
+        positive_flows[i] = positive
+        negative_flows[i] = negative
+        if positive != positive or negative != negative:
+            nan_cnt += 1
+        else:
+            positive_sum += positive
+            negative_sum += negative
+            positive_cnt += positive != 0
+            negative_cnt += negative != 0
+        if i >= period:
+            old_positive = positive_flows[i - period]
+            old_negative = negative_flows[i - period]
+            if old_positive != old_positive or old_negative != old_negative:
+                nan_cnt -= 1
+            else:
+                positive_sum -= old_positive
+                negative_sum -= old_negative
+                positive_cnt -= old_positive != 0
+                negative_cnt -= old_negative != 0
+        if i >= period - 1 and nan_cnt == 0:
+            positive_mf_sum = positive_sum if positive_cnt > 0 else 0.0
+            negative_mf_sum = negative_sum if negative_cnt > 0 else 0.0
+            if negative_mf_sum == 0:
+                # money flow ratio 가 inf(mfi 100) 또는 0 / 0(nan)
+                mfi[i] = 100.0 if positive_mf_sum > 0 else np.nan
+            else:
+                mfi[i] = 100 - (100 / (1 + positive_mf_sum / negative_mf_sum))
+    return mfi
+
+def _williams_r_loop(high, low, close, period):
+    n = len(close)
+    williams_r = np.full(n, np.nan)
+    # 단조 deque 를 배열로 구현 (head 부터 구간의 최댓값/최솟값 위치)
+    max_idx = np.empty(n, dtype=np.int64)
+    min_idx = np.empty(n, dtype=np.int64)
+    max_head = max_tail = 0
+    min_head = min_tail = 0
+    # 구간 안의 고가 / 저가 nan 개수 (pandas rolling 과 같이 nan 이 있으면 nan)
+    nan_cnt = 0
+    for i in range(n):
+        if high[i] != high[i] or low[i] != low[i]:
+            nan_cnt += 1
+        if i >= period and (high[i - period] != high[i - period] or low[i - period] != low[i - period]):
+            nan_cnt -= 1
+        while max_tail > max_head and high[max_idx[max_tail - 1]] <= high[i]:
+            max_tail -= 1
+        max_idx[max_tail] = i
+        max_tail += 1
+        if max_idx[max_head] <= i - period:
+            max_head += 1
+        while min_tail > min_head and low[min_idx[min_tail - 1]] >= low[i]:
+            min_tail -= 1
+        min_idx[min_tail] = i
+        min_tail += 1
+        if min_idx[min_head] <= i - period:
+            min_head += 1
+        if i >= period - 1 and nan_cnt == 0:
+            highest = high[max_idx[max_head]]
+            lowest = low[min_idx[min_head]]
+            if highest == lowest:
+                # 구간의 가격이 모두 같으면 0 / 0
+                williams_r[i] = np.nan
+            else:
+                williams_r[i] = (highest - close[i]) / (highest - lowest) * -100
+    return williams_r
+
+def _mfi_numpy(typical_price, volume, period):
+    n = len(typical_price)
+    mfi = np.full(n, np.nan)
+    if n < period:
+        return mfi
+    raw_money_flow = typical_price * volume
+    positive_money_flow = np.zeros(n)
+    negative_money_flow = np.zeros(n)
+    rising = typical_price[1:] > typical_price[:-1]
+    falling = typical_price[1:] < typical_price[:-1]
+    positive_money_flow[1:][rising] = raw_money_flow[1:][rising]
+    negative_money_flow[1:][falling] = raw_money_flow[1:][falling]
+    positive_mf_sum = _rolling_sum(positive_money_flow, period)
+    negative_mf_sum = _rolling_sum(negative_money_flow, period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mfi[period - 1:] = 100 - (100 / (1 + positive_mf_sum / negative_mf_sum))
+    return mfi
+
+def _williams_r_numpy(high, low, close, period):
+    n = len(close)
+    williams_r = np.full(n, np.nan)
+    if n < period:
+        return williams_r
+    highest = _rolling_extreme(high, period, np.maximum, -np.inf)
+    lowest = _rolling_extreme(low, period, np.minimum, np.inf)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        williams_r[period - 1:] = (highest - close[period - 1:]) / (highest - lowest) * -100
+    return williams_r
+
+def _rolling_sum(values, period):
+    # 누적 합의 차, 구간에 더한 값이 없으면 정확히 0
+    nan = np.isnan(values)
+    if nan.any():
+        # nan 은 누적 합에서 빼고 nan 이 들어 있는 구간만 nan (pandas rolling 과 같음)
+        sums = _rolling_sum(np.where(nan, 0.0, values), period)
+        sums[_rolling_sum(nan.astype(np.float64), period) > 0] = np.nan
+        return sums
+    cumsum = np.cumsum(values)
+    sums = cumsum[period - 1:].copy()
+    sums[1:] -= cumsum[:-period]
+    return sums
+
+def _rolling_extreme(values, period, ufunc, fill):
+    '''
+    van Herk / Gil-Werman: period 크기 블록의 앞/뒤 누적 최댓값(최솟값)으로 O(n) 계산
+    return: len(values) - period + 1 개, i 번째는 values[i:i + period] 의 최댓값(최솟값)
+    '''
+    n = len(values)
+    blocks = np.concatenate([values, np.full((-n) % period, fill)]).reshape(-1, period)
+    prefix = ufunc.accumulate(blocks, axis=1).ravel()
+    suffix = ufunc.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+    return ufunc(suffix[:n - period + 1], prefix[period - 1:n])
+
+if BACKEND == 'numba':
+    # 0 으로 나누면 예외 대신 inf / nan
+    _mfi_kernel = njit(cache=True, error_model='numpy')(_mfi_loop)
+    _williams_r_kernel = njit(cache=True, error_model='numpy')(_williams_r_loop)
+else:
+    _mfi_kernel = _mfi_numpy
+    _williams_r_kernel = _williams_r_numpy
+
+def rolling_mfi(high, low, close, volume, period = 14) -> np.ndarray:
+    '''
+    return: 각 캔들의 mfi 배열, 앞의 period - 1 개는 nan
+    '''
+    typical_price = (_as_float(high) + _as_float(low) + _as_float(close)) / 3
+    return _mfi_kernel(typical_price, _as_float(volume), period)
+
+def rolling_mfi_from_typical_price(typical_price, volume, period = 14) -> np.ndarray:
+    '''
+    typical price 를 이미 계산한 경우 (ata.utils.featuregraph)
+    '''
+    return _mfi_kernel(_as_float(typical_price), _as_float(volume), period)
+
+def rolling_williams_r(high, low, close, period = 10) -> np.ndarray:
+    '''
+    return: 각 캔들의 williams %r 배열, 앞의 period - 1 개는 nan
+    '''
+    return _williams_r_kernel(_as_float(high), _as_float(low), _as_float(close), period)
+
+def _as_float(array):
+    return np.ascontiguousarray(array, dtype=np.float64)
+
+
+def benchmark(rows):
+    import pandas as pd
+
+    rng = np.random.default_rng(0)
+    close = 1e6 * np.exp(np.cumsum(rng.normal(0, 1e-3, rows)))
+    high = close * (1 + rng.random(rows) * 1e-3)
+    low = close * (1 - rng.random(rows) * 1e-3)
+    volume = rng.random(rows) * 10
+    df = pd.DataFrame({'high': high, 'low': low, 'close': close, 'volume': volume})
+
+    def pandas_mfi():
+        # calc_mfi 의 이전 pandas 구현
+        typical_price = (df['high'] + df['low'] + df['close']) / 3
+        raw_money_flow = typical_price * df['volume']
+        positive_money_flow = np.where(typical_price > typical_price.shift(1), raw_money_flow, 0)
+        negative_money_flow = np.where(typical_price < typical_price.shift(1), raw_money_flow, 0)
+        positive_mf_sum = pd.Series(positive_money_flow).rolling(window=14).sum()
+        negative_mf_sum = pd.Series(negative_money_flow).rolling(window=14).sum()
+        return (100 - (100 / (1 + positive_mf_sum / negative_mf_sum))).to_numpy()
+
+    def pandas_williams_r():
+        # calc_williams_r 의 이전 pandas 구현
+        return (((df['high'].rolling(window=10).max() - df['close']) /
+            (df['high'].rolling(window=10).max() - df['low'].rolling(window=10).min())) * -100).to_numpy()
+
+    kernels = {
+        'mfi': [
+            ('pandas', pandas_mfi),
+            ('numpy', lambda: _mfi_numpy((high + low + close) / 3, volume, 14)),
+        ],
+        'williams_r': [
+            ('pandas', pandas_williams_r),
+            ('numpy', lambda: _williams_r_numpy(high, low, close, 10)),
+        ]
+    }
+    if BACKEND == 'numba':
+        # 컴파일 시간은 제외
+        rolling_mfi(high[:100], low[:100], close[:100], volume[:100])
+        rolling_williams_r(high[:100], low[:100], close[:100])
+        kernels['mfi'].append(('numba', lambda: rolling_mfi(high, low, close, volume, 14)))
+        kernels['williams_r'].append(('numba', lambda: rolling_williams_r(high, low, close, 10)))
+
+    print(f'rows: {rows}, backend: {BACKEND}')
+    for name, candidates in kernels.items():
+        expected = None
+        base = None
+        for backend, kernel in candidates:
+            elapsed = min(_timeit(kernel) for _ in range(3))
+            result = kernel()
+            if expected is None:
+                expected, base = result, elapsed
+            match = np.allclose(result, expected, equal_nan=True)
+            print(f'{name:<12}{backend:<8}{elapsed * 1000:>10.2f}ms{base / elapsed:>8.1f}x  match: {match}')
+
+def _timeit(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+def get_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--rows',
+        type=int,
+        default=1000000
+    )
+
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = get_args()
+    benchmark(args.rows)
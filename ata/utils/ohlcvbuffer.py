@@ -0,0 +1,152 @@
+import numpy as np
+import pandas as pd
+
+COLUMNS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+TIMESTAMP, OPEN, HIGH, LOW, CLOSE, VOLUME = range(len(COLUMNS))
+
+class OHLCVBuffer:
+    '''
+    고정 크기 OHLCV 링 버퍼
+    (컬럼, 2 * capacity) float64 배열에 같은 값을 두 번(i, i + capacity) 써 두어서
+    항상 연속된 구간으로 최근 캔들을 읽을 수 있다. (복사 없는 numpy view)
+    append / update_last 는 O(1)
+
+    frame_index: frame 의 index 형식
+        'range': 0 부터 시작하는 RangeIndex
+        'timestamp': timestamp 컬럼 값
+        'datetime': timestamp(ms) 를 Asia/Seoul 시각으로 바꾼 값 (업비트 캔들 df 와 같은 형식)
+    '''
+    __slots__ = ('capacity', 'frame_index', '_data', '_end', '_size', '_frame')
+
+    def __init__(
+        self,
+        capacity = 200,
+        frame_index = 'range'
+        ):
+        self.capacity = capacity
+        self.frame_index = frame_index
+        self._data = np.full((len(COLUMNS), 2 * capacity), np.nan, dtype=np.float64)
+        self._end = 0
+        self._size = 0
+        self._frame: pd.DataFrame = None
+
+    @classmethod
+    def from_ohlcv(cls, ohlcv, capacity = 200, frame_index = 'range'):
+        '''
+        ohlcv: [[timestamp, open, high, low, close, volume], ...]
+        '''
+        buffer = cls(capacity=capacity, frame_index=frame_index)
+        for candle in ohlcv[-capacity:]:
+            buffer.append(*candle)
+        return buffer
+
+    def __len__(self):
+        return self._size
+
+    def append(self, timestamp, open, high, low, close, volume):
+        self.__write(self._end, (timestamp, open, high, low, close, volume))
+        self._end = (self._end + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+        self._frame = None
+
+    def update_last(self, timestamp, open, high, low, close, volume):
+        if self._size == 0:
+            raise IndexError('update_last on empty OHLCVBuffer')
+        position = (self._end - 1) % self.capacity
+        values = (timestamp, open, high, low, close, volume)
+        if np.array_equal(self._data[:, position], values):
+            # 값이 같으면 frame 을 다시 만들지 않는다
+            return
+        self.__write(position, values)
+        self._frame = None
+
+    def push(self, timestamp, open, high, low, close, volume):
+        '''
+        마지막 캔들과 timestamp 가 같으면 덮어쓰고, 아니면 추가
+        '''
+        if self._size > 0 and self.last(TIMESTAMP) == timestamp:
+            self.update_last(timestamp, open, high, low, close, volume)
+        else:
+            self.append(timestamp, open, high, low, close, volume)
+
+    def clear(self):
+        self._end = 0
+        self._size = 0
+        self._frame = None
+
+    def view(self) -> np.ndarray:
+        '''
+        (len(COLUMNS), len(self)) 읽기 전용 view, 오래된 캔들부터
+        '''
+        start = (self._end - self._size) % self.capacity
+        view = self._data[:, start:start + self._size]
+        view.flags.writeable = False
+        return view
+
+    def column(self, key) -> np.ndarray:
+        '''
+        key: 컬럼 이름 또는 COLUMNS 의 위치
+        '''
+        if isinstance(key, str):
+            key = COLUMNS.index(key)
+        return self.view()[key]
+
+    def last(self, key = CLOSE):
+        if isinstance(key, str):
+            key = COLUMNS.index(key)
+        return self._data[key, (self._end - 1) % self.capacity]
+
+    def tolist(self) -> list:
+        return self.view().T.tolist()
+
+    @property
+    def timestamp(self):
+        return self.column(TIMESTAMP)
+
+    @property
+    def open(self):
+        return self.column(OPEN)
+
+    @property
+    def high(self):
+        return self.column(HIGH)
+
+    @property
+    def low(self):
+        return self.column(LOW)
+
+    @property
+    def close(self):
+        return self.column(CLOSE)
+
+    @property
+    def volume(self):
+        return self.column(VOLUME)
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        '''
+        기존 코드와 호환되는 df ('open', 'high', 'low', 'close', 'volume')
+        버퍼가 바뀌기 전까지는 같은 df 를 반환한다
+        '''
+        if self._frame is None:
+            view = self.view()
+            self._frame = pd.DataFrame(
+                {key: view[i].copy() for i, key in enumerate(COLUMNS) if i != TIMESTAMP},
+                index=self.__make_index(view[TIMESTAMP])
+            )
+        return self._frame
+
+    def __make_index(self, timestamps):
+        if self.frame_index == 'timestamp':
+            return pd.Index(timestamps.astype(np.int64))
+        if self.frame_index == 'datetime':
+            pd_ts = pd.to_datetime(timestamps.astype(np.int64), utc=True, unit='ms')     # unix timestamp to pandas Timeestamp
+            pd_ts = pd_ts.tz_convert("Asia/Seoul")                                      # convert timezone
+            pd_ts = pd_ts.tz_localize(None)
+            return pd.Index(pd_ts, name='datetime')
+        return pd.RangeIndex(len(timestamps))
+
+    def __write(self, position, values):
+        self._data[:, position] = values
+        self._data[:, position + self.capacity] = values
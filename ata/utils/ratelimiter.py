@@ -0,0 +1,47 @@
+import threading
+import time
+
+class TokenBucket:
+    '''
+    초당 rate 개의 토큰이 채워지고 최대 capacity 개까지 쌓이는 토큰 버킷
+    여러 스레드에서 공유해도 됨
+    '''
+    def __init__(
+        self,
+        rate,
+        capacity = None
+        ):
+        self.rate = rate
+        self.capacity = rate if capacity is None else capacity
+        self.__tokens = self.capacity
+        self.__last = time.monotonic()
+        self.__lock = threading.Lock()
+
+    def acquire(self, tokens = 1):
+        while True:
+            with self.__lock:
+                now = time.monotonic()
+                self.__tokens = min(self.capacity, self.__tokens + (now - self.__last) * self.rate)
+                self.__last = now
+                if self.__tokens >= tokens:
+                    self.__tokens -= tokens
+                    return
+                wait = (tokens - self.__tokens) / self.rate
+            time.sleep(wait)
+
+
+class RateLimiter:
+    '''
+    요청 그룹별 토큰 버킷 모음
+    limits: {그룹 이름: 초당 요청 수}, 'default' 그룹은 등록되지 않은 그룹에 사용됨
+    '''
+    def __init__(
+        self,
+        limits: dict[str, float]
+        ):
+        self.buckets = {group: TokenBucket(rate) for group, rate in limits.items()}
+
+    def acquire(self, group, tokens = 1):
+        bucket = self.buckets.get(group, self.buckets.get('default'))
+        if bucket is not None:
+            bucket.acquire(tokens)
@@ -0,0 +1,320 @@
+'''
+캔들이 하나 추가되거나 마지막 캔들이 갱신될 때마다 O(1) 로 갱신되는 지표
+ata.utils.trade 의 calc_* 와 같은 값을 계산한다. (pandas rolling 과 같이 period 개의 캔들이 쌓이기 전까지는 nan)
+    update(...): 새 캔들 추가
+    revise(...): 마지막 캔들 값 변경 (진행 중인 봉)
+종목별 갱신은 ata.utils.featuregraph 의 FeatureStream 이 이 지표들을 조합해서 한다.
+'''
+import math
+from collections import deque
+
+import numpy as np
+
+class StreamingSMA:
+    '''
+    calc_sma 와 같은 단순 이동평균
+    '''
+    __slots__ = ('period', '_window', '_sum', '_steps')
+
+    def __init__(self, period):
+        self.period = period
+        self._window = deque(maxlen=period)
+        self._sum = 0.0
+        self._steps = 0
+
+    def update(self, value):
+        if len(self._window) == self.period:
+            self._sum -= self._window[0]
+        self._window.append(value)
+        self._sum += value
+        self.__resync()
+        return self.value
+
+    def revise(self, value):
+        self._sum += value - self._window[-1]
+        self._window[-1] = value
+        self.__resync()
+        return self.value
+
+    @property
+    def value(self):
+        if len(self._window) < self.period:
+            return math.nan
+        return self._sum / self.period
+
+    def __resync(self):
+        # 누적 합의 부동소수점 오차가 쌓이지 않도록 period 번마다 다시 합산 (분할 상환 O(1))
+        self._steps += 1
+        if self._steps >= self.period:
+            self._steps = 0
+            self._sum = math.fsum(self._window)
+
+
+class StreamingEMA:
+    '''
+    calc_ema 와 같은 지수 이동평균 (ewm(span=period, adjust=False))
+    첫 값부터 계산하므로 pandas 로 잘린 구간을 계산한 값과는 앞부분이 조금 다를 수 있다.
+    '''
+    __slots__ = ('period', 'alpha', 'value', '_prev')
+
+    def __init__(self, period):
+        self.period = period
+        self.alpha = 2 / (period + 1)
+        self.value = math.nan
+        # 마지막 캔들을 반영하기 전의 값
+        self._prev = math.nan
+
+    def update(self, value):
+        self._prev = self.value
+        self.value = self.__next(self._prev, value)
+        return self.value
+
+    def revise(self, value):
+        self.value = self.__next(self._prev, value)
+        return self.value
+
+    def __next(self, prev, value):
+        if math.isnan(prev):
+            return value
+        return prev + self.alpha * (value - prev)
+
+
+class StreamingSTD:
+    '''
+    calc_std 와 같은 이동 표준편차 (ddof=1)
+    Welford 방식으로 평균과 편차 제곱합을 갱신한다.
+    pandas rolling 과 같이 구간의 값이 모두 같으면 누적 오차와 상관없이 0 이다.
+    '''
+    __slots__ = ('period', 'ddof', '_window', '_mean', '_m2', '_steps', '_same', '_prev_same')
+
+    def __init__(self, period, ddof = 1):
+        self.period = period
+        self.ddof = ddof
+        self._window = deque(maxlen=period)
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._steps = 0
+        # 끝에서부터 연속으로 같은 값의 개수, 마지막 캔들을 반영하기 전의 개수
+        self._same = 0
+        self._prev_same = 0
+
+    def update(self, value):
+        self._prev_same = self._same
+        self._same = self._prev_same + 1 if len(self._window) > 0 and self._window[-1] == value else 1
+        if len(self._window) < self.period:
+            self._window.append(value)
+            delta = value - self._mean
+            self._mean += delta / len(self._window)
+            self._m2 += delta * (value - self._mean)
+        else:
+            old = self._window[0]
+            self._window.append(value)
+            self.__replace(old, value)
+        self.__resync()
+        return self.value
+
+    def revise(self, value):
+        old = self._window[-1]
+        self._window[-1] = value
+        self._same = self._prev_same + 1 if len(self._window) > 1 and self._window[-2] == value else 1
+        self.__replace(old, value)
+        self.__resync()
+        return self.value
+
+    @property
+    def mean(self):
+        if len(self._window) < self.period:
+            return math.nan
+        return self._mean
+
+    @property
+    def value(self):
+        if len(self._window) < self.period or len(self._window) <= self.ddof:
+            return math.nan
+        if self._same >= len(self._window):
+            return 0.0
+        return math.sqrt(max(self._m2, 0.0) / (len(self._window) - self.ddof))
+
+    def __replace(self, old, new):
+        # 크기가 같은 구간에서 값 하나를 바꿀 때의 Welford 갱신
+        old_mean = self._mean
+        self._mean += (new - old) / len(self._window)
+        self._m2 += (new - old) * (new - self._mean + old - old_mean)
+
+    def __resync(self):
+        self._steps += 1
+        if self._steps >= self.period:
+            self._steps = 0
+            window = np.fromiter(self._window, dtype=np.float64, count=len(self._window))
+            self._mean = float(window.mean())
+            self._m2 = float(((window - self._mean) ** 2).sum())
+
+
+class StreamingMFI:
+    '''
+    calc_mfi 와 같은 Money Flow Index
+    '''
+    __slots__ = (
+        'period', '_flows', '_positive_sum', '_negative_sum', '_positive_cnt', '_negative_cnt',
+        '_prev_tp', '_last_tp', '_steps'
+    )
+
+    def __init__(self, period = 14):
+        self.period = period
+        # (positive money flow, negative money flow)
+        self._flows = deque(maxlen=period)
+        self._positive_sum = 0.0
+        self._negative_sum = 0.0
+        # 0 이 아닌 money flow 개수, 합이 정확히 0 인지 판단할 때 사용
+        self._positive_cnt = 0
+        self._negative_cnt = 0
+        # 마지막 캔들 직전, 마지막 캔들의 typical price
+        self._prev_tp = math.nan
+        self._last_tp = math.nan
+        self._steps = 0
+
+    def update(self, high, low, close, volume):
+        return self.update_typical_price((high + low + close) / 3, volume)
+
+    def revise(self, high, low, close, volume):
+        return self.revise_typical_price((high + low + close) / 3, volume)
+
+    def update_typical_price(self, tp, volume):
+        self._prev_tp = self._last_tp
+        flow = self.__flow(tp, volume)
+        if len(self._flows) == self.period:
+            self.__add(self._flows[0], -1)
+        self._flows.append(flow)
+        self.__add(flow, 1)
+        self.__resync()
+        return self.value
+
+    def revise_typical_price(self, tp, volume):
+        flow = self.__flow(tp, volume)
+        self.__add(self._flows[-1], -1)
+        self._flows[-1] = flow
+        self.__add(flow, 1)
+        self.__resync()
+        return self.value
+
+    @property
+    def value(self):
+        if len(self._flows) < self.period:
+            return math.nan
+        positive_sum = self._positive_sum if self._positive_cnt > 0 else 0.0
+        negative_sum = self._negative_sum if self._negative_cnt > 0 else 0.0
+        money_flow_ratio = _divide(positive_sum, negative_sum)
+        return 100 - (100 / (1 + money_flow_ratio))
+
+    def __flow(self, tp, volume):
+        self._last_tp = tp
+        raw_money_flow = tp * volume
+        # 직전 typical price 가 없으면(nan) 비교 결과는 False
+        return (
+            raw_money_flow if tp > self._prev_tp else 0.0,
+            raw_money_flow if tp < self._prev_tp else 0.0
+        )
+
+    def __add(self, flow, sign):
+        positive, negative = flow
+        self._positive_sum += sign * positive
+        self._negative_sum += sign * negative
+        self._positive_cnt += sign * (positive != 0)
+        self._negative_cnt += sign * (negative != 0)
+
+    def __resync(self):
+        self._steps += 1
+        if self._steps >= self.period:
+            self._steps = 0
+            self._positive_sum = math.fsum(flow[0] for flow in self._flows)
+            self._negative_sum = math.fsum(flow[1] for flow in self._flows)
+
+
+class StreamingExtreme:
+    '''
+    최근 period 개 값의 최댓값(또는 최솟값), 단조 deque 사용
+    revise 로 값이 커지는(최솟값이면 작아지는) 경우는 O(1),
+    반대 방향은 구간을 다시 훑는다. (진행 중인 봉의 고가는 내려가지 않고 저가는 올라가지 않으므로 드물다)
+    '''
+    __slots__ = ('period', 'is_max', '_window', '_candidates', '_idx')
+
+    def __init__(self, period, is_max = True):
+        self.period = period
+        self.is_max = is_max
+        self._window = deque(maxlen=period)
+        # (idx, value), 앞에서부터 최댓값(최솟값) 순
+        self._candidates = deque()
+        self._idx = -1
+
+    def update(self, value):
+        self._idx += 1
+        self._window.append(value)
+        self.__push(self._idx, value)
+        while self._candidates[0][0] <= self._idx - self.period:
+            self._candidates.popleft()
+        return self.value
+
+    def revise(self, value):
+        old = self._window[-1]
+        self._window[-1] = value
+        if self.__dominates(value, old):
+            # 마지막 값은 항상 candidates 의 끝에 있다
+            self._candidates.pop()
+            self.__push(self._idx, value)
+        elif value != old:
+            self._candidates.clear()
+            first_idx = self._idx - len(self._window) + 1
+            for i, v in enumerate(self._window):
+                self.__push(first_idx + i, v)
+        return self.value
+
+    @property
+    def value(self):
+        if len(self._window) < self.period:
+            return math.nan
+        return self._candidates[0][1]
+
+    def __push(self, idx, value):
+        while len(self._candidates) > 0 and self.__dominates(value, self._candidates[-1][1]):
+            self._candidates.pop()
+        self._candidates.append((idx, value))
+
+    def __dominates(self, a, b):
+        return a >= b if self.is_max else a <= b
+
+
+class StreamingWilliamsR:
+    '''
+    calc_williams_r 와 같은 Williams %R
+    '''
+    __slots__ = ('period', 'highest', 'lowest', 'value')
+
+    def __init__(self, period = 10):
+        self.period = period
+        self.highest = StreamingExtreme(period, is_max=True)
+        self.lowest = StreamingExtreme(period, is_max=False)
+        self.value = math.nan
+
+    def update(self, high, low, close):
+        self.highest.update(high)
+        self.lowest.update(low)
+        return self.__set(close)
+
+    def revise(self, high, low, close):
+        self.highest.revise(high)
+        self.lowest.revise(low)
+        return self.__set(close)
+
+    def __set(self, close):
+        highest = self.highest.value
+        self.value = _divide(highest - close, highest - self.lowest.value) * -100
+        return self.value
+
+
+def _divide(a, b):
+    # numpy 나눗셈과 같이 0 으로 나누면 inf / nan
+    if b == 0:
+        if a == 0 or math.isnan(a):
+            return math.nan
+        return math.copysign(math.inf, a)
+    return a / b
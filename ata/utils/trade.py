@@ -1,5 +1,17 @@
+import hashlib
+
 import numpy as np
-import pandas as pd
+
+from ata.utils.featuregraph import FeaturePlan, bollinger_keys, bollinger_mfi_features
+from ata.utils.indicatorcache import IndicatorCache
+from ata.utils.ohlcvbuffer import OHLCVBuffer, TIMESTAMP
+
+# 지표 계산 결과 캐시, symbol 을 넘긴 check_* 와 에이전트에서 사용
+# 전체 구간 calc_* 는 결과를 df 컬럼으로 남겨 재사용하므로 (force_calc) 이 캐시를 사용하지 않는다.
+indicator_cache = IndicatorCache()
+
+# calc_*, check_* 는 모두 FeaturePlan (ata.utils.featuregraph) 으로 계산한다, 지표 이름 tuple: FeaturePlan
+_feature_plans: dict[tuple, FeaturePlan] = {}
 
 def calc_sma(df, period, force_calc = False):
     '''
@@ -7,9 +19,7 @@ def calc_sma(df, period, force_calc = False):
     return: f"sma{period}" 컬럼을 포함한 df
     '''
     sma_key = f"sma{period}"
-    if not (sma_key in df.columns and not force_calc):
-        df[sma_key] = df["close"].rolling(window=period).mean()
-    return df, sma_key
+    return _apply_features(df, [sma_key], force_calc), sma_key
 
 def calc_ema(df, period, force_calc = False):
     '''
@@ -17,9 +27,7 @@ def calc_ema(df, period, force_calc = False):
     return: f"ema{period}" 컬럼을 포함한 df
     '''
     ema_key = f"ema{period}"
-    if not (ema_key in df.columns and not force_calc):
-        df[ema_key] = df["close"].ewm(span=period, adjust=False).mean()
-    return df, ema_key
+    return _apply_features(df, [ema_key], force_calc), ema_key
 
 def calc_std(df, period, force_calc = False):
     '''
@@ -27,71 +35,25 @@ def calc_std(df, period, force_calc = False):
     return: f"std{period}" 컬럼을 포함한 df
     '''
     std_key = f"std{period}"
-    if not (std_key in df.columns and not force_calc):
-        df[f"std{period}"] = df["close"].rolling(window=period).std()
-    return df, std_key
+    return _apply_features(df, [std_key], force_calc), std_key
 
 def calc_bollinger_bands(df, period, num_std_dev, force_calc = False):
     '''
     df: "close"를 가지고 있어야 함.
     return: f"upper_band{period}_{num_std_dev}", f"lower_band{period}_{num_std_dev}", f"bollinger_b{period}_{num_std_dev}",
-        컬럼을 포함한 df
-    '''
-    upper_key = f"upper_band{period}_{num_std_dev}"
-    lower_key = f"lower_band{period}_{num_std_dev}"
-    b_key = f"bollinger_b{period}_{num_std_dev}"
-    columns_to_check = [upper_key, lower_key, b_key]
-    
-    if not (all(col in df.columns for col in columns_to_check) and not force_calc):
-        df, sma_key = calc_sma(df, period)
-        df, std_key = calc_std(df, period)
-        
-        # 상단 밴드와 하단 밴드 계산
-        df[upper_key] = df[sma_key] + (df[std_key] * num_std_dev)
-        df[lower_key] = df[sma_key] - (df[std_key] * num_std_dev)
-        
-        # 볼린저 %b 계산
-        
-        df[b_key] = (
-            (df["close"] - df[lower_key]) / 
-            (df[upper_key] - df[lower_key])
-            )
-    
-    # 결과를 데이터프레임으로 반환
-    return df, {
-        'upper_key' : upper_key,
-        'lower_key' : lower_key,
-        'b_key': b_key
-    }
-
-    
+        컬럼을 포함한 df (sma, std 컬럼도 추가됨)
+    '''
+    keys = bollinger_keys(period, num_std_dev)
+    df = _apply_features(df, [keys['upper_key'], keys['lower_key'], keys['b_key']], force_calc)
+    return df, keys
+
 def calc_mfi(df, period=14, force_calc = False):
     '''
     df: 'high', 'low', 'close', 'volume' 가지고 있어야 함.
     return: f"mfi{period}" 컬럼을 포함한 df
     '''
     mfi_key = f"mfi{period}"
-    if not (mfi_key in df.columns and not force_calc):
-        # Typical Price 계산
-        typical_price = (df['high'] + df['low'] + df['close']) / 3
-        
-        # Raw Money Flow 계산
-        raw_money_flow = typical_price * df['volume']
-        
-        # Positive/Negative Money Flow 구분
-        positive_money_flow = np.where(typical_price > typical_price.shift(1), raw_money_flow, 0)
-        negative_money_flow = np.where(typical_price < typical_price.shift(1), raw_money_flow, 0)
-
-        
-        # Rolling sums for the given period
-        positive_mf_sum = pd.Series(positive_money_flow).rolling(window=period).sum()
-        negative_mf_sum = pd.Series(negative_money_flow).rolling(window=period).sum()
-        
-        # Money Flow Ratio and MFI 계산
-        money_flow_ratio = positive_mf_sum / negative_mf_sum
-        df[mfi_key] = 100 - (100 / (1 + money_flow_ratio))
-    
-    return df, mfi_key
+    return _apply_features(df, [mfi_key], force_calc), mfi_key
 
 def calc_rvol(self, df, period=10, force_calc = False):
     '''
@@ -112,65 +74,155 @@ def calc_williams_r(df, period=10, force_calc = False):
     return: f'williams_r{period}' 컬럼을 포함한 df
     '''
     williams_key = f'williams_r{period}'
-    if not (williams_key in df.columns and not force_calc):
-        # 최고가, 최저가, 종가 계산
-        df[f'williams_r{period}'] = ((df['high'].rolling(window=period).max() - df['close']) / 
-                            (df['high'].rolling(window=period).max() - df['low'].rolling(window=period).min())) * -100
-    return df, williams_key
+    return _apply_features(df, [williams_key], force_calc), williams_key
 
 def calc_deviation_from_sma(df, period=20, force_calc = False):
     '''
     df: 'close' 가지고 있어야 함.
-    return: f'deviation_sma{period}' 컬럼을 포함한 df
+    return: f'deviation_sma{period}' 컬럼을 포함한 df (sma 컬럼도 추가됨)
     '''
     deviation_sma_key = f'deviation_sma{period}'
-    if not (deviation_sma_key in df.columns and not force_calc):
-        # 이동 평균 계산 (SMA)
-        df, sma_key = calc_sma(df, period)
-        # 이격도 계산
-        df[deviation_sma_key] = ((df['close'] - df[sma_key]) / df[sma_key]) * 100
-    return df, deviation_sma_key
-
-def check_oversold_by_bollinger_mfi(ohlcv_per_1m, bollinger_period = 20, bollinger_num_std_dev = 2, mfi_peirod = 14):
-    # 볼린저
-    ohlcv_per_1m, keys = calc_bollinger_bands(df=ohlcv_per_1m, period=bollinger_period, num_std_dev=bollinger_num_std_dev)
-    upper_key = keys['upper_key']
-    lower_key = keys['lower_key']
-    b_key = keys['b_key']
-    
-    # 가격이 볼린저 밴드 하단을 터치치하였는가
-    if ohlcv_per_1m[lower_key].iloc[-1] < ohlcv_per_1m["close"].iloc[-1]:
-        return False
-    
-    # 볼린저 %b가 0이하인가
-    if ohlcv_per_1m[b_key].iloc[-1] > 0:
-        return False
-    
-    # mfi가 20이하인가
-    ohlcv_per_1m, mfi_key = calc_mfi(df=ohlcv_per_1m, period=mfi_peirod)
-    if ohlcv_per_1m[mfi_key].iloc[-1] > 20:
-        return False
-    
-    return True
-
-def check_overbought_by_bollinger_mfi(ohlcv_per_1m, bollinger_period = 20, bollinger_num_std_dev = 2, mfi_peirod = 14):
-    # 볼린저
-    ohlcv_per_1m, keys = calc_bollinger_bands(df=ohlcv_per_1m, period=bollinger_period, num_std_dev=bollinger_num_std_dev)
-    upper_key = keys['upper_key']
-    lower_key = keys['lower_key']
-    b_key = keys['b_key']
-    
-    # 가격이 볼린저 밴드 상단을 터치하였는가
-    if ohlcv_per_1m[upper_key].iloc[-1] > ohlcv_per_1m["close"].iloc[-1]:
-        return False
-    
-    # 볼린저 %b가 1이상인가
-    if ohlcv_per_1m[b_key].iloc[-1] < 1:
-        return False
-    
-    # mfi가 80이상인가
-    ohlcv_per_1m, mfi_key = calc_mfi(df=ohlcv_per_1m, period=mfi_peirod)
-    if ohlcv_per_1m[mfi_key].iloc[-1] < 80:
-        return False
-    
-    return True
\ No newline at end of file
+    return _apply_features(df, [deviation_sma_key], force_calc), deviation_sma_key
+
+def calc_last_bollinger_mfi(ohlcv, bollinger_period = 20, bollinger_num_std_dev = 2, mfi_peirod = 14) -> dict:
+    '''
+    ohlcv: 'high', 'low', 'close', 'volume' 를 가진 df, OHLCVBuffer 또는 배열 tuple
+    return: 지표 이름: 마지막 캔들의 값 ('close' 포함)
+        FeaturePlan(bollinger_mfi_features(...)) 를 마지막 bollinger_mfi_length 개 캔들로 계산한다.
+    '''
+    length = bollinger_mfi_length(bollinger_period, mfi_peirod)
+    plan = _get_feature_plan(bollinger_mfi_features(bollinger_period, bollinger_num_std_dev, mfi_peirod))
+    values = plan.compute(dict(zip(('high', 'low', 'close', 'volume'), (array[-length:] for array in to_ohlcv_arrays(ohlcv)))))
+    return {key: array[-1] for key, array in values.items()}
+
+def check_bollinger_mfi(ohlcv_per_1m, bollinger_period = 20, bollinger_num_std_dev = 2, mfi_peirod = 14, symbol = None, timeframe = '1m') -> tuple[bool, bool]:
+    '''
+    ohlcv_per_1m 의 마지막 캔들로 check_bollinger_mfi_features 를 확인, ohlcv_per_1m 에 컬럼을 추가하지 않는다.
+    symbol: 주어지면 결과를 indicator_cache 에서 재사용
+    return: oversold, overbought
+    '''
+    params = (bollinger_period, bollinger_num_std_dev, mfi_peirod)
+    arrays = to_ohlcv_arrays(ohlcv_per_1m)
+    compute = lambda: tuple(bool(signal) for signal in check_bollinger_mfi_features(calc_last_bollinger_mfi(arrays, *params), *params))
+    if symbol is None:
+        return compute()
+    length = bollinger_mfi_length(bollinger_period, mfi_peirod)
+    key = get_indicator_key(symbol, timeframe, ohlcv_per_1m, arrays, length=length) + ('bollinger_mfi_signal', params)
+    return indicator_cache.get_or_compute(key, compute)
+
+def check_oversold_by_bollinger_mfi(ohlcv_per_1m, bollinger_period = 20, bollinger_num_std_dev = 2, mfi_peirod = 14, symbol = None, timeframe = '1m'):
+    '''
+    ohlcv_per_1m: 'high', 'low', 'close', 'volume' 를 가진 df 또는 OHLCVBuffer
+    ohlcv_per_1m 에 컬럼을 추가하지 않는다.
+    symbol: 주어지면 결과를 indicator_cache 에서 재사용
+    '''
+    return check_bollinger_mfi(ohlcv_per_1m, bollinger_period, bollinger_num_std_dev, mfi_peirod, symbol, timeframe)[0]
+
+def check_overbought_by_bollinger_mfi(ohlcv_per_1m, bollinger_period = 20, bollinger_num_std_dev = 2, mfi_peirod = 14, symbol = None, timeframe = '1m'):
+    '''
+    ohlcv_per_1m: 'high', 'low', 'close', 'volume' 를 가진 df 또는 OHLCVBuffer
+    ohlcv_per_1m 에 컬럼을 추가하지 않는다.
+    symbol: 주어지면 결과를 indicator_cache 에서 재사용
+    '''
+    return check_bollinger_mfi(ohlcv_per_1m, bollinger_period, bollinger_num_std_dev, mfi_peirod, symbol, timeframe)[1]
+
+def stack_last_ohlcv(ohlcvs, length):
+    '''
+    ohlcvs: 'high', 'low', 'close', 'volume' 를 가진 df 또는 OHLCVBuffer 목록
+    return: high, low, close, volume (len(ohlcvs), length) 배열
+        각 행은 마지막 length 개 캔들이고, 캔들이 부족한 종목은 앞을 nan 으로 채운다.
+    '''
+    stacked = np.full((4, len(ohlcvs), length), np.nan, dtype=np.float64)
+    for row, ohlcv in enumerate(ohlcvs):
+        for i, array in enumerate(to_ohlcv_arrays(ohlcv)):
+            tail = array[-length:]
+            stacked[i, row, length - len(tail):] = tail
+    return stacked[0], stacked[1], stacked[2], stacked[3]
+
+def check_bollinger_mfi_batch(high, low, close, volume, bollinger_period = 20, bollinger_num_std_dev = 2, mfi_peirod = 14):
+    '''
+    여러 종목의 check_bollinger_mfi 를 확인
+    high, low, close, volume: (종목 수, 시간) 배열, 각 행의 마지막 열이 최신 캔들 (stack_last_ohlcv)
+        앞부분의 nan 은 캔들이 없는 것으로 보고 뺀다.
+    return: oversold, overbought (종목 수,) bool 배열
+    '''
+    n_symbols = close.shape[0]
+    oversold = np.zeros(n_symbols, dtype=bool)
+    overbought = np.zeros(n_symbols, dtype=bool)
+    for row in range(n_symbols):
+        candles = np.flatnonzero(~np.isnan(close[row]))
+        start = candles[0] if len(candles) > 0 else 0
+        arrays = tuple(array[row, start:] for array in (high, low, close, volume))
+        oversold[row], overbought[row] = check_bollinger_mfi(arrays, bollinger_period, bollinger_num_std_dev, mfi_peirod)
+    return oversold, overbought
+
+def to_ohlcv_arrays(ohlcv):
+    '''
+    ohlcv: 'high', 'low', 'close', 'volume' 를 가진 df, OHLCVBuffer 또는 이미 바꾼 배열 tuple
+    return: high, low, close, volume 배열
+    '''
+    if isinstance(ohlcv, tuple):
+        return ohlcv
+    if isinstance(ohlcv, OHLCVBuffer):
+        return ohlcv.high, ohlcv.low, ohlcv.close, ohlcv.volume
+    columns = ohlcv.columns
+    try:
+        # 컬럼을 하나씩 꺼내는 것보다 한 번에 배열로 바꾸는 것이 훨씬 빠르다
+        values = ohlcv.to_numpy(dtype=np.float64)
+    except (TypeError, ValueError):
+        return tuple(ohlcv[key].to_numpy() for key in ('high', 'low', 'close', 'volume'))
+    return tuple(values[:, columns.get_loc(key)] for key in ('high', 'low', 'close', 'volume'))
+
+def bollinger_mfi_length(bollinger_period = 20, mfi_peirod = 14):
+    '''
+    볼린저 밴드, mfi 의 마지막 값을 계산하는 데 필요한 캔들 수
+    '''
+    return max(bollinger_period, mfi_peirod + 1)
+
+def get_indicator_key(symbol, timeframe, ohlcv, arrays = None, length = None):
+    '''
+    indicator_cache 의 key 앞부분 (symbol, timeframe, (마지막 캔들 시각, 캔들 수, length, 구간 해시))
+    length: 지표가 사용하는 마지막 캔들 수 (None 이면 전체), 구간 해시는 마지막 length 개 캔들의 high, low, close, volume 으로 만든다.
+        진행 중인 봉이 갱신되거나, 새 봉이 추가되거나, 구간 안의 이전 봉이 수정되면(재연결 후 다시 받은 캔들 등) key 가 바뀐다.
+        지표를 계산할 때 length 보다 많은 캔들을 사용하면 수정된 캔들을 놓칠 수 있으므로 length 는 지표의 구간 이상이어야 한다.
+    '''
+    high, low, close, volume = to_ohlcv_arrays(ohlcv) if arrays is None else arrays
+    if isinstance(ohlcv, OHLCVBuffer):
+        timestamp = ohlcv.last(TIMESTAMP)
+    else:
+        timestamp = ohlcv.index[-1]
+    start = 0 if length is None else max(len(close) - length, 0)
+    digest = hashlib.blake2b(digest_size=16)
+    for array in (high, low, close, volume):
+        digest.update(np.ascontiguousarray(array[start:], dtype=np.float64).tobytes())
+    return (symbol, timeframe, (timestamp, len(close), length, digest.digest()))
+
+def _get_feature_plan(features) -> FeaturePlan:
+    features = tuple(features)
+    plan = _feature_plans.get(features)
+    if plan is None:
+        plan = _feature_plans[features] = FeaturePlan(features)
+    return plan
+
+def _apply_features(df, features, force_calc):
+    # df 에 없는 지표가 있거나 force_calc 이면 FeaturePlan 으로 계산해서 컬럼으로 추가
+    if force_calc or not all(name in df.columns for name in features):
+        _get_feature_plan(features).apply(df)
+    return df
+
+def check_bollinger_mfi_features(values, bollinger_period = 20, bollinger_num_std_dev = 2, mfi_peirod = 14):
+    '''
+    check_oversold_by_bollinger_mfi, check_overbought_by_bollinger_mfi 를 FeaturePlan 으로 계산한 값으로 확인
+    values: FeaturePlan(bollinger_mfi_features(...)) 의 compute 결과(배열) 또는 FeatureStream.values(마지막 값)
+    return: oversold, overbought
+    '''
+    keys = bollinger_keys(bollinger_period, bollinger_num_std_dev)
+    close = values['close']
+    upper = values[keys['upper_key']]
+    lower = values[keys['lower_key']]
+    b = values[keys['b_key']]
+    mfi = values[f'mfi{mfi_peirod}']
+    # nan 인 값은 조건을 통과한 것으로 보는 기존 함수와 같게 비교 결과를 부정한다
+    oversold = np.logical_not(lower < close) & np.logical_not(b > 0) & np.logical_not(mfi > 20)
+    overbought = np.logical_not(upper > close) & np.logical_not(b < 1) & np.logical_not(mfi < 80)
+    return oversold, overbought
@@ -3,9 +3,15 @@ import os
 
 from ata.agent.lhagent import LHAgent
 from ata.agent.sragent import SRAgent
+from ata.exchange.baseexchangesimulator import FILL_MODELS
+from ata.exchange.marketdatadaemon import MarketDataClient
+from ata.exchange.marketrecorder import MarketRecorder
+from ata.exchange.multiofflineexchangesimulator import MultiOfflineExchangeSimulator
 from ata.exchange.offlineexchangesimulator import OfflineExchangeSimulator
+from ata.exchange.replayexchange import ReplayExchange
 from ata.exchange.upbitexchange import UpbitExchange
 from ata.exchange.upbitexchangesimulator import UpbitExchangeSimulator
+from ata.exchange.upbitwebsocketfeed import UpbitWebSocketFeed
 
 def get_args():
     parser = argparse.ArgumentParser()
@@ -13,7 +19,7 @@ def get_args():
         "--mod",
         type=str,
         default="Upbit",
-        choices=["Upbit", "OfflineSimul", "UpbitSimul"]
+        choices=["Upbit", "OfflineSimul", "MultiOfflineSimul", "UpbitSimul", "Replay"]
     )
     
     parser.add_argument(
@@ -58,12 +64,80 @@ def get_args():
         default=60
     )
     
+    parser.add_argument(
+        '--feed',
+        type=str,
+        default='rest',
+        choices=['rest', 'websocket']
+    )
+    
+    parser.add_argument(
+        '--market-events-ttl',
+        type=float,
+        default=60
+    )
+    
+    parser.add_argument(
+        '--balance-reconcile-interval',
+        type=float,
+        default=60
+    )
+    
+    parser.add_argument(
+        '--market-data-address',
+        type=str,
+        default=None
+    )
+    
+    parser.add_argument(
+        '--record-path',
+        type=str,
+        default=None,
+        help='UpbitSimul 에서 받은 시세를 기록할 새 파일, 이미 있는 파일에는 이어 쓰지 않는다 (--mod Replay --file-path 로 재생)'
+    )
+    
+    parser.add_argument(
+        '--fill-model',
+        type=str,
+        default='close',
+        choices=FILL_MODELS,
+        help='시뮬레이터 체결 방식 (close: 현재가에 닿으면 전부 체결, bar: 1분봉 고가 / 저가와 거래량으로 부분 체결, OfflineSimul / MultiOfflineSimul 만 지원)'
+    )
+    
+    parser.add_argument(
+        '--volume-ratio',
+        type=float,
+        default=1.0,
+        help='--fill-model bar 에서 주문이 가져갈 수 있는 1분봉 거래량 비율'
+    )
+    
+    parser.add_argument(
+        '--bollinger-period',
+        type=int,
+        default=20
+    )
+    
+    parser.add_argument(
+        '--bollinger-num-std-dev',
+        type=float,
+        default=2
+    )
+    
+    parser.add_argument(
+        '--mfi-period',
+        type=int,
+        default=14
+    )
+    
     parser.add_argument(
         '--debug',
         action='store_true',
     )
     
-    return parser.parse_args()
+    args = parser.parse_args()
+    if args.record_path is not None and args.mod != 'UpbitSimul':
+        parser.error('--record-path is only supported with --mod UpbitSimul')
+    return args
 
 if __name__ == "__main__":
     print(os.getpid())
@@ -72,17 +146,36 @@ if __name__ == "__main__":
     for arg, value in vars(args).items():
         print(f"{arg}: {value}")
     print()
+    feed = UpbitWebSocketFeed() if args.feed == 'websocket' else None
+    market_data_client = MarketDataClient(args.market_data_address) if args.market_data_address is not None else None
+    recorder = None
     if args.mod == 'Upbit':
         exchange = UpbitExchange(
             end_condition=args.end_condition,
-            file_path=args.file_path
+            file_path=args.file_path,
+            feed=feed,
+            market_data_client=market_data_client,
+            market_events_ttl=args.market_events_ttl,
+            balance_reconcile_interval=args.balance_reconcile_interval
         )
     elif args.mod == "OfflineSimul":
-        exchange = OfflineExchangeSimulator(args.file_path)
+        exchange = OfflineExchangeSimulator(args.file_path, fill_model=args.fill_model, volume_ratio=args.volume_ratio)
+    elif args.mod == 'MultiOfflineSimul':
+        exchange = MultiOfflineExchangeSimulator(args.file_path, fill_model=args.fill_model, volume_ratio=args.volume_ratio)
     elif args.mod == 'UpbitSimul':
+        # 기록 파일은 UpbitSimul 에서만 만든다
+        recorder = MarketRecorder(args.record_path) if args.record_path is not None else None
         exchange=UpbitExchangeSimulator(
-            file_path=args.file_path
+            file_path=args.file_path,
+            feed=feed,
+            market_data_client=market_data_client,
+            market_events_ttl=args.market_events_ttl,
+            recorder=recorder,
+            fill_model=args.fill_model,
+            volume_ratio=args.volume_ratio
         )
+    elif args.mod == 'Replay':
+        exchange = ReplayExchange(args.file_path, fill_model=args.fill_model, volume_ratio=args.volume_ratio)
     
     if args.agent == 'LHA':
         agent = LHAgent(
@@ -92,7 +185,10 @@ if __name__ == "__main__":
             wait_time_for_cancel_sell_order=args.wait_time_for_cancel_sell_order,
             only_btc=args.only_btc,
             debug=args.debug,
-            end_condition=args.end_condition
+            end_condition=args.end_condition,
+            bollinger_period=args.bollinger_period,
+            bollinger_num_std_dev=args.bollinger_num_std_dev,
+            mfi_peirod=args.mfi_period
         )
     elif args.agent == 'SRA':
         agent = SRAgent(
@@ -105,4 +201,6 @@ if __name__ == "__main__":
             end_condition=args.end_condition
         )
     
-    agent.run()
\ No newline at end of file
+    agent.run()
+    if recorder is not None:
+        recorder.close()
\ No newline at end of file
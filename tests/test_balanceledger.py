@@ -0,0 +1,129 @@
+import pytest
+
+from ata.exchange.balanceledger import BalanceLedger
+
+FEE_RATE = 0.0005
+
+class FakeExchange:
+    '''
+    지정가 주문의 잔고 변화를 업비트처럼 계산하는 거래소
+    '''
+    def __init__(self, krw):
+        self.balance = {'KRW': {'free': krw, 'used': 0.0, 'total': krw}}
+        self.orders: dict[str, dict] = {}
+
+    def fetch_balance(self):
+        balance = {currency: dict(entry) for currency, entry in self.balance.items()}
+        for key in ('free', 'used', 'total'):
+            balance[key] = {currency: entry[key] for currency, entry in self.balance.items()}
+        return balance
+
+    def fetch_open_orders(self):
+        return [dict(order) for order in self.orders.values() if order['status'] == 'open']
+
+    def create_order(self, order_id, item, side, price, amount):
+        if side == 'buy':
+            locked = price * amount * (1 + FEE_RATE)
+            self.__add('KRW', free=-locked, used=locked)
+        else:
+            self.__add(item, free=-amount, used=amount)
+        self.orders[order_id] = {
+            'id': order_id, 'symbol': f'{item}/KRW', 'side': side, 'price': price, 'amount': amount,
+            'filled': 0.0, 'cost': 0.0, 'fee': {'cost': 0.0}, 'status': 'open'
+        }
+
+    def fill(self, order_id, amount):
+        order = self.orders[order_id]
+        item = order['symbol'].split('/')[0]
+        cost = order['price'] * amount
+        if order['side'] == 'buy':
+            self.__add(item, free=amount)
+            self.__add('KRW', used=-cost * (1 + FEE_RATE))
+        else:
+            self.__add(item, used=-amount)
+            self.__add('KRW', free=cost * (1 - FEE_RATE))
+        order['filled'] += amount
+        order['cost'] += cost
+        order['fee'] = {'cost': order['cost'] * FEE_RATE}
+        if order['filled'] >= order['amount']:
+            order['status'] = 'closed'
+        return dict(order)
+
+    def cancel(self, order_id):
+        order = self.orders[order_id]
+        item = order['symbol'].split('/')[0]
+        remaining = order['amount'] - order['filled']
+        if order['side'] == 'buy':
+            locked = remaining * order['price'] * (1 + FEE_RATE)
+            self.__add('KRW', free=locked, used=-locked)
+        else:
+            self.__add(item, free=remaining, used=-remaining)
+        order['status'] = 'canceled'
+        return dict(order)
+
+    def __add(self, currency, free = 0.0, used = 0.0):
+        entry = self.balance.setdefault(currency, {'free': 0.0, 'used': 0.0, 'total': 0.0})
+        entry['free'] += free
+        entry['used'] += used
+        entry['total'] += free + used
+
+def assert_same_balance(ledger: BalanceLedger, exchange: FakeExchange):
+    for currency, entry in exchange.balance.items():
+        if currency != 'KRW' and entry['total'] == 0:
+            continue
+        for key in ('free', 'used', 'total'):
+            assert ledger.balance[currency][key] == pytest.approx(entry[key], abs=1e-9), (currency, key)
+
+def test_apply_order_tracks_exchange_balance():
+    exchange = FakeExchange(krw=1000.0)
+    ledger = BalanceLedger(exchange)
+    ledger.update()
+
+    exchange.create_order('1', 'BTC', 'buy', price=100.0, amount=2.0)
+    ledger.apply_ack('1', 'BTC', 'buy', amount_item=2.0, price=100.0)
+    assert_same_balance(ledger, exchange)
+
+    ledger.apply_order(exchange.fill('1', 0.5))
+    assert_same_balance(ledger, exchange)
+    ledger.apply_order(exchange.cancel('1'))
+    assert_same_balance(ledger, exchange)
+
+@pytest.mark.parametrize('side', ['buy', 'sell'])
+def test_reconcile_rebases_open_orders(side):
+    exchange = FakeExchange(krw=1000.0)
+    exchange.balance['BTC'] = {'free': 3.0, 'used': 0.0, 'total': 3.0}
+    ledger = BalanceLedger(exchange)
+    ledger.update()
+
+    exchange.create_order('1', 'BTC', side, price=100.0, amount=2.0)
+    ledger.apply_ack('1', 'BTC', side, amount_item=2.0, price=100.0)
+    ledger.apply_order(exchange.fill('1', 0.4))
+    # 장부에 반영되기 전에 더 체결되고, 그 상태로 잔고를 맞춘다
+    exchange.fill('1', 0.6)
+    ledger.reconcile()
+    assert_same_balance(ledger, exchange)
+
+    # reconcile 이 이미 반영한 체결을 다시 더하지 않는다
+    ledger.apply_order(dict(exchange.orders['1']))
+    assert_same_balance(ledger, exchange)
+    ledger.apply_order(exchange.fill('1', 0.5))
+    assert_same_balance(ledger, exchange)
+    # 주문 종료 시 남은 묶인 잔고만 해제한다
+    ledger.apply_order(exchange.cancel('1'))
+    assert_same_balance(ledger, exchange)
+
+def test_reconcile_drops_orders_closed_on_exchange():
+    exchange = FakeExchange(krw=1000.0)
+    ledger = BalanceLedger(exchange)
+    ledger.update()
+
+    exchange.create_order('1', 'BTC', 'buy', price=100.0, amount=2.0)
+    ledger.apply_ack('1', 'BTC', 'buy', amount_item=2.0, price=100.0)
+    ledger.apply_order(exchange.fill('1', 0.5))
+    canceled = exchange.cancel('1')
+    ledger.reconcile()
+    assert_same_balance(ledger, exchange)
+
+    # 이미 해제된 잔고를 다시 해제하지 않는다
+    ledger.apply_order(canceled)
+    assert_same_balance(ledger, exchange)
@@ -0,0 +1,36 @@
+import pytest
+
+from ata.exchange.offlineexchangesimulator import OfflineExchangeSimulator, load_offline_data
+from ata.exchange.replayexchange import ReplayExchange
+from ata.exchange.upbitexchangesimulator import UpbitExchangeSimulator
+from test_signalbacktester import make_candles
+
+def test_bar_fill_model_only_in_offline_simulators(tmp_path):
+    # 실시간 / 재생 거래소의 마지막 1분봉은 진행 중인 봉
+    with pytest.raises(ValueError, match='UpbitExchangeSimulator does not support fill_model: bar'):
+        UpbitExchangeSimulator(None, fill_model='bar')
+    with pytest.raises(ValueError, match='ReplayExchange does not support fill_model: bar'):
+        ReplayExchange(tmp_path / 'session.rec', fill_model='bar')
+    with pytest.raises(ValueError, match='unknown fill_model: open'):
+        OfflineExchangeSimulator(data=load_offline_data(make_candles(200)), fill_model='open')
+
+def test_bar_partial_fill_uses_bars_after_order():
+    data = make_candles(6600)
+    volumes = load_offline_data(data)['volume'].to_numpy()
+    exchange = OfflineExchangeSimulator(data=data, balance=10 ** 12, fill_model='bar', volume_ratio=0.5)
+    exchange.init()
+    price = exchange.get_current_price('BTC')
+    order_id = exchange.create_buy_order('BTC', price * 1.1, 10.0)
+    # 주문을 넣은 봉은 사용하지 않고 다음 봉부터 봉 거래량 * volume_ratio 씩 체결
+    filled = 0.0
+    for _ in range(3):
+        exchange.update()
+        filled += volumes[exchange.idx] * 0.5
+        order = exchange.get_order(order_id)
+        assert order['status'] == 'open'
+        assert order['filled'] == pytest.approx(filled)
+    assert exchange.balance['BTC']['total'] == pytest.approx(filled)
+    exchange.cancel_order_by_id(order_id)
+    assert exchange.get_order(order_id)['status'] == 'canceled'
+    for balance in exchange.balance.values():
+        assert balance['total'] == pytest.approx(balance['free'] + balance['used'])
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from ata.data import candledownloader
+from ata.data.candledownloader import CandleDownloader, make_client
+from ata.data.candlestore import CandleStore
+from upbitcandleserver import MINUTE, UpbitCandleServer
+
+# 2024-01-01 00:00 UTC
+T0 = 1704067200000
+
+@pytest.fixture
+def server():
+    server = UpbitCandleServer({'BTC': T0, 'ETH': T0 + 500 * MINUTE}, now=T0 + 1000 * MINUTE).start()
+    yield server
+    server.stop()
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    # 다시 요청하기 전 기다리는 시간은 기록만 한다
+    sleeps = []
+    monkeypatch.setattr(candledownloader, 'time', type('time', (), {'sleep': staticmethod(sleeps.append)}))
+    return sleeps
+
+def make_downloader(server, store, retries = 3):
+    return CandleDownloader(store, make_client(base_url=server.base_url, connections=2), connections=2, retries=retries)
+
+def assert_store_matches(server, store, symbol, timeframe, unit):
+    expected = server.candles(symbol, unit, count=10 ** 6)[::-1]
+    arrays = store.load_arrays(symbol, timeframe)
+    assert arrays['timestamp'].tolist() == [candle['timestamp'] for candle in expected]
+    assert np.array_equal(arrays['close'], [candle['trade_price'] for candle in expected])
+    assert np.array_equal(arrays['volume'], [candle['candle_acc_trade_volume'] for candle in expected])
+
+def test_download_all_pages(server, tmp_path, sleeps):
+    store = CandleStore(tmp_path / 'candles')
+    results = make_downloader(server, store).download(timeframes=['1m', '5m'])
+    assert results == {('BTC', '1m'): 1000, ('ETH', '1m'): 500, ('BTC', '5m'): 200, ('ETH', '5m'): 100}
+    for symbol in ('BTC', 'ETH'):
+        assert_store_matches(server, store, symbol, '1m', 1)
+        assert_store_matches(server, store, symbol, '5m', 5)
+    # BTC 1m: 200 개씩 5 페이지 + 빈 페이지
+    btc_requests = [request for request in server.requests if request['market'] == 'KRW-BTC' and request['path'].endswith('/1')]
+    assert len(btc_requests) == 6
+    assert 'to' not in btc_requests[0]
+    assert sleeps == []
+
+def test_resume_fetches_only_new_candles_and_dedups(server, tmp_path, sleeps):
+    store = CandleStore(tmp_path / 'candles')
+    downloader = make_downloader(server, store)
+    downloader.download(symbols=['BTC'], timeframes=['1m'])
+
+    # 이어서 받을 때는 마지막 저장 캔들 이후만 (마지막 캔들 포함) 받고, 다시 받은 캔들은 새 값으로 바뀐다
+    server.now += 250 * MINUTE
+    server.revision = 1
+    server.requests.clear()
+    assert downloader.download(symbols=['BTC'], timeframes=['1m']) == {('BTC', '1m'): 250}
+    arrays = store.load_arrays('BTC', '1m')
+    assert len(arrays['timestamp']) == 1250
+    assert (np.diff(arrays['timestamp']) == MINUTE).all()
+    assert arrays['close'][-251] == (T0 + 999 * MINUTE) // MINUTE + 1
+    assert arrays['close'][-252] == (T0 + 998 * MINUTE) // MINUTE
+    # 최신 2 페이지 + 상장 시점까지 받았는지 확인하는 요청 1 번
+    assert len(server.requests) == 3
+
+    # since 이전은 이미 있으므로 최신 페이지만 받는다
+    server.requests.clear()
+    assert downloader.download(symbols=['BTC'], timeframes=['1m'], since=T0 + 100 * MINUTE) == {('BTC', '1m'): 0}
+    assert len(server.requests) == 1
+
+def test_retry_after_too_many_requests(server, tmp_path, sleeps):
+    store = CandleStore(tmp_path / 'candles')
+    server.too_many_requests = 2
+    results = make_downloader(server, store).download(symbols=['BTC'], timeframes=['1m'])
+    assert results == {('BTC', '1m'): 1000}
+    assert sleeps == [1, 2]
+    assert_store_matches(server, store, 'BTC', '1m', 1)
+
+def test_gives_up_after_retries(server, tmp_path, sleeps):
+    store = CandleStore(tmp_path / 'candles')
+    server.too_many_requests = 2
+    results = make_downloader(server, store, retries=1).download(symbols=['BTC'], timeframes=['1m'])
+    assert results == {('BTC', '1m'): -1}
+    assert sleeps == [1]
+    assert store.last_timestamp('BTC', '1m') is None
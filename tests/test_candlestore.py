@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+
+from ata.data.candlestore import CandleStore, read_candles
+
+def make_csv(path, n = 200, timestamp = False):
+    rng = np.random.default_rng(0)
+    close = 1e8 + np.cumsum(rng.normal(0, 1e4, n))
+    # 시간대가 없는 KST, UTC 로 저장하면 월 경계(KST 09:00)를 지나도록
+    datetime = pd.date_range('2024-02-01 08:00:00', periods=n, freq='min')
+    df = pd.DataFrame({
+        'datetime': datetime.astype(str),
+        'open': close,
+        'high': close + 1e4,
+        'low': close - 1e4,
+        'close': close,
+        'baseVolume': rng.random(n),
+        'percentage': 1.0
+    })
+    if timestamp:
+        df.insert(0, 'timestamp', datetime.tz_localize('Asia/Seoul').tz_convert(None).to_numpy().astype('datetime64[ms]').astype(np.int64))
+    df.to_csv(path, index=False)
+    return df
+
+def test_load_matches_csv(tmp_path):
+    csv_path = tmp_path / 'BTC.csv'
+    make_csv(csv_path)
+    store = CandleStore(tmp_path / 'candles')
+    assert store.import_csv(csv_path, 'BTC') == 200
+    assert store.partitions('BTC') == ['2024-01', '2024-02']
+
+    expected = read_candles(str(csv_path))
+    data = read_candles(str(tmp_path / 'candles'))
+    assert list(data.columns) == ['datetime', 'timestamp'] + list(expected.columns[1:])
+    assert (data['datetime'].astype(str) == expected['datetime']).all()
+    # timestamp 는 UTC
+    utc = pd.to_datetime(expected['datetime']).dt.tz_localize('Asia/Seoul').dt.tz_convert(None)
+    assert (data['timestamp'].to_numpy() == utc.to_numpy().astype('datetime64[ms]').astype(np.int64)).all()
+    pd.testing.assert_frame_equal(data[expected.columns[1:]], expected[expected.columns[1:]])
+
+def test_load_keeps_csv_timestamp_column(tmp_path):
+    csv_path = tmp_path / 'BTC.csv'
+    make_csv(csv_path, timestamp=True)
+    store = CandleStore(tmp_path / 'candles')
+    store.import_csv(csv_path, 'BTC')
+    expected = read_candles(str(csv_path))
+    data = read_candles(str(tmp_path / 'candles'))
+    # csv 와 같은 컬럼 (순서만 datetime 이 먼저)
+    assert sorted(data.columns) == sorted(expected.columns)
+    assert (data['timestamp'].to_numpy() == expected['timestamp'].to_numpy()).all()
+    assert (data['datetime'].astype(str) == expected['datetime']).all()
+
+def test_write_merges_and_dedups(tmp_path):
+    csv_path = tmp_path / 'BTC.csv'
+    df = make_csv(csv_path)
+    store = CandleStore(tmp_path / 'candles')
+    store.write('BTC', '1m', df.iloc[:120])
+    revised = df.iloc[100:].copy()
+    revised['close'] += 1
+    assert store.write('BTC', '1m', revised) == 80
+    data = store.load('BTC')
+    assert len(data) == 200
+    assert (data['close'].to_numpy()[100:] == revised['close'].to_numpy()).all()
+    assert (np.diff(data['timestamp'].to_numpy()) == 60 * 1000).all()
+
+def test_single_month_is_memmap_view(tmp_path):
+    csv_path = tmp_path / 'BTC.csv'
+    make_csv(csv_path)
+    expected = read_candles(str(csv_path))
+    store = CandleStore(tmp_path / 'candles')
+    store.import_csv(csv_path, 'BTC')
+    # 2024-02 안의 구간은 파일을 매핑한 그대로 (복사 없음)
+    arrays = store.load_arrays('BTC', start='2024-02-01 09:10:00', end='2024-02-01 10:00:00')
+    assert len(arrays['close']) == 50
+    for values in arrays.values():
+        assert isinstance(values, np.memmap)
+        assert not values.flags.writeable
+    assert (arrays['close'] == expected['close'].to_numpy()[70:120]).all()
+    # 월 경계를 지나면 이어 붙인 복사본
+    arrays = store.load_arrays('BTC', start='2024-02-01 08:30:00', end='2024-02-01 09:30:00')
+    assert len(arrays['close']) == 60
+    assert not isinstance(arrays['close'], np.memmap)
+    # CandleSeries 는 월별 memmap 을 그대로 들고 있다
+    assert all(isinstance(arrays['close'], np.memmap) for arrays in store.series('BTC').partitions)
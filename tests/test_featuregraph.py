@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+from ata.utils import trade
+from ata.utils.featuregraph import FeaturePlan, bollinger_mfi_features
+
+def make_ohlcv(n, seed = 0):
+    rng = np.random.default_rng(seed)
+    close = 1e6 * np.exp(np.cumsum(rng.normal(0, 2e-3, n)))
+    high = close * (1 + rng.random(n) * 2e-3)
+    low = close * (1 - rng.random(n) * 2e-3)
+    volume = rng.random(n) * 10
+    return pd.DataFrame({'high': high, 'low': low, 'close': close, 'volume': volume})
+
+def test_stream_matches_batch():
+    plan = FeaturePlan(bollinger_mfi_features(20, 2, 14))
+    df = make_ohlcv(200)
+    expected = plan.compute(df)
+    stream = plan.stream()
+    for i in range(len(df)):
+        # 진행 중인 봉을 한 번 다른 값으로 받은 뒤 마감된 값으로 수정
+        candle = df.iloc[i].to_dict()
+        stream.push(i, {key: value * 1.01 for key, value in candle.items()})
+        values = stream.push(i, candle)
+        for key in ('upper_band20_2', 'lower_band20_2', 'bollinger_b20_2', 'mfi14'):
+            np.testing.assert_allclose(values[key], expected[key][i], rtol=1e-9, atol=1e-9, equal_nan=True)
+
+def test_batch_signals_match_check_functions():
+    plan = FeaturePlan(bollinger_mfi_features(20, 2, 14))
+    df = make_ohlcv(400, seed=1)
+    oversold, overbought = trade.check_bollinger_mfi_features(plan.compute(df))
+    for i in range(30, len(df)):
+        window = df.iloc[:i + 1]
+        assert oversold[i] == trade.check_oversold_by_bollinger_mfi(window)
+        assert overbought[i] == trade.check_overbought_by_bollinger_mfi(window)
+
+def test_flat_window_has_zero_band_width():
+    plan = FeaturePlan(bollinger_mfi_features(20, 2, 14))
+    df = make_ohlcv(200, seed=2)
+    # 변동 뒤에 가격이 멈춘 구간
+    df.loc[120:160, ['high', 'low', 'close']] = df.loc[120, 'close']
+    expected = plan.compute(df)
+    assert np.all(expected['std20'][139:161] == 0)
+    assert np.all(expected['upper_band20_2'][139:161] == df['close'][139:161])
+    stream = plan.stream()
+    for i in range(len(df)):
+        values = stream.push(i, df.iloc[i].to_dict())
+        for key in ('std20', 'upper_band20_2', 'lower_band20_2', 'mfi14'):
+            np.testing.assert_allclose(values[key], expected[key][i], rtol=1e-9, atol=1e-6, equal_nan=True)
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ata.utils import indicatorkernel
+
+def make_ohlcv(n, seed = 0):
+    rng = np.random.default_rng(seed)
+    close = 1e6 * np.exp(np.cumsum(rng.normal(0, 2e-3, n)))
+    high = close * (1 + rng.random(n) * 2e-3)
+    low = close * (1 - rng.random(n) * 2e-3)
+    volume = rng.random(n) * 10
+    # 같은 가격이 이어지는 구간 (money flow 0, 고가 = 저가)
+    close[100:130] = high[100:130] = low[100:130] = close[100]
+    return high, low, close, volume
+
+def pandas_mfi(high, low, close, volume, period):
+    typical_price = (pd.Series(high) + pd.Series(low) + pd.Series(close)) / 3
+    raw_money_flow = typical_price * pd.Series(volume)
+    positive_money_flow = pd.Series(np.where(typical_price > typical_price.shift(1), raw_money_flow, 0))
+    negative_money_flow = pd.Series(np.where(typical_price < typical_price.shift(1), raw_money_flow, 0))
+    positive_mf_sum = positive_money_flow.rolling(window=period).sum()
+    negative_mf_sum = negative_money_flow.rolling(window=period).sum()
+    return (100 - (100 / (1 + positive_mf_sum / negative_mf_sum))).to_numpy()
+
+def pandas_williams_r(high, low, close, period):
+    highest = pd.Series(high).rolling(window=period).max()
+    lowest = pd.Series(low).rolling(window=period).min()
+    return ((highest - pd.Series(close)) / (highest - lowest) * -100).to_numpy()
+
+def kernels():
+    '''
+    (이름, mfi 커널, williams %r 커널), numba 커널은 설치된 경우에만
+    '''
+    yield 'numpy', indicatorkernel._mfi_numpy, indicatorkernel._williams_r_numpy
+    # numba 로 컴파일하는 반복문을 파이썬으로 실행
+    yield 'loop', indicatorkernel._mfi_loop, indicatorkernel._williams_r_loop
+
+@pytest.mark.parametrize('name, mfi_kernel, williams_r_kernel', list(kernels()))
+@pytest.mark.parametrize('n', [1, 9, 14, 15, 500])
+def test_kernels_match_pandas(name, mfi_kernel, williams_r_kernel, n):
+    high, low, close, volume = make_ohlcv(500)
+    high, low, close, volume = high[:n], low[:n], close[:n], volume[:n]
+    np.testing.assert_allclose(
+        mfi_kernel((high + low + close) / 3, volume, 14), pandas_mfi(high, low, close, volume, 14),
+        rtol=1e-9, atol=1e-9, equal_nan=True
+    )
+    np.testing.assert_allclose(
+        williams_r_kernel(high, low, close, 10), pandas_williams_r(high, low, close, 10),
+        rtol=1e-9, equal_nan=True
+    )
+
+@pytest.mark.parametrize('name, mfi_kernel, williams_r_kernel', list(kernels()))
+@pytest.mark.parametrize('column', [0, 1, 2, 3])
+def test_kernels_match_pandas_with_nan(name, mfi_kernel, williams_r_kernel, column):
+    arrays = [array.copy() for array in make_ohlcv(200, seed=3)]
+    arrays[column][[20, 21, 60, 199]] = np.nan
+    high, low, close, volume = arrays
+    np.testing.assert_allclose(
+        mfi_kernel((high + low + close) / 3, volume, 14), pandas_mfi(high, low, close, volume, 14),
+        rtol=1e-9, atol=1e-9, equal_nan=True
+    )
+    np.testing.assert_allclose(
+        williams_r_kernel(high, low, close, 10), pandas_williams_r(high, low, close, 10),
+        rtol=1e-9, equal_nan=True
+    )
+
+def test_rolling_functions_use_backend():
+    high, low, close, volume = make_ohlcv(300, seed=1)
+    np.testing.assert_allclose(
+        indicatorkernel.rolling_mfi(high, low, close, volume, 14), pandas_mfi(high, low, close, volume, 14),
+        rtol=1e-9, atol=1e-9, equal_nan=True
+    )
+    np.testing.assert_allclose(
+        indicatorkernel.rolling_mfi_from_typical_price((high + low + close) / 3, volume, 14), pandas_mfi(high, low, close, volume, 14),
+        rtol=1e-9, atol=1e-9, equal_nan=True
+    )
+    np.testing.assert_allclose(
+        indicatorkernel.rolling_williams_r(high, low, close, 10), pandas_williams_r(high, low, close, 10),
+        rtol=1e-9, equal_nan=True
+    )
+
+def test_numba_kernels_match_numpy():
+    numba = pytest.importorskip('numba')
+    mfi_kernel = numba.njit(error_model='numpy')(indicatorkernel._mfi_loop)
+    williams_r_kernel = numba.njit(error_model='numpy')(indicatorkernel._williams_r_loop)
+    high, low, close, volume = make_ohlcv(5000, seed=2)
+    volume[[300, 301, 2000]] = np.nan
+    high[[1000, 4000]] = np.nan
+    typical_price = (high + low + close) / 3
+    for period in (1, 10, 14, 60):
+        np.testing.assert_allclose(
+            mfi_kernel(typical_price, volume, period), indicatorkernel._mfi_numpy(typical_price, volume, period),
+            rtol=1e-9, atol=1e-9, equal_nan=True
+        )
+        np.testing.assert_allclose(
+            williams_r_kernel(high, low, close, period), indicatorkernel._williams_r_numpy(high, low, close, period),
+            rtol=1e-9, equal_nan=True
+        )
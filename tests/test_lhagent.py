@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+
+from ata.agent.lhagent import LHAgent
+from ata.exchange.offlineexchangesimulator import OfflineExchangeSimulator, load_offline_data
+from ata.utils import trade
+from ata.utils.featuregraph import FeaturePlan, bollinger_mfi_features
+from test_signalbacktester import make_candles
+
+def make_agent(exchange, **kwargs):
+    return LHAgent(
+        exchange=exchange,
+        wait_time_for_buy_order=60,
+        wait_time_for_sell_order=60,
+        wait_time_for_cancel_sell_order=60,
+        only_btc=True,
+        end_condition=0.5,
+        debug=False,
+        **kwargs
+    )
+
+def agent_signal(agent, item):
+    agent._prepare_timing({item})
+    return agent._is_buy_timing(item), agent._is_sell_timing(item)
+
+def plan_signal(plan, frame, params = (20, 2, 14)):
+    # 같은 캔들을 FeaturePlan 으로 한 번에 계산한 마지막 값
+    oversold, overbought = trade.check_bollinger_mfi_features(plan.compute(frame), *params)
+    return bool(oversold[-1]), bool(overbought[-1])
+
+def test_offline_signals_match_plan():
+    data = load_offline_data(make_candles(6600))
+    exchange = OfflineExchangeSimulator(data=data)
+    agent = make_agent(exchange)
+    exchange.init()
+    oversold, overbought = trade.check_bollinger_mfi_features(FeaturePlan(bollinger_mfi_features(20, 2, 14)).compute(data))
+    found = 0
+    while exchange.update():
+        signal = agent_signal(agent, 'BTC')
+        assert signal == (oversold[exchange.idx], overbought[exchange.idx])
+        found += signal[0] or signal[1]
+    assert found > 0
+    # 한 종목은 하나의 stream 으로 계속 갱신
+    assert list(agent.feature_streams) == ['BTC']
+
+class FrameExchange:
+    '''
+    1분봉 df 를 직접 정하는 거래소 (진행 중인 봉, 끊긴 구간)
+    '''
+    def __init__(self):
+        self.frame = None
+
+    def get_ohlcv_per_1m(self, item):
+        return self.frame
+
+def test_live_signals_match_plan_with_revisions_and_gaps():
+    data = load_offline_data(make_candles(1200, seed=3))
+    data.index = pd.date_range('2024-01-01 09:00', periods=len(data), freq='min')
+    params = (30, 1.5, 10)
+    plan = FeaturePlan(bollinger_mfi_features(*params))
+    exchange = FrameExchange()
+    agent = make_agent(exchange, bollinger_period=params[0], bollinger_num_std_dev=params[1], mfi_peirod=params[2])
+    rng = np.random.default_rng(0)
+    found = 0
+    end = 200
+    while end < len(data):
+        closed = data.iloc[end - 200:end]
+        # 진행 중인 봉은 여러 번 바뀐 뒤 마감된다
+        for scale in (1 + rng.normal(0, 2e-3, 2)).tolist() + [1.0]:
+            frame = closed.copy()
+            frame.iloc[-1, frame.columns.get_indexer(['high', 'low', 'close'])] *= scale
+            frame.iloc[-1, frame.columns.get_loc('volume')] *= scale
+            exchange.frame = frame
+            signal = agent_signal(agent, 'BTC')
+            assert signal == plan_signal(plan, frame, params)
+            found += signal[0] or signal[1]
+        # 가끔 df 길이보다 긴 구간을 건너뛴다 (재연결)
+        end += 1 if rng.random() > 0.02 else 300
+    assert found > 0
@@ -0,0 +1,80 @@
+import os
+import stat
+import sys
+import threading
+import time
+from multiprocessing import AuthenticationError
+
+import ccxt
+import pytest
+
+from ata.exchange.marketdatadaemon import AUTHKEY_ENV, MarketDataClient, MarketDataDaemon, authkey_path
+
+pytestmark = pytest.mark.skipif(sys.platform == 'win32', reason='unix socket')
+
+class FakeExchange:
+    def __init__(self):
+        self.requests = 0
+
+    def fetch_tickers(self):
+        self.requests += 1
+        return {'BTC/KRW': {'symbol': 'BTC/KRW', 'close': 100.0, 'percentage': None}}
+
+    def fetch_order_book(self, symbol):
+        raise ccxt.BadSymbol(f'unknown symbol {symbol}')
+
+@pytest.fixture
+def daemon(tmp_path, monkeypatch):
+    monkeypatch.delenv(AUTHKEY_ENV, raising=False)
+    address = str(tmp_path / 'ata' / 'market_data.sock')
+    daemon = MarketDataDaemon(address=address)
+    daemon.exchange = FakeExchange()
+    thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 5
+    while not os.path.exists(address) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    yield daemon
+    daemon.close()
+
+def mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+def test_socket_and_authkey_are_private(daemon):
+    assert mode(os.path.dirname(daemon.address)) == 0o700
+    assert mode(daemon.address) == 0o600
+    assert mode(authkey_path(daemon.address)) == 0o600
+    with open(authkey_path(daemon.address), 'rb') as f:
+        assert len(f.read()) == 64
+
+def test_client_reads_authkey_and_shares_cache(daemon):
+    client = MarketDataClient(daemon.address)
+    assert client.fetch_tickers()['BTC/KRW']['close'] == 100.0
+    assert client.fetch_tickers()['BTC/KRW']['percentage'] is None
+    assert daemon.exchange.requests == 1
+
+def test_errors_keep_their_type(daemon):
+    client = MarketDataClient(daemon.address)
+    with pytest.raises(ccxt.BadSymbol):
+        client.fetch_order_book('XXX/KRW')
+    with pytest.raises(ValueError):
+        client._MarketDataClient__request('unknown')
+
+def test_wrong_authkey_is_rejected(daemon):
+    client = MarketDataClient(daemon.address, authkey=b'ata')
+    with pytest.raises(AuthenticationError):
+        client.fetch_tickers()
+
+def test_client_requires_authkey(tmp_path, monkeypatch):
+    monkeypatch.delenv(AUTHKEY_ENV, raising=False)
+    client = MarketDataClient(str(tmp_path / 'market_data.sock'))
+    with pytest.raises(RuntimeError):
+        client.fetch_tickers()
+
+def test_shared_directory_is_refused(tmp_path, monkeypatch):
+    monkeypatch.delenv(AUTHKEY_ENV, raising=False)
+    shared = tmp_path / 'shared'
+    shared.mkdir()
+    shared.chmod(0o777)
+    with pytest.raises(PermissionError):
+        MarketDataDaemon(address=str(shared / 'market_data.sock')).serve_forever()
@@ -0,0 +1,74 @@
+import pandas as pd
+import pytest
+
+from ata.exchange.marketrecorder import MarketRecorder, read_market_records
+from ata.exchange.replayexchange import ReplayExchange
+
+def make_ticker(price):
+    return {'close': price, 'last': price, 'percentage': 0.0}
+
+def make_frame(start, n):
+    index = pd.RangeIndex(start, start + n)
+    return pd.DataFrame({'open': 1.0, 'high': 1.0, 'low': 1.0, 'close': 1.0, 'volume': 1.0}, index=index)
+
+def test_refuses_to_append_to_existing_record(tmp_path):
+    path = tmp_path / 'session.rec'
+    recorder = MarketRecorder(path)
+    recorder.record_init()
+    recorder.close()
+    with pytest.raises(FileExistsError):
+        MarketRecorder(path)
+    # 빈 파일은 새로 기록
+    empty = tmp_path / 'empty.rec'
+    empty.touch()
+    MarketRecorder(empty).close()
+
+def test_init_records_full_state_again(tmp_path):
+    path = tmp_path / 'session.rec'
+    recorder = MarketRecorder(path)
+    recorder.record_init()
+    recorder.record_tick(1.0, {'BTC/KRW': make_ticker(100)}, {})
+    recorder.record_ohlcv('BTC', '1m', make_frame(0, 5))
+    recorder.record_init()
+    recorder.record_tick(2.0, {'BTC/KRW': make_ticker(100)}, {})
+    recorder.record_ohlcv('BTC', '1m', make_frame(1, 5))
+    recorder.close()
+
+    records = list(read_market_records(path))
+    assert [record[0] for record in records] == ['init', 'tick', 'ohlcv', 'init', 'tick', 'ohlcv']
+    # init 이후에는 바뀌지 않은 ticker 와 이전 df 와 겹치는 캔들도 다시 기록
+    assert records[4][2] == {'BTC/KRW': make_ticker(100)}
+    assert isinstance(records[5][3], pd.DataFrame)
+
+def test_replay_resets_market_on_init(tmp_path):
+    path = tmp_path / 'session.rec'
+    recorder = MarketRecorder(path)
+    recorder.record_init()
+    for time in (1.0, 2.0):
+        recorder.record_tick(time, {'BTC/KRW': make_ticker(100), 'ETH/KRW': make_ticker(10)}, {'ETH': {'warning': False}})
+        recorder.record_ohlcv('ETH', '1m', make_frame(0, 5))
+        recorder.record_order_book('ETH', {'bids': [], 'asks': []})
+    # 기록한 세션의 거래소가 다시 init (ETH 는 더 이상 받지 않음)
+    recorder.record_init()
+    for time in (3.0, 4.0):
+        recorder.record_tick(time, {'BTC/KRW': make_ticker(101)}, {})
+        recorder.record_ohlcv('BTC', '1m', make_frame(0, 5))
+    recorder.close()
+
+    exchange = ReplayExchange(path)
+    exchange.init()
+    assert exchange.get_time() == 2.0
+    assert set(exchange.get_tickers()) == {'BTC/KRW', 'ETH/KRW'}
+    assert exchange.get_ohlcv_per_1m('ETH') is not None
+
+    assert exchange.update()
+    assert exchange.get_time() == 3.0
+    assert set(exchange.get_tickers()) == {'BTC/KRW'}
+    assert exchange.get_market_events() == {}
+    assert exchange.get_ohlcv_per_1m('ETH') is None
+    with pytest.raises(KeyError):
+        exchange.get_order_book('ETH')
+    assert len(exchange.get_ohlcv_per_1m('BTC')) == 5
+
+    assert exchange.update()
+    assert not exchange.update()
@@ -0,0 +1,183 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ata.data.candlestore import CandleStore
+from ata.exchange.multiofflineexchangesimulator import DAY_MINUTES, MultiOfflineExchangeSimulator
+from ata.utils.markerorderpriceunit import upbit_price_unit
+
+N = 3000
+OHLCV_LEN = 10
+# 종목: (첫 분, 마지막 분 + 1, 캔들이 없는 분, 가격)
+SYMBOLS = {
+    'BTC': (0, N, list(range(1000, 1005)) + list(range(2000, 2010)), 1e8),
+    # 상장 후 상장 폐지
+    'ETH': (1200, 2500, [1300], 3e6),
+    'XRP': (0, N, [], 800.0)
+}
+
+def make_grid():
+    '''
+    return: 종목별 [N, 5] ohlcv (캔들이 없는 분은 nan)
+    '''
+    rng = np.random.default_rng(0)
+    grids = {}
+    for symbol, (first, last, missing, price) in SYMBOLS.items():
+        close = price * np.exp(np.cumsum(rng.normal(0, 2e-3, N)))
+        high = close * (1 + rng.random(N) * 2e-3)
+        low = close * (1 - rng.random(N) * 2e-3)
+        volume = rng.random(N) * 10
+        volume[rng.random(N) < 0.05] = 0.0
+        # csv 로 쓰고 읽어도 같은 값이 되도록 자릿수를 줄인다
+        grid = np.column_stack([np.round(np.column_stack([close, high, low, close]), 4), np.round(volume, 6)])
+        grid[:first] = np.nan
+        grid[last:] = np.nan
+        grid[missing] = np.nan
+        grids[symbol] = grid
+    return grids
+
+def write_csvs(path, grids):
+    path.mkdir()
+    # 시간대가 없는 KST, 첫 분이 KST 0시
+    datetime = pd.date_range('2024-01-01 00:00:00', periods=N, freq='min')
+    for symbol, grid in grids.items():
+        has_candle = ~np.isnan(grid[:, 3])
+        df = pd.DataFrame(grid[has_candle], columns=['open', 'high', 'low', 'close', 'baseVolume'])
+        df.insert(0, 'datetime', datetime[has_candle].astype(str))
+        df.to_csv(path / f'{symbol}.csv', index=False)
+    return path
+
+@pytest.fixture(scope='module')
+def grids():
+    return make_grid()
+
+@pytest.fixture(scope='module')
+def csv_path(tmp_path_factory, grids):
+    return write_csvs(tmp_path_factory.mktemp('multi') / 'csv', grids)
+
+def expected_values(grid):
+    '''
+    brute force: 직전 종가로 채운 종가, 최근 24시간 거래대금, 전일(KST) 종가 대비 %
+    '''
+    close = pd.Series(grid[:, 3]).ffill().to_numpy()
+    trade_price = np.nan_to_num(grid[:, 3] * grid[:, 4])
+    acc = np.array([trade_price[max(0, i - DAY_MINUTES + 1):i + 1].sum() for i in range(N)])
+    prev_day_close = np.full(N, np.nan)
+    for i in range(DAY_MINUTES, N):
+        prev_day_close[i] = close[i // DAY_MINUTES * DAY_MINUTES - 1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percentage = (close / prev_day_close - 1) * 100
+    return close, acc, percentage
+
+def run(exchange):
+    exchange.init()
+    yield exchange
+    while exchange.update():
+        yield exchange
+
+def test_tickers_match_brute_force(csv_path, grids):
+    expected = {symbol: expected_values(grid) for symbol, grid in grids.items()}
+    exchange = MultiOfflineExchangeSimulator(str(csv_path), ohlcv_len=OHLCV_LEN)
+    ticks = 0
+    for exchange in run(exchange):
+        idx = exchange.idx
+        ticks += 1
+        for symbol, (first, last, _, _) in SYMBOLS.items():
+            market = symbol + '/KRW'
+            # 상장 전, 상장 폐지 후에는 ticker, 분봉이 없다
+            listed = first <= idx < last
+            assert (market in exchange.tickers) == listed
+            assert exchange.is_listed(symbol) == listed
+            if not listed:
+                assert exchange.get_ohlcv_per_1m(symbol) is None
+                continue
+            close, acc, percentage = (values[idx] for values in expected[symbol])
+            ticker = exchange.tickers[market]
+            assert ticker['close'] == close
+            assert ticker['info']['acc_trade_price_24h'] == pytest.approx(acc, rel=1e-9, abs=1e-6)
+            np.testing.assert_allclose(ticker['percentage'], percentage, rtol=1e-9, equal_nan=True)
+    assert ticks == N - 60 * OHLCV_LEN + 1
+    # 상장 후 첫 날은 전일 종가가 없다
+    assert np.isnan(expected['ETH'][2][1300]) and not np.isnan(expected['ETH'][2][DAY_MINUTES])
+
+def test_kst_day_boundary(csv_path, grids):
+    # 시간대 없는 KST csv 도 KST 0시에 전일 종가를 갱신 (UTC 로 저장되므로 기본 day_offset_hours=9)
+    exchange = MultiOfflineExchangeSimulator(str(csv_path), ohlcv_len=OHLCV_LEN)
+    close = pd.Series(grids['XRP'][:, 3]).ffill().to_numpy()
+    for exchange in run(exchange):
+        if exchange.idx in (DAY_MINUTES - 1, DAY_MINUTES, 2 * DAY_MINUTES):
+            percentage = exchange.tickers['XRP/KRW']['percentage']
+            if exchange.idx == DAY_MINUTES - 1:
+                assert np.isnan(percentage)
+            else:
+                prev = close[exchange.idx // DAY_MINUTES * DAY_MINUTES - 1]
+                assert percentage == pytest.approx((close[exchange.idx] / prev - 1) * 100)
+
+def test_frames_align_and_fill_gaps(csv_path, grids):
+    exchange = MultiOfflineExchangeSimulator(str(csv_path), ohlcv_len=OHLCV_LEN)
+    checked = set()
+    for exchange in run(exchange):
+        idx = exchange.idx
+        if idx not in (1004, 1005, 1212, 1305, 2009, 2499, N - 1):
+            continue
+        for symbol, (first, last, _, _) in SYMBOLS.items():
+            if not first <= idx < last:
+                continue
+            grid = grids[symbol]
+            frame = exchange.get_ohlcv_per_1m(symbol)
+            start = max(idx - OHLCV_LEN + 1, first)
+            # 모든 종목이 같은 1분 시계 (index 는 시계의 분)
+            assert list(frame.index) == list(range(start, idx + 1))
+            expected = grid[start:idx + 1].copy()
+            missing = np.isnan(expected[:, 3])
+            # 캔들이 없는 분은 직전 종가, 거래량 0
+            filled = pd.Series(grid[:, 3]).ffill().to_numpy()[start:idx + 1]
+            expected[missing, :4] = filled[missing, None]
+            expected[missing, 4] = 0.0
+            np.testing.assert_array_equal(frame.to_numpy(), expected)
+            checked.add((symbol, bool(missing.any())))
+
+            # 5분봉은 채운 1분봉을 시계의 5분 단위로 묶은 것
+            frame5 = exchange.get_ohlcv_per_5m(symbol)
+            start5 = max((idx // 5 - OHLCV_LEN + 1) * 5, first)
+            filled1 = grid[start5:idx + 1].copy()
+            gaps = np.isnan(filled1[:, 3])
+            filled1[gaps, :4] = pd.Series(grid[:, 3]).ffill().to_numpy()[start5:idx + 1][gaps, None]
+            filled1[gaps, 4] = 0.0
+            groups = pd.DataFrame(filled1, columns=['open', 'high', 'low', 'close', 'volume']).groupby(np.arange(start5, idx + 1) // 5)
+            resampled = groups.agg({'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'})
+            np.testing.assert_allclose(frame5.to_numpy(), resampled.to_numpy(), rtol=1e-12)
+    assert ('BTC', True) in checked and ('ETH', True) in checked and ('XRP', False) in checked
+
+def test_order_book_from_last_candle(csv_path, grids):
+    exchange = MultiOfflineExchangeSimulator(str(csv_path), ohlcv_len=OHLCV_LEN)
+    for exchange in run(exchange):
+        if exchange.idx not in (1500, 2005):
+            continue
+        for symbol in ('BTC', 'ETH'):
+            open_, high, low, close, volume = exchange.get_ohlcv_per_1m(symbol).to_numpy()[-1]
+            order_book = exchange.get_order_book(symbol)
+            bid = volume * (close - low) / (high - low) if high > low else volume / 2
+            assert order_book['symbol'] == symbol + '/KRW'
+            assert order_book['bids'] == [[close, pytest.approx(bid)]]
+            assert order_book['asks'] == [[close + upbit_price_unit(symbol, close), pytest.approx(volume - bid)]]
+            assert order_book['timestamp'] == int(exchange.get_time() * 1000)
+            # 같은 틱에는 같은 호가
+            assert exchange.get_order_book(symbol) is order_book
+    # 상장 폐지 후
+    with pytest.raises(KeyError):
+        exchange.get_order_book('ETH')
+
+def test_store_matches_csv_directory(tmp_path, csv_path):
+    store = CandleStore(tmp_path / 'candles')
+    for symbol in SYMBOLS:
+        store.import_csv(csv_path / f'{symbol}.csv', symbol)
+    # block 경계가 틱마다 다른 곳에 오도록
+    from_csv = run(MultiOfflineExchangeSimulator(str(csv_path), ohlcv_len=OHLCV_LEN))
+    from_store = run(MultiOfflineExchangeSimulator(str(tmp_path / 'candles'), ohlcv_len=OHLCV_LEN, block_minutes=97))
+    ticks = 0
+    for a, b in zip(from_csv, from_store):
+        assert a.get_time() == b.get_time()
+        np.testing.assert_equal(a.tickers, b.tickers)
+        ticks += 1
+    assert ticks == N - 60 * OHLCV_LEN + 1
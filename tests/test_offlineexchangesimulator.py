@@ -0,0 +1,57 @@
+import pandas as pd
+import pytest
+
+from ata.exchange.offlineexchangesimulator import OfflineExchangeSimulator, load_offline_data
+from test_signalbacktester import make_candles
+
+OHLCV_LEN = 100
+
+def baseline_resample(data, idx, minute):
+    '''
+    버퍼로 바꾸기 전 OfflineExchangeSimulator 가 매 틱 계산하던 minute 분봉
+    '''
+    columns = ['open', 'high', 'low', 'close', 'volume']
+    temp_data = data[columns].iloc[max(idx + 1 - (minute * OHLCV_LEN), 0):idx + 1]
+    return temp_data.groupby(temp_data.index // minute).agg({
+        'open': 'first',
+        'high': 'max',
+        'low': 'min',
+        'close': 'last',
+        'volume': 'sum'
+    }).reset_index(drop=True)
+
+def assert_frames_match_baseline(exchange, data):
+    idx = exchange.idx
+    pd.testing.assert_frame_equal(
+        exchange.get_ohlcv_per_1m('BTC'),
+        data[['open', 'high', 'low', 'close', 'volume']].iloc[idx + 1 - OHLCV_LEN:idx + 1],
+        check_index_type=False
+    )
+    for minute, frame in ((5, exchange.get_ohlcv_per_5m('BTC')), (15, exchange.get_ohlcv_per_15m('BTC')), (60, exchange.get_ohlcv_per_1h('BTC'))):
+        expected = baseline_resample(data, idx, minute)
+        # 구간이 봉 경계에서 시작하지 않으면 baseline 은 앞에 일부 분만 담긴 봉이 하나 더 있다
+        start = idx + 1 - minute * OHLCV_LEN
+        assert len(expected) == (OHLCV_LEN + 1 if start % minute else OHLCV_LEN)
+        assert len(frame) == OHLCV_LEN
+        # 마지막 봉은 진행 중인 봉
+        assert frame['volume'].iloc[-1] == pytest.approx(data['volume'].iloc[idx // minute * minute:idx + 1].sum())
+        pd.testing.assert_frame_equal(frame, expected.iloc[-OHLCV_LEN:].reset_index(drop=True), check_exact=False, rtol=1e-12)
+
+def test_resampled_frames_match_baseline():
+    data = load_offline_data(make_candles(6600))
+    exchange = OfflineExchangeSimulator(data=data)
+    exchange.init()
+    # 1시간봉 경계를 여러 번 지나도록
+    for _ in range(150):
+        assert_frames_match_baseline(exchange, data)
+        exchange.update()
+
+def test_resampled_frames_after_skipped_ticks():
+    data = load_offline_data(make_candles(6600))
+    exchange = OfflineExchangeSimulator(data=data)
+    exchange.init()
+    # 틱을 건너뛰면 구간 전체를 다시 채운다
+    for skip in (1, 7, 59, 100):
+        exchange.idx += skip
+        exchange.update()
+        assert_frames_match_baseline(exchange, data)
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ata.utils.ohlcvbuffer import COLUMNS, OHLCVBuffer
+
+def make_candle(t, revision = 0):
+    return [t, t + 0.1, t + 0.5 + revision, t - 0.5, t + 0.2 + revision, 1.0 + revision]
+
+def assert_buffer_matches(buffer, candles):
+    expected = candles[-buffer.capacity:]
+    assert len(buffer) == len(expected)
+    assert buffer.tolist() == expected
+    assert buffer.last('timestamp') == expected[-1][0]
+    frame = buffer.frame
+    assert frame.values.tolist() == [candle[1:] for candle in expected]
+    assert list(frame.columns) == list(COLUMNS[1:])
+
+def test_wraparound_matches_list_tail():
+    capacity = 7
+    buffer = OHLCVBuffer(capacity=capacity)
+    candles = []
+    # 2 * capacity 보다 많이 넣어서 쓰는 위치가 여러 번 돌아가도록
+    for t in range(3 * capacity + 2):
+        candles.append(make_candle(t))
+        buffer.append(*candles[-1])
+        assert_buffer_matches(buffer, candles)
+
+def test_double_write_keeps_contiguous_view():
+    capacity = 5
+    buffer = OHLCVBuffer(capacity=capacity)
+    for t in range(2 * capacity + 3):
+        buffer.append(*make_candle(t))
+        # 두 번 쓴 값은 항상 같다
+        assert np.array_equal(buffer._data[:, :capacity], buffer._data[:, capacity:], equal_nan=True)
+        view = buffer.view()
+        # 경계를 넘어도 복사 없이 한 구간으로 읽는다
+        assert np.shares_memory(view, buffer._data)
+        assert not view.flags.writeable
+        assert view[0].tolist() == list(range(max(t + 1 - capacity, 0), t + 1))
+    with pytest.raises(ValueError):
+        buffer.close[0] = 0
+
+def test_update_last_on_in_progress_candle():
+    capacity = 4
+    buffer = OHLCVBuffer(capacity=capacity)
+    with pytest.raises(IndexError):
+        buffer.update_last(*make_candle(0))
+    candles = []
+    for t in range(2 * capacity + 1):
+        # 진행 중인 캔들은 여러 번 바뀐 뒤 다음 캔들이 시작된다
+        for revision in range(3):
+            candle = make_candle(t, revision)
+            buffer.push(*candle)
+            if revision == 0:
+                candles.append(candle)
+            else:
+                candles[-1] = candle
+            assert_buffer_matches(buffer, candles)
+
+    # 값이 같으면 df 를 다시 만들지 않는다
+    frame = buffer.frame
+    buffer.update_last(*candles[-1])
+    assert buffer.frame is frame
+    candles[-1] = make_candle(candles[-1][0], 5)
+    buffer.push(*candles[-1])
+    assert buffer.frame is not frame
+    assert_buffer_matches(buffer, candles)
+    assert len(buffer) == capacity
+
+def test_from_ohlcv_keeps_tail_and_index():
+    candles = [make_candle(t * 60 * 1000) for t in range(10)]
+    buffer = OHLCVBuffer.from_ohlcv(candles, capacity=4, frame_index='datetime')
+    assert_buffer_matches(buffer, candles)
+    # 업비트 캔들 df 처럼 Asia/Seoul 시각
+    assert buffer.frame.index[0] == pd.Timestamp('1970-01-01 09:06:00')
+    buffer = OHLCVBuffer.from_ohlcv(candles, capacity=4, frame_index='timestamp')
+    assert buffer.frame.index.tolist() == [candle[0] for candle in candles[-4:]]
@@ -0,0 +1,65 @@
+from ata.exchange.ohlcvstore import OHLCVStore
+
+MINUTE = 60 * 1000
+
+class FakeExchange:
+    '''
+    minute 분 동안 1분마다 캔들이 하나씩 있는 거래소, fetch_ohlcv 는 ccxt 와 같이 since 이후 오래된 순서로 limit 개
+    '''
+    def __init__(self, minute):
+        self.minute = minute
+        # 진행 중인 마지막 캔들의 거래량
+        self.volume = 1.0
+        self.requests = []
+
+    def milliseconds(self):
+        return self.minute * MINUTE
+
+    def fetch_ohlcv(self, symbol, timeframe, since = None, limit = None):
+        self.requests.append((since, limit))
+        timestamps = [t * MINUTE for t in range(self.minute + 1)]
+        if since is None:
+            timestamps = timestamps[-limit:]
+        else:
+            timestamps = [t for t in timestamps if t >= since][:limit]
+        return [[t, t, t, t, t, 1.0 if t < self.minute * MINUTE else self.volume] for t in timestamps]
+
+def test_refresh_fetches_only_new_candles():
+    exchange = FakeExchange(minute=500)
+    store = OHLCVStore(exchange, maxlen=100)
+    frame = store.refresh('BTC/KRW', '1m')
+    assert len(frame) == 100
+    assert store.get_buffer('BTC/KRW', '1m').last('timestamp') == 500 * MINUTE
+
+    exchange.minute = 503
+    store.refresh('BTC/KRW', '1m')
+    assert exchange.requests[-1] == (500 * MINUTE, 4)
+    assert store.get_buffer('BTC/KRW', '1m').last('timestamp') == 503 * MINUTE
+
+def test_refresh_reloads_after_gap_longer_than_maxlen():
+    exchange = FakeExchange(minute=500)
+    store = OHLCVStore(exchange, maxlen=100)
+    store.refresh('BTC/KRW', '1m')
+
+    # 연결이 끊긴 동안 maxlen 보다 많은 캔들이 지나감
+    exchange.minute = 800
+    frame = store.refresh('BTC/KRW', '1m')
+    assert exchange.requests[-1] == (None, 100)
+    buffer = store.get_buffer('BTC/KRW', '1m')
+    assert buffer.last('timestamp') == 800 * MINUTE
+    assert len(frame) == 100
+    assert frame['close'].iloc[0] == 701 * MINUTE
+
+def test_incremental_refresh_past_capacity():
+    exchange = FakeExchange(minute=10)
+    store = OHLCVStore(exchange, maxlen=20)
+    # 버퍼 크기의 2 배 이상 조금씩 받아도 최근 maxlen 개 캔들과 같다
+    for minute in range(10, 60):
+        exchange.minute = minute
+        for volume in (1.0, 2.0, 3.0):
+            exchange.volume = volume
+            frame = store.refresh('BTC/KRW', '1m')
+            expected = [t * MINUTE for t in range(minute + 1)][-20:]
+            assert frame['close'].tolist() == expected
+            assert frame['volume'].tolist() == [1.0] * (len(expected) - 1) + [volume]
+    assert all(since is not None for since, _ in exchange.requests[1:])
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from ata.exchange.baseexchange import BaseExchange
+from ata.exchange.orderbooksnapshot import OrderBookSnapshot
+
+def make_order_book(bids, asks):
+    # 업비트 ccxt 호가는 [가격, 잔량, None] 형식
+    return {
+        'bids': [[price, size, None] for price, size in bids],
+        'asks': [[price, size, None] for price, size in asks],
+    }
+
+def test_depth_and_level_aggregation():
+    bids = [(100, 1.0), (99, 2.0), (98, 3.0)]
+    asks = [(101, 0.5), (102, 4.0)]
+    snapshot = OrderBookSnapshot(make_order_book(bids, asks))
+    # 호가 깊이와 순서는 그대로
+    assert snapshot.bid_prices.tolist() == [100, 99, 98]
+    assert snapshot.bid_sizes.tolist() == [1.0, 2.0, 3.0]
+    assert snapshot.ask_prices.tolist() == [101, 102]
+    assert snapshot.ask_sizes.tolist() == [0.5, 4.0]
+    # 전체 잔량과 1 / 호가 순위 가중 잔량
+    assert snapshot.bid_volume == sum(size for _, size in bids)
+    assert snapshot.ask_volume == sum(size for _, size in asks)
+    assert snapshot.weighted_bid_volume == pytest.approx(1.0 + 2.0 / 2 + 3.0 / 3)
+    assert snapshot.weighted_ask_volume == pytest.approx(0.5 + 4.0 / 2)
+    assert snapshot.imbalance == pytest.approx(6.0 / 4.5)
+    assert snapshot.weighted_imbalance == pytest.approx(3.0 / 2.5)
+
+def test_empty_side():
+    snapshot = OrderBookSnapshot(make_order_book([(100, 1.0)], []))
+    assert snapshot.ask_prices.shape == (0,)
+    assert snapshot.ask_volume == 0
+    assert snapshot.imbalance == np.inf
+    snapshot = OrderBookSnapshot(make_order_book([], []))
+    assert snapshot.imbalance == 0.0
+    assert snapshot.weighted_imbalance == 0.0
+
+class OrderBookExchange(BaseExchange):
+    def __init__(self):
+        super().__init__()
+        self.order_books = {}
+
+    def get_order_book(self, item):
+        return self.order_books[item]
+
+def test_exchange_rebuilds_snapshot_only_for_new_book():
+    exchange = OrderBookExchange()
+    exchange.order_books['BTC'] = make_order_book([(100, 1.0)], [(101, 1.0)])
+    exchange.order_books['ETH'] = make_order_book([(10, 1.0)], [(11, 3.0)])
+    snapshot = exchange.get_order_book_snapshot('BTC')
+    assert exchange.get_order_book_snapshot('BTC') is snapshot
+    assert exchange.get_order_book_snapshot('ETH').imbalance == pytest.approx(1 / 3)
+    # 새로 받은 호가면 다시 만든다
+    exchange.order_books['BTC'] = make_order_book([(100, 2.0)], [(101, 1.0)])
+    updated = exchange.get_order_book_snapshot('BTC')
+    assert updated is not snapshot
+    assert updated.bid_volume == 2.0
@@ -0,0 +1,105 @@
+from ata.exchange.ordermanager import OrderManager
+
+class StubUpbit:
+    '''
+    주문 목록만 가진 ccxt 클라이언트, closed / canceled 목록은 listed 에 있는 주문만 보여준다 (최근 주문만 주는 업비트처럼)
+    '''
+    def __init__(self):
+        self.orders: dict[str, dict] = {}
+        self.listed: set[str] = set()
+        self.calls = []
+
+    def add(self, order_id, amount = 1.0, status = 'open', filled = 0.0):
+        self.orders[order_id] = {'id': order_id, 'symbol': 'BTC/KRW', 'amount': amount, 'filled': filled, 'status': status}
+        self.listed.add(order_id)
+        return dict(self.orders[order_id])
+
+    def fetch_open_orders(self):
+        self.calls.append('fetch_open_orders')
+        return [dict(order) for order in self.orders.values() if order['status'] == 'open']
+
+    def fetch_closed_orders(self):
+        self.calls.append('fetch_closed_orders')
+        return self.__listed('closed')
+
+    def fetch_canceled_orders(self):
+        self.calls.append('fetch_canceled_orders')
+        return self.__listed('canceled')
+
+    def fetch_order(self, id):
+        self.calls.append(('fetch_order', id))
+        return dict(self.orders[id])
+
+    def __listed(self, status):
+        return [dict(order) for order_id, order in self.orders.items() if order['status'] == status and order_id in self.listed]
+
+def make_manager(exchange):
+    updates = []
+    return OrderManager(exchange, on_update=updates.append), updates
+
+def test_partial_fill_from_open_orders():
+    exchange = StubUpbit()
+    manager, updates = make_manager(exchange)
+    manager.track(exchange.add('1'))
+    # 추적하지 않는 주문은 무시
+    exchange.add('other')
+    exchange.orders['1']['filled'] = 0.4
+    manager.refresh()
+    assert manager.get('1')['filled'] == 0.4
+    assert manager.get('1')['status'] == 'open'
+    assert 'other' not in [order['id'] for order in updates]
+    # 모두 미체결 목록에 있으면 종료된 주문은 조회하지 않는다
+    assert exchange.calls == ['fetch_open_orders']
+
+def test_closed_and_canceled_orders_leave_open_list():
+    exchange = StubUpbit()
+    manager, updates = make_manager(exchange)
+    manager.track(exchange.add('1'))
+    manager.track(exchange.add('2'))
+    manager.track(exchange.add('3'))
+    exchange.orders['1'].update(status='closed', filled=1.0)
+    exchange.orders['2'].update(status='canceled', filled=0.3)
+    manager.refresh()
+    assert exchange.calls == ['fetch_open_orders', 'fetch_closed_orders', 'fetch_canceled_orders']
+    assert manager.get('1')['status'] == 'closed'
+    assert manager.get('2') == {'id': '2', 'symbol': 'BTC/KRW', 'amount': 1.0, 'filled': 0.3, 'status': 'canceled'}
+    assert [order['status'] for order in updates[-3:]] == ['open', 'closed', 'canceled']
+
+    # 종료된 주문은 다시 조회하지 않는다
+    exchange.calls.clear()
+    exchange.orders['3']['status'] = 'closed'
+    manager.refresh()
+    assert exchange.calls == ['fetch_open_orders', 'fetch_closed_orders']
+    manager.refresh()
+    assert exchange.calls == ['fetch_open_orders', 'fetch_closed_orders']
+    manager.get('1')
+    assert ('fetch_order', '1') not in exchange.calls
+
+def test_fetch_order_fallback_for_unlisted_orders():
+    exchange = StubUpbit()
+    manager, updates = make_manager(exchange)
+    manager.track(exchange.add('1'))
+    manager.track(exchange.add('2'))
+    # 두 목록 어디에도 없는 주문만 하나씩 조회
+    exchange.orders['1'].update(status='closed', filled=1.0)
+    exchange.orders['2'].update(status='closed', filled=1.0)
+    exchange.listed.discard('2')
+    manager.refresh()
+    assert exchange.calls == ['fetch_open_orders', 'fetch_closed_orders', 'fetch_canceled_orders', ('fetch_order', '2')]
+    assert manager.get('2')['status'] == 'closed'
+    assert updates[-1]['id'] == '2'
+
+def test_get_fetches_unknown_and_stale_orders():
+    exchange = StubUpbit()
+    manager, _ = make_manager(exchange)
+    exchange.add('1')
+    assert manager.get('1')['status'] == 'open'
+    assert exchange.calls == [('fetch_order', '1')]
+    manager.get('1')
+    assert len(exchange.calls) == 1
+    # 취소 요청한 주문은 다음 get 에서 다시 조회
+    exchange.orders['1']['status'] = 'canceled'
+    manager.mark_stale('1')
+    assert manager.get('1')['status'] == 'canceled'
+    manager.get('1')
+    assert exchange.calls == [('fetch_order', '1'), ('fetch_order', '1')]
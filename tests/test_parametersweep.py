@@ -0,0 +1,50 @@
+import pandas as pd
+import pytest
+
+from ata.backtest import parametersweep
+from test_signalbacktester import make_candles
+
+GRID = {'end_condition': [0.9, 0.95]}
+
+def run_sweep(data, output_path, engine = 'vector', data_name = 'candles.csv'):
+    return parametersweep.sweep(data, GRID, output_path, engine=engine, processes=1, data_name=data_name)
+
+def test_resume_skips_only_same_engine_and_data(tmp_path, capsys):
+    output_path = tmp_path / 'sweep.csv'
+    data = make_candles(6600)
+
+    results = run_sweep(data, output_path)
+    assert len(results) == 2
+    assert set(results['engine']) == {'vector'}
+    assert results['data'].iloc[0] == parametersweep.data_id(parametersweep.load_offline_data(data), 'candles.csv')
+
+    # 같은 engine, 데이터는 이어서 실행할 조합이 없다
+    run_sweep(data, output_path)
+    assert 'pending: 0' in capsys.readouterr().out
+    assert len(pd.read_csv(output_path)) == 2
+
+    # 캔들이 추가된 데이터, 다른 engine 은 다시 실행한다
+    longer = make_candles(6700)
+    results = run_sweep(longer, output_path)
+    assert 'pending: 2' in capsys.readouterr().out
+    assert len(results) == 2
+    results = run_sweep(data, output_path, engine='event')
+    assert 'pending: 2' in capsys.readouterr().out
+    assert len(results) == 2
+    assert len(pd.read_csv(output_path)) == 6
+
+    # 엔진이 달라도 같은 결과
+    vector = run_sweep(data, output_path)
+    columns = ['end_condition', 'final_value', 'total_return']
+    pd.testing.assert_frame_equal(
+        vector[columns].sort_values('end_condition').reset_index(drop=True),
+        results[columns].sort_values('end_condition').reset_index(drop=True)
+    )
+
+def test_refuses_results_without_engine_and_data(tmp_path):
+    output_path = tmp_path / 'sweep.csv'
+    row = dict(parametersweep.PARAMETERS)
+    row.update({'final_value': 100000, 'total_return': 0, 'profit': 0, 'max_drawdown': 0, 'stopped': False})
+    pd.DataFrame([row]).to_csv(output_path, index=False)
+    with pytest.raises(ValueError):
+        run_sweep(make_candles(6600), output_path)
@@ -0,0 +1,102 @@
+import time
+
+import pandas as pd
+import pytest
+
+from ata.exchange.baseexchange import BaseExchange
+from ata.exchange.offlineexchangesimulator import OfflineExchangeSimulator
+from ata.exchange.priceoracle import PriceOracle
+from test_signalbacktester import make_candles
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def make_tickers(**prices):
+    return {f'{item}/KRW': {'last': price, 'close': price} for item, price in prices.items()}
+
+def test_version_changes_only_with_prices():
+    oracle = PriceOracle(clock=Clock())
+    oracle.update(make_tickers(BTC=100, ETH=10))
+    assert oracle.version == 1
+    oracle.update(make_tickers(BTC=100, ETH=10))
+    assert oracle.version == 1
+    # KRW 마켓이 아니거나 가격이 없는 ticker 는 무시
+    oracle.update({'BTC/USDT': {'last': 1}, 'XRP/KRW': {'last': None, 'close': None}})
+    assert oracle.version == 1
+    assert oracle.get('XRP') is None
+    oracle.update(make_tickers(ETH=11))
+    assert oracle.version == 2
+    assert oracle.get('BTC') == 100
+    assert oracle.get('ETH') == 11
+
+def test_staleness_uses_given_clock(monkeypatch):
+    clock = Clock()
+    oracle = PriceOracle(clock=clock, max_staleness=10)
+    assert oracle.get('BTC') is None
+    oracle.update(make_tickers(BTC=100))
+    # 호스트 시각과 관계없이 주어진 시계 기준
+    monkeypatch.setattr(time, 'time', lambda: 0.0)
+    clock.now += 10
+    assert oracle.get('BTC') == 100
+    clock.now += 0.1
+    assert not oracle.is_fresh()
+    assert oracle.get('BTC') is None
+    oracle.update({})
+    assert oracle.get('BTC') == 100
+
+class ClockExchange(BaseExchange):
+    '''
+    시계와 1분봉 종가를 직접 정하는 거래소
+    '''
+    def __init__(self):
+        super().__init__()
+        self.now = 1000.0
+        self.closes = {}
+        self.ohlcv_calls = 0
+
+    def get_time(self):
+        return self.now
+
+    def get_ohlcv_per_1m(self, item):
+        self.ohlcv_calls += 1
+        return pd.DataFrame({'close': [self.closes[item]]})
+
+def test_total_balance_cache_invalidation():
+    exchange = ClockExchange()
+    exchange.balance = {
+        'KRW': {'free': 1000, 'used': 0, 'total': 1000},
+        'BTC': {'free': 2, 'used': 0, 'total': 2},
+    }
+    exchange.price_oracle.update(make_tickers(BTC=100))
+    assert exchange.get_total_balance() == 1200
+    # 가격이 바뀌면 다시 계산
+    exchange.price_oracle.update(make_tickers(BTC=150))
+    assert exchange.get_total_balance() == 1300
+    # 잔고가 바뀌면 다시 계산
+    exchange.balance['BTC']['total'] = 3
+    assert exchange.get_total_balance() == 1450
+    assert exchange.ohlcv_calls == 0
+
+    # 가격이 오래되면 캐시를 쓰지 않고 캔들 종가로 계산
+    exchange.closes['BTC'] = 120
+    exchange.now += exchange.price_oracle.max_staleness + 1
+    assert exchange.get_total_balance() == 1360
+    assert exchange.get_total_balance() == 1360
+    assert exchange.ohlcv_calls == 2
+    exchange.price_oracle.update(make_tickers(BTC=150))
+    assert exchange.get_total_balance() == 1450
+    assert exchange.ohlcv_calls == 2
+
+def test_offline_simulator_uses_simulated_time(monkeypatch):
+    # 과거 데이터를 재생해도 가격은 호스트 시각이 아닌 시뮬레이터 시계 기준으로 최신
+    monkeypatch.setattr(time, 'time', lambda: 4e9)
+    exchange = OfflineExchangeSimulator(data=make_candles(6600))
+    exchange.init()
+    for _ in range(3):
+        exchange.update()
+        assert exchange.price_oracle.is_fresh()
+        assert exchange.get_current_price('BTC') == pytest.approx(exchange.data['close'].iloc[exchange.idx])
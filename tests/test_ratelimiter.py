@@ -0,0 +1,102 @@
+import pytest
+
+from ata.exchange import upbitexchange
+from ata.exchange.upbitexchange import UpbitExchange
+from ata.exchange.upbitratelimitedclient import UPBIT_RATE_LIMITS, UpbitRateLimitedClient
+from ata.utils import ratelimiter
+from ata.utils.ratelimiter import RateLimiter, TokenBucket
+
+class FakeClock:
+    '''
+    sleep 하면 시간만 넘어가는 시계
+    '''
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ratelimiter, 'time', clock)
+    return clock
+
+def test_bucket_spends_burst_then_waits_for_refill(clock):
+    bucket = TokenBucket(rate=10, capacity=5)
+    for _ in range(5):
+        bucket.acquire()
+    assert clock.sleeps == []
+    bucket.acquire()
+    assert clock.sleeps == [pytest.approx(0.1)]
+    # 오래 쉬어도 capacity 이상 쌓이지 않는다
+    clock.now += 100
+    for _ in range(5):
+        bucket.acquire()
+    assert len(clock.sleeps) == 1
+    bucket.acquire(2)
+    assert clock.sleeps[-1] == pytest.approx(0.2)
+
+def test_limiter_groups_and_default(clock):
+    limiter = RateLimiter({'order': 1, 'default': 2})
+    limiter.acquire('order')
+    limiter.acquire('order')
+    assert clock.sleeps == [pytest.approx(1.0)]
+    # 등록되지 않은 그룹은 default 버킷을 같이 쓴다
+    limiter.acquire('ticker')
+    limiter.acquire('candle')
+    limiter.acquire('ticker')
+    assert clock.sleeps[1:] == [pytest.approx(0.5)]
+    # default 가 없으면 제한하지 않는다
+    RateLimiter({'order': 1}).acquire('ticker', 100)
+    assert len(clock.sleeps) == 2
+
+class FakeUpbit:
+    def __init__(self, config = None):
+        self.options = {}
+        self.calls = []
+
+    def fetch_tickers(self):
+        self.calls.append('fetch_tickers')
+        return {}
+
+    def create_limit_buy_order(self, symbol, amount, price):
+        self.calls.append('create_limit_buy_order')
+        return {'id': '1'}
+
+class RecordingLimiter:
+    def __init__(self):
+        self.groups = []
+
+    def acquire(self, group, tokens = 1):
+        self.groups.append(group)
+
+def test_client_acquires_request_group():
+    limiter = RecordingLimiter()
+    client = UpbitRateLimitedClient(FakeUpbit(), limiter=limiter)
+    client.fetch_tickers()
+    client.create_limit_buy_order('BTC/KRW', 1, 100)
+    assert limiter.groups == ['ticker', 'order']
+    # 요청이 아닌 속성은 그대로
+    assert client.options is client.exchange.options
+    assert client.exchange.calls == ['fetch_tickers', 'create_limit_buy_order']
+
+def test_reinit_keeps_one_limiter(tmp_path, monkeypatch):
+    key_path = tmp_path / 'key.txt'
+    key_path.write_text('key\nsecret\n')
+    monkeypatch.setattr(upbitexchange.ccxt, 'upbit', FakeUpbit)
+    monkeypatch.setattr(UpbitExchange, 'update', lambda self: True)
+    exchange = UpbitExchange(0.5, str(key_path))
+    exchange.init()
+    first = exchange.exchange
+    exchange.init()
+    assert exchange.exchange is not first
+    assert exchange.exchange.limiter is exchange.limiter
+    assert first.limiter is exchange.limiter
+    assert exchange.market_event_service.limiter is exchange.limiter
+    assert set(exchange.limiter.buckets) == set(UPBIT_RATE_LIMITS)
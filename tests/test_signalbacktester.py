@@ -0,0 +1,80 @@
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ata.agent.lhagent import LHAgent
+from ata.backtest.signalbacktester import SignalBacktester
+from ata.exchange.offlineexchangesimulator import OfflineExchangeSimulator
+
+def make_candles(n, seed = 0):
+    '''
+    1분봉 csv 와 같은 형식의 df, 가끔 급락 / 급등해서 매수 / 매도 신호가 생긴다
+    '''
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0, 1e-3, n)
+    shocks = rng.random(n) < 0.01
+    returns[shocks] += rng.choice([-1, 1], shocks.sum()) * 6e-3
+    close = 1e8 * np.exp(np.cumsum(returns))
+    open_price = np.concatenate([[close[0]], close[:-1]])
+    high = np.maximum(open_price, close) * (1 + rng.random(n) * 5e-4)
+    low = np.minimum(open_price, close) * (1 - rng.random(n) * 5e-4)
+    return pd.DataFrame({
+        'datetime': pd.date_range('2024-01-01', periods=n, freq='min').astype(str),
+        'open': open_price,
+        'high': high,
+        'low': low,
+        'close': close,
+        'baseVolume': rng.random(n) * 3,
+        'percentage': 1.0
+    })
+
+class RecordingSimulator(OfflineExchangeSimulator):
+    '''
+    매 분 평가 금액을 기록하는 OfflineExchangeSimulator
+    '''
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.equity = {}
+
+    def update(self) -> bool:
+        running = super().update()
+        if running:
+            self.equity[self.idx] = self.get_total_balance()
+        return running
+
+def run_agent(data, **kwargs):
+    exchange = RecordingSimulator(data=data)
+    agent = LHAgent(exchange=exchange, only_btc=True, debug=False, **kwargs)
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            agent.run()
+        except SystemExit:
+            pass
+    return pd.Series(exchange.equity)
+
+@pytest.mark.parametrize('end_condition, wait_time_for_buy_order, stopped', [
+    (0.9, 60, False),
+    # 중간에 end_condition 으로 멈추는 경우
+    (0.99, 0, True)
+])
+def test_equity_matches_event_driven_run(tmp_path, monkeypatch, end_condition, wait_time_for_buy_order, stopped):
+    # BaseAgent 는 ./log 에 로그를 남긴다
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'log').mkdir()
+    data = make_candles(6600)
+    kwargs = {
+        'wait_time_for_buy_order': wait_time_for_buy_order,
+        'wait_time_for_sell_order': 60,
+        'wait_time_for_cancel_sell_order': 60,
+        'end_condition': end_condition
+    }
+    result = SignalBacktester(data, **kwargs).run()
+    expected = run_agent(data, **kwargs)
+
+    assert result.stopped == stopped
+    assert len(result.trades) > 0
+    assert result.equity.index.isin(expected.index).all()
+    np.testing.assert_allclose(result.equity.to_numpy(), expected.loc[result.equity.index].to_numpy(), rtol=1e-12)
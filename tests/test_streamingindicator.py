@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from ata.utils.streamingindicator import (
+    StreamingEMA, StreamingExtreme, StreamingMFI, StreamingSMA, StreamingSTD, StreamingWilliamsR
+)
+from test_featuregraph import make_ohlcv
+from test_trade import pandas_mfi
+
+def make_frame(n = 300, seed = 0):
+    df = make_ohlcv(n, seed=seed)
+    # 가격이 멈춘 구간 (std 0, money flow 0)
+    df.loc[100:130, ['high', 'low', 'close']] = df.loc[100, 'close']
+    df.loc[200:205, 'volume'] = 0.0
+    return df
+
+def run(indicator, columns, rng):
+    '''
+    각 캔들을 진행 중인 값으로 update 한 뒤 revise 를 거쳐 마감된 값으로 바꾸며 지표 값을 모은다
+    '''
+    values = []
+    for row in columns:
+        row = tuple(row)
+        indicator.update(*(v * (1 + rng.normal(0, 1e-3)) for v in row))
+        # 위아래 양쪽으로 한 번씩 바뀐 뒤 마감
+        indicator.revise(*(v * 1.002 for v in row))
+        indicator.revise(*(v * 0.998 for v in row))
+        values.append(indicator.revise(*row))
+    return np.array(values)
+
+def assert_close(actual, expected, atol = 1e-9):
+    np.testing.assert_allclose(actual, np.asarray(expected, dtype=np.float64), rtol=1e-9, atol=atol, equal_nan=True)
+
+def test_sma_std_ema_match_pandas():
+    df = make_frame()
+    close = df['close']
+    for period in (1, 5, 20):
+        rng = np.random.default_rng(period)
+        assert_close(run(StreamingSMA(period), zip(close), rng), close.rolling(period).mean())
+        assert_close(run(StreamingEMA(period), zip(close), rng), close.ewm(span=period, adjust=False).mean())
+    for period in (2, 5, 20):
+        rng = np.random.default_rng(period)
+        # pandas rolling std 도 누적 오차가 있어서 구간마다 직접 계산한 값과 비교 (가격 1e6 대비 1e-12 이내)
+        expected = np.r_[np.full(period - 1, np.nan), sliding_window_view(close.to_numpy(), period).std(axis=1, ddof=1)]
+        std = run(StreamingSTD(period), zip(close), rng)
+        assert_close(std, expected, atol=1e-6)
+        # 가격이 멈춘 구간은 정확히 0
+        assert np.all(std[100 + period - 1:131] == 0)
+
+def test_mfi_matches_pandas():
+    df = make_frame(seed=1)
+    for period in (3, 14):
+        rng = np.random.default_rng(period)
+        mfi = run(StreamingMFI(period), zip(df['high'], df['low'], df['close'], df['volume']), rng)
+        assert_close(mfi, pandas_mfi(df, period))
+
+def test_williams_r_and_extremes_match_pandas():
+    df = make_frame(seed=2)
+    for period in (1, 10):
+        rng = np.random.default_rng(period)
+        highest = df['high'].rolling(period).max()
+        lowest = df['low'].rolling(period).min()
+        assert_close(run(StreamingExtreme(period, is_max=True), zip(df['high']), rng), highest)
+        assert_close(run(StreamingExtreme(period, is_max=False), zip(df['low']), rng), lowest)
+        williams_r = run(StreamingWilliamsR(period), zip(df['high'], df['low'], df['close']), rng)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            assert_close(williams_r, (highest - df['close']) / (highest - lowest) * -100)
+
+def test_long_stream_does_not_drift():
+    # 누적 합이 period 번마다 다시 합산되는지: 큰 값 뒤의 작은 값도 정확해야 한다
+    values = pd.Series(np.r_[np.full(500, 1e12), np.arange(1, 501, dtype=np.float64)])
+    sma = StreamingSMA(20)
+    std = StreamingSTD(20)
+    for value in values:
+        sma.update(value)
+        std.update(value)
+    np.testing.assert_allclose(sma.value, values.iloc[-20:].mean(), rtol=1e-12)
+    np.testing.assert_allclose(std.value, values.iloc[-20:].std(), rtol=1e-9)
@@ -0,0 +1,196 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ata.utils import trade
+from ata.utils.featuregraph import bollinger_keys
+
+def make_ohlcv(n, seed = 0):
+    rng = np.random.default_rng(seed)
+    close = 1e6 * np.exp(np.cumsum(rng.normal(0, 2e-3, n)))
+    high = close * (1 + rng.random(n) * 2e-3)
+    low = close * (1 - rng.random(n) * 2e-3)
+    volume = rng.random(n) * 10
+    return pd.DataFrame({'high': high, 'low': low, 'close': close, 'volume': volume})
+
+def pandas_mfi(df, period):
+    # 전체 구간 pandas 계산 (calc_mfi 의 이전 구현)
+    typical_price = (df['high'] + df['low'] + df['close']) / 3
+    raw_money_flow = typical_price * df['volume']
+    positive_money_flow = pd.Series(np.where(typical_price > typical_price.shift(1), raw_money_flow, 0), index=df.index)
+    negative_money_flow = pd.Series(np.where(typical_price < typical_price.shift(1), raw_money_flow, 0), index=df.index)
+    positive_mf_sum = positive_money_flow.rolling(window=period).sum()
+    negative_mf_sum = negative_money_flow.rolling(window=period).sum()
+    return 100 - (100 / (1 + positive_mf_sum / negative_mf_sum))
+
+def pandas_bollinger_bands(df, period, num_std_dev):
+    # 전체 구간 pandas 계산 (calc_bollinger_bands 의 이전 구현)
+    sma = df['close'].rolling(window=period).mean()
+    std = df['close'].rolling(window=period).std()
+    upper = sma + std * num_std_dev
+    lower = sma - std * num_std_dev
+    return upper, lower, (df['close'] - lower) / (upper - lower)
+
+def pandas_signals(df, bollinger_period = 20, bollinger_num_std_dev = 2, mfi_peirod = 14):
+    '''
+    check_oversold_by_bollinger_mfi, check_overbought_by_bollinger_mfi 의 이전 구현 (전체 구간에 컬럼을 추가하고 마지막 행을 비교)
+    '''
+    upper, lower, b = (series.iloc[-1] for series in pandas_bollinger_bands(df, bollinger_period, bollinger_num_std_dev))
+    close = df['close'].iloc[-1]
+    mfi = pandas_mfi(df, mfi_peirod).iloc[-1]
+    oversold = not (lower < close) and not (b > 0) and not (mfi > 20)
+    overbought = not (upper > close) and not (b < 1) and not (mfi < 80)
+    return oversold, overbought
+
+def assert_last_values_match(df, bollinger_period = 20, bollinger_num_std_dev = 2, mfi_peirod = 14, williams_period = 10):
+    values = trade.calc_last_bollinger_mfi(df, bollinger_period, bollinger_num_std_dev, mfi_peirod)
+    keys = bollinger_keys(bollinger_period, bollinger_num_std_dev)
+    np.testing.assert_allclose(
+        [values[keys['upper_key']], values[keys['lower_key']], values[keys['b_key']]],
+        [series.iloc[-1] for series in pandas_bollinger_bands(df, bollinger_period, bollinger_num_std_dev)],
+        rtol=1e-9, equal_nan=True
+    )
+    np.testing.assert_allclose(values[f'mfi{mfi_peirod}'], pandas_mfi(df, mfi_peirod).iloc[-1], rtol=1e-9, atol=1e-9, equal_nan=True)
+
+    # 전체 구간 calc_* 도 같은 값
+    full, calc_keys = trade.calc_bollinger_bands(df.copy(), bollinger_period, bollinger_num_std_dev)
+    assert calc_keys == keys
+    np.testing.assert_allclose(full[keys['b_key']].iloc[-1], values[keys['b_key']], rtol=1e-9, equal_nan=True)
+    full, mfi_key = trade.calc_mfi(df.copy(), mfi_peirod)
+    np.testing.assert_allclose(full[mfi_key].iloc[-1], values[mfi_key], rtol=1e-9, atol=1e-9, equal_nan=True)
+
+    highest = df['high'].rolling(window=williams_period).max().iloc[-1]
+    lowest = df['low'].rolling(window=williams_period).min().iloc[-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        williams_r = np.float64(highest - df['close'].iloc[-1]) / np.float64(highest - lowest) * -100
+    full, williams_key = trade.calc_williams_r(df.copy(), williams_period)
+    np.testing.assert_allclose(full[williams_key].iloc[-1], williams_r, rtol=1e-9, equal_nan=True)
+
+def assert_signals_match(df, bollinger_period = 20, bollinger_num_std_dev = 2, mfi_peirod = 14):
+    expected = pandas_signals(df, bollinger_period, bollinger_num_std_dev, mfi_peirod)
+    params = (bollinger_period, bollinger_num_std_dev, mfi_peirod)
+    assert trade.check_oversold_by_bollinger_mfi(df, *params) == expected[0]
+    assert trade.check_overbought_by_bollinger_mfi(df, *params) == expected[1]
+    oversold, overbought = trade.check_bollinger_mfi_batch(*trade.stack_last_ohlcv([df], max(bollinger_period, mfi_peirod + 1)), *params)
+    assert (oversold[0], overbought[0]) == expected
+
+def test_last_values_match_full_series():
+    df = make_ohlcv(300)
+    for end in range(30, 301, 7):
+        assert_last_values_match(df.iloc[:end])
+        assert_last_values_match(df.iloc[:end], bollinger_period=30, bollinger_num_std_dev=1.5, mfi_peirod=10, williams_period=14)
+
+def test_signals_match_full_series():
+    df = make_ohlcv(600, seed=1)
+    found = {True: 0, False: 0}
+    for end in range(30, 601):
+        window = df.iloc[end - 30:end]
+        assert_signals_match(window)
+        oversold, overbought = pandas_signals(window)
+        found[oversold or overbought] += 1
+    # 신호가 나는 경우와 나지 않는 경우를 모두 비교했는지
+    assert found[True] > 0 and found[False] > 0
+
+def test_short_history():
+    df = make_ohlcv(30, seed=2)
+    for end in range(1, 30):
+        assert_last_values_match(df.iloc[:end])
+        assert_signals_match(df.iloc[:end])
+
+def test_constant_price():
+    df = pd.DataFrame({'high': [100.0] * 40, 'low': [100.0] * 40, 'close': [100.0] * 40, 'volume': [1.0] * 40})
+    values = trade.calc_last_bollinger_mfi(df)
+    assert values['upper_band20_2'] == values['lower_band20_2'] == 100.0
+    assert np.isnan(values['bollinger_b20_2'])
+    assert np.isnan(values['mfi14'])
+    assert_last_values_match(df)
+    assert_signals_match(df)
+
+    # 일정한 가격 뒤에 급락 / 급등
+    for price in (90.0, 110.0):
+        moved = df.copy()
+        moved.loc[39, ['high', 'low', 'close']] = price
+        assert_last_values_match(moved)
+        assert_signals_match(moved)
+
+@pytest.mark.parametrize('column', ['close', 'volume'])
+def test_nan_inputs(column):
+    df = make_ohlcv(60, seed=3)
+    for position in (5, 45, 52, 59):
+        broken = df.copy()
+        broken.loc[position, column] = np.nan
+        assert_last_values_match(broken)
+        assert_signals_match(broken)
+
+def test_batch_rows_match_scalar_checks():
+    length = trade.bollinger_mfi_length()
+    # 가격 규모와 캔들 수가 다른 종목들 (캔들 수가 length 보다 적은 종목은 앞을 nan 으로 채운다)
+    lengths = [1, 10, 14, 15, 19, 20, 21, 35, 60]
+    series = [make_ohlcv(200, seed=10 + i) * (10 ** i) for i in range(len(lengths))]
+    found = {True: 0, False: 0}
+    for end in range(60, 201, 3):
+        ohlcvs = [df.iloc[end - n:end].reset_index(drop=True) for df, n in zip(series, lengths)]
+        high, low, close, volume = trade.stack_last_ohlcv(ohlcvs, length)
+        for row, ohlcv in enumerate(ohlcvs):
+            tail = ohlcv.iloc[-length:]
+            pad = length - len(tail)
+            assert np.isnan(close[row, :pad]).all()
+            assert close[row, pad:].tolist() == tail['close'].tolist()
+            assert volume[row, pad:].tolist() == tail['volume'].tolist()
+        oversold, overbought = trade.check_bollinger_mfi_batch(high, low, close, volume)
+        for row, ohlcv in enumerate(ohlcvs):
+            expected = (trade.check_oversold_by_bollinger_mfi(ohlcv), trade.check_overbought_by_bollinger_mfi(ohlcv))
+            assert (oversold[row], overbought[row]) == expected
+            found[expected[0] or expected[1]] += 1
+        # 종목 순서를 바꿔도 각 종목의 결과는 같다
+        reversed_oversold, reversed_overbought = trade.check_bollinger_mfi_batch(*trade.stack_last_ohlcv(ohlcvs[::-1], length))
+        assert reversed_oversold.tolist() == oversold[::-1].tolist()
+        assert reversed_overbought.tolist() == overbought[::-1].tolist()
+    assert found[True] > 0 and found[False] > 0
+
+def test_signal_inputs_are_not_modified():
+    df = make_ohlcv(40, seed=4)
+    columns = list(df.columns)
+    trade.check_oversold_by_bollinger_mfi(df)
+    trade.check_overbought_by_bollinger_mfi(df)
+    assert list(df.columns) == columns
+
+def test_indicator_key_changes_when_earlier_candle_is_revised():
+    df = make_ohlcv(40, seed=5)
+    length = trade.bollinger_mfi_length()
+    key = trade.get_indicator_key('BTC/KRW', '1m', df, length=length)
+    assert trade.get_indicator_key('BTC/KRW', '1m', df.copy(), length=length) == key
+
+    revised = df.copy()
+    revised.loc[30, 'close'] *= 0.9
+    assert trade.get_indicator_key('BTC/KRW', '1m', revised, length=length) != key
+    # 지표 구간 밖의 캔들은 key 에 영향을 주지 않는다
+    outside = df.copy()
+    outside.loc[0, 'close'] *= 0.9
+    assert trade.get_indicator_key('BTC/KRW', '1m', outside, length=length) == key
+
+def test_cached_signals_follow_revised_candles():
+    trade.indicator_cache.clear()
+    # 완만하게 내리다 마지막 캔들에서 급락 (과매도)
+    close = np.append(100 - np.arange(39) * 0.1, 90.0)
+    df = pd.DataFrame({'high': close, 'low': close, 'close': close, 'volume': np.ones(40)})
+    # 마지막 두 캔들은 그대로 두고 그 이전 캔들이 더 낮은 가격으로 수정된 경우 (과매도 아님)
+    revised = df.copy()
+    revised.loc[25:37, ['high', 'low', 'close']] = 80.0
+    assert pandas_signals(df) == (True, False)
+    assert pandas_signals(revised) == (False, False)
+    for frame in (df, revised):
+        assert trade.check_oversold_by_bollinger_mfi(frame, symbol='BTC') == pandas_signals(frame)[0]
+        assert trade.check_overbought_by_bollinger_mfi(frame, symbol='BTC') == pandas_signals(frame)[1]
+
+def test_check_with_symbol_uses_cache():
+    trade.indicator_cache.clear()
+    df = make_ohlcv(40, seed=7)
+    expected = trade.check_bollinger_mfi(df)
+    assert trade.check_oversold_by_bollinger_mfi(df, symbol='BTC') == expected[0]
+    assert trade.check_overbought_by_bollinger_mfi(df, symbol='BTC') == expected[1]
+    assert trade.indicator_cache.stats()['hits'] == 1
+    assert trade.indicator_cache.stats()['misses'] == 1
+    # 다른 파라미터는 따로 계산
+    trade.check_oversold_by_bollinger_mfi(df, 30, 1.5, 10, symbol='BTC')
+    assert trade.indicator_cache.stats()['misses'] == 2
@@ -0,0 +1,132 @@
+import json
+import threading
+
+import pytest
+
+from ata.exchange import upbitmarketevents
+from ata.exchange.upbitmarketevents import CAUTION_KEYS, UpbitMarketEventService
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+class FakeResponse:
+    def __init__(self, status_code, body = None, etag = None):
+        self.status_code = status_code
+        self.content = json.dumps(body).encode() if body is not None else b''
+        self.headers = {} if etag is None else {'ETag': etag}
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise Exception(f'HTTP {self.status_code}')
+
+class FakeSession:
+    '''
+    업비트 /v1/market/all 응답을 순서대로 돌려주는 세션, gate 가 닫혀 있으면 열릴 때까지 응답하지 않는다
+    '''
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def get(self, url, headers, timeout):
+        self.requests.append(dict(headers))
+        self.gate.wait(5)
+        return self.responses.pop(0)
+
+def make_info(item, warning = False, caution = ()):
+    return {
+        'market': f'KRW-{item}',
+        'market_event': {
+            'warning': warning,
+            'caution': {key: key in caution for key in CAUTION_KEYS}
+        }
+    }
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(upbitmarketevents, 'time', clock)
+    return clock
+
+def make_service(responses, ttl = 60):
+    service = UpbitMarketEventService(ttl=ttl)
+    service.session = FakeSession(responses)
+    return service
+
+def wait_refresh(service):
+    refreshing = service._UpbitMarketEventService__refreshing
+    if refreshing is not None:
+        refreshing.result(timeout=5)
+
+def test_ttl_serves_cache_then_refreshes_in_background(clock):
+    service = make_service([
+        FakeResponse(200, [make_info('BTC'), make_info('ETH')], etag='"1"'),
+        FakeResponse(200, [make_info('BTC', warning=True)], etag='"2"'),
+    ])
+    # 처음에는 바로 받아온다
+    events = service.get()
+    assert events == {
+        'BTC': {'warning': False, 'caution': {key: False for key in CAUTION_KEYS}},
+        'ETH': {'warning': False, 'caution': {key: False for key in CAUTION_KEYS}},
+    }
+    assert len(service.session.requests) == 1
+
+    # ttl 안에서는 요청하지 않는다
+    clock.now = 59.9
+    assert service.get() is events
+    assert len(service.session.requests) == 1
+
+    # ttl 이 지나면 이전 값을 반환하고 백그라운드에서 갱신
+    clock.now = 60
+    service.session.gate.clear()
+    assert service.get() is events
+    assert service.get() is events
+    service.session.gate.set()
+    wait_refresh(service)
+    # 갱신 중에는 다시 요청하지 않는다
+    assert len(service.session.requests) == 2
+    assert service.session.requests[-1] == {'If-None-Match': '"1"'}
+    events = service.get()
+    assert events['BTC']['warning']
+    assert 'ETH' not in events
+
+def test_not_modified_and_same_body_keep_events(clock):
+    infos = [make_info('BTC'), make_info('ETH', caution=('PRICE_FLUCTUATIONS',))]
+    changed = [make_info('BTC'), make_info('ETH')]
+    service = make_service([
+        FakeResponse(200, infos, etag='"1"'),
+        FakeResponse(304),
+        FakeResponse(200, infos, etag='"2"'),
+        FakeResponse(200, changed, etag='"3"'),
+    ], ttl=0)
+    events = service.refresh()
+    assert events['ETH']['caution']['PRICE_FLUCTUATIONS']
+    # 304, 같은 응답: 같은 dict
+    assert service.refresh() is events
+    assert service.refresh() is events
+    # 바뀐 종목만 새로 만든다
+    updated = service.refresh()
+    assert updated is not events
+    assert updated['BTC'] is events['BTC']
+    assert not updated['ETH']['caution']['PRICE_FLUCTUATIONS']
+
+def test_background_failure_keeps_previous_events(clock):
+    service = make_service([
+        FakeResponse(200, [make_info('BTC')], etag='"1"'),
+        FakeResponse(500),
+    ])
+    events = service.get()
+    clock.now = 61
+    service.get()
+    wait_refresh(service)
+    # 실패하면 다음 get 에서 다시 시도
+    assert service.get() is events
+    assert len(service.session.requests) == 2
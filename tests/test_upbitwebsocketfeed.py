@@ -0,0 +1,112 @@
+import time
+
+import pytest
+
+from ata.exchange.upbitwebsocketfeed import UpbitWebSocketFeed
+from upbitwebsocketreplayserver import UpbitWebSocketReplayServer
+
+MINUTE = 60 * 1000
+T0 = 1704067200000
+
+def ticker(code, price):
+    return {'type': 'ticker', 'code': code, 'trade_price': price, 'trade_timestamp': T0, 'signed_change_rate': 0.01, 'acc_trade_price_24h': 1e9}
+
+def trade(code, price, volume, timestamp):
+    return {'type': 'trade', 'code': code, 'trade_price': price, 'trade_volume': volume, 'trade_timestamp': timestamp}
+
+def order_book(code, bid, ask):
+    return {'type': 'orderbook', 'code': code, 'timestamp': T0, 'orderbook_units': [{'bid_price': bid, 'bid_size': 1.0, 'ask_price': ask, 'ask_size': 2.0}]}
+
+MESSAGES = [
+    ticker('KRW-BTC', 100.0),
+    ticker('KRW-ETH', 10.0),
+    order_book('KRW-BTC', 99.0, 101.0),
+    trade('KRW-BTC', 100.0, 1.0, T0 + 1000),
+    trade('KRW-BTC', 102.0, 0.5, T0 + 2000),
+    trade('KRW-BTC', 98.0, 0.5, T0 + 3000),
+    trade('KRW-BTC', 101.0, 2.0, T0 + MINUTE + 1000),
+]
+
+def wait_until(condition, timeout = 5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+@pytest.fixture
+def server():
+    server = UpbitWebSocketReplayServer(MESSAGES).start()
+    yield server
+    server.stop()
+
+def start_feed(url, **kwargs):
+    feed = UpbitWebSocketFeed(url=url, reconnect_delay=0.05, **kwargs)
+    feed.start(['BTC/KRW', 'ETH/KRW'])
+    return feed
+
+def test_feed_builds_state_from_messages(server):
+    feed = start_feed(server.url)
+    try:
+        assert wait_until(lambda: (frame := feed.get_ohlcv_per_1m('BTC/KRW')) is not None and len(frame) == 2)
+        codes = server.subscriptions[0][1]['codes']
+        assert codes == ['KRW-BTC', 'KRW-ETH']
+
+        tickers = feed.get_tickers()
+        assert set(tickers) == {'BTC/KRW', 'ETH/KRW'}
+        assert tickers['BTC/KRW']['close'] == 100.0
+        assert tickers['BTC/KRW']['percentage'] == pytest.approx(1.0)
+        assert feed.get_order_book('BTC/KRW')['bids'] == [[99.0, 1.0]]
+
+        frame = feed.get_ohlcv_per_1m('BTC/KRW')
+        assert frame.iloc[0].tolist() == [100.0, 102.0, 98.0, 98.0, 2.0]
+        assert frame.iloc[1].tolist() == [101.0, 101.0, 101.0, 101.0, 2.0]
+    finally:
+        feed.stop()
+
+def test_seed_merges_rest_candles_with_live_trades(server):
+    feed = start_feed(server.url)
+    try:
+        assert wait_until(lambda: (frame := feed.get_ohlcv_per_1m('BTC/KRW')) is not None and len(frame) == 2)
+        assert not feed.is_seeded('BTC/KRW')
+        rest = [
+            [T0 - MINUTE, 90.0, 95.0, 89.0, 94.0, 3.0],
+            [T0, 97.0, 100.0, 97.0, 99.0, 1.5],
+        ]
+        feed.seed_ohlcv('BTC/KRW', rest)
+        assert feed.is_seeded('BTC/KRW')
+        frame = feed.get_ohlcv_per_1m('BTC/KRW')
+        assert frame['close'].tolist() == [94.0, 98.0, 101.0]
+        # 겹치는 봉은 REST 시가, 구독 이후의 고가 / 저가 / 종가
+        assert frame.iloc[1].tolist() == [97.0, 102.0, 97.0, 98.0, 2.0]
+    finally:
+        feed.stop()
+
+def test_reconnect_drops_state_and_requires_reseed():
+    server = UpbitWebSocketReplayServer(MESSAGES, close_after_send=True).start()
+    feed = start_feed(server.url)
+    try:
+        assert wait_until(lambda: feed.get_ohlcv_per_1m('BTC/KRW') is not None)
+        feed.seed_ohlcv('BTC/KRW', [[T0 - MINUTE, 90.0, 95.0, 89.0, 94.0, 3.0]])
+        # 서버가 연결을 끊으면 다시 연결하고 구독한다
+        assert wait_until(lambda: len(server.subscriptions) >= 2)
+        # 끊긴 동안의 체결은 알 수 없으므로 다시 연결한 뒤에는 REST 로 다시 채워야 한다
+        assert not feed.is_seeded('BTC/KRW')
+    finally:
+        feed.stop()
+        server.stop()
+    assert feed.get_tickers() == {}
+    assert feed.get_order_book('BTC/KRW') is None
+
+def test_stale_feed_is_not_served(server):
+    feed = start_feed(server.url, max_age=0.3)
+    try:
+        assert wait_until(lambda: len(feed.get_tickers()) == 2)
+        assert feed.get_order_book('BTC/KRW') is not None
+        # 연결은 살아 있지만 메시지가 오지 않는다
+        assert wait_until(lambda: feed.get_tickers() == {})
+        assert feed.get_ticker('BTC/KRW') is None
+        assert feed.get_order_book('BTC/KRW') is None
+    finally:
+        feed.stop()
@@ -0,0 +1,72 @@
+import pandas as pd
+import pytest
+
+from ata.backtest import walkforward
+from ata.backtest.parametersweep import ENGINES, PARAMETERS, run_backtest
+from ata.exchange.offlineexchangesimulator import OfflineExchangeSimulator, load_offline_data
+from test_signalbacktester import make_candles
+
+class RowsExchange(OfflineExchangeSimulator):
+    '''
+    시뮬레이터가 지난 행 (init 포함)
+    '''
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rows = []
+
+    def update(self):
+        ok = super().update()
+        if ok:
+            self.rows.append(self.idx)
+        return ok
+
+@pytest.mark.parametrize('n, window', [(6800, 250), (6600, 600), (6601, 600), (6010, 3)])
+def test_windows_are_disjoint_and_contiguous(n, window):
+    windows = walkforward.split_windows(n, window)
+    assert windows[0][:2] == (0, walkforward.WARMUP - 1)
+    assert all(end - start == window for _, start, end in windows[:-1])
+    assert windows[-1][2] == n
+    for (_, _, end), (_, start, _) in zip(windows, windows[1:]):
+        assert start == end
+    for data_start, start, end in windows:
+        assert start - data_start == walkforward.WARMUP - 1
+        # 시작 잔고를 정하는 첫 틱 뒤에 거래할 분이 하나 이상
+        assert end - start >= 2
+
+def test_simulated_rows_are_disjoint_and_contiguous():
+    data = load_offline_data(make_candles(6700))
+    rows = []
+    for data_start, start, end in walkforward.split_windows(len(data), 250):
+        exchange = RowsExchange(data=data.iloc[data_start:end].reset_index(drop=True))
+        exchange.init()
+        while exchange.update():
+            pass
+        assert exchange.rows[0] + data_start == start
+        rows += [row + data_start for row in exchange.rows]
+    assert rows == list(range(walkforward.WARMUP - 1, len(data)))
+
+def test_window_results_match_direct_backtest(tmp_path, monkeypatch):
+    # BaseAgent 는 ./log 에 로그를 남긴다
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'log').mkdir()
+    data = load_offline_data(make_candles(6800))
+    windows = walkforward.split_windows(len(data), 250)
+    grid = {'wait_time_for_buy_order': [0, 60]}
+    for engine in ENGINES:
+        results, evaluation = walkforward.walk_forward(data, 250, grid=grid, engine=engine, processes=1)
+        assert len(results) == len(windows) * 2
+        combinations = results.groupby('combination').first()
+        for row in results.itertuples():
+            data_start, start, end = windows[row.window]
+            assert (row.start, row.end) == (start, end)
+            params = {key: getattr(combinations.loc[row.combination], key) for key in PARAMETERS}
+            expected = run_backtest(params, engine, data.iloc[data_start:end].reset_index(drop=True))
+            assert row.final_value == pytest.approx(expected['final_value'], rel=1e-12)
+            assert row.profit == pytest.approx(expected['profit'], rel=1e-12, abs=1e-9)
+            assert row.stopped == expected['stopped']
+        # 다음 구간은 이전 구간에서 가장 좋은 조합으로 평가
+        assert list(evaluation['window']) == list(range(1, len(windows)))
+        for row in evaluation.itertuples():
+            in_sample = results[results['window'] == row.window - 1]
+            assert row.in_sample_total_return == in_sample['total_return'].max()
+        assert (results['total_return'] != 0).any()
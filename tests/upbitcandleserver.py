@@ -0,0 +1,112 @@
+import datetime
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+MINUTE = 60 * 1000
+
+class UpbitCandleServer:
+    '''
+    업비트 /v1/market/all, /v1/candles/minutes/{unit} 를 흉내 내는 로컬 서버 (CandleDownloader 테스트)
+    listings: 종목: 상장 시각(ms), 상장부터 now 전까지 1분마다 캔들이 있다
+    캔들 값은 open = high = low = close = 시작 시각(분) + revision, volume = 1분봉 수
+    too_many_requests: 이 수만큼 다음 캔들 요청에 429 로 응답
+    '''
+    def __init__(self, listings: dict[str, int], now):
+        self.listings = listings
+        self.now = now
+        self.revision = 0
+        self.too_many_requests = 0
+        self.requests: list[dict] = []
+        self.__lock = threading.Lock()
+        self.__server = ThreadingHTTPServer(('127.0.0.1', 0), self.__make_handler())
+        self.__thread = None
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.__server.server_address[1]}'
+
+    def start(self):
+        self.__thread = threading.Thread(target=self.__server.serve_forever, daemon=True)
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        self.__server.shutdown()
+        self.__server.server_close()
+        self.__thread.join()
+
+    def candles(self, symbol, unit, to = None, count = 200) -> list[dict]:
+        '''
+        to 이전의 캔들을 최신부터 count 개
+        '''
+        period = unit * MINUTE
+        listing = self.listings[symbol]
+        first = listing // period * period
+        last = (self.now - 1) // period * period
+        if to is not None:
+            last = min(last, (to - 1) // period * period)
+        result = []
+        timestamp = last
+        while timestamp >= first and len(result) < count:
+            minutes = (min(timestamp + period, self.now) - max(timestamp, listing)) // MINUTE
+            price = float(timestamp // MINUTE + self.revision)
+            date = datetime.datetime.fromtimestamp(timestamp / 1000, datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
+            result.append({
+                'market': f'KRW-{symbol}',
+                'candle_date_time_utc': date,
+                'candle_date_time_kst': date,
+                'opening_price': price,
+                'high_price': price,
+                'low_price': price,
+                'trade_price': price,
+                'timestamp': timestamp,
+                'candle_acc_trade_price': price * minutes,
+                'candle_acc_trade_volume': float(minutes),
+                'unit': unit
+            })
+            timestamp -= period
+        return result
+
+    def __handle(self, path, query):
+        '''
+        return: (상태 코드, 응답)
+        '''
+        if path == '/v1/market/all':
+            return 200, [
+                {'market': f'KRW-{symbol}', 'korean_name': symbol, 'english_name': symbol, 'market_warning': 'NONE'}
+                for symbol in self.listings
+            ]
+        if path.startswith('/v1/candles/minutes/'):
+            with self.__lock:
+                self.requests.append({'path': path, **query})
+                if self.too_many_requests > 0:
+                    self.too_many_requests -= 1
+                    return 429, {'error': {'name': 'too_many_requests', 'message': 'Too many requests'}}
+            to = query.get('to')
+            if to is not None:
+                to = int(datetime.datetime.fromisoformat(to.replace('Z', '+00:00')).timestamp() * 1000)
+            unit = int(path.rsplit('/', 1)[1])
+            return 200, self.candles(query['market'].split('-')[1], unit, to, int(query.get('count', 200)))
+        return 404, {'error': {'name': 'not_found', 'message': path}}
+
+    def __make_handler(self):
+        handle = self.__handle
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = {key: values[0] for key, values in parse_qs(url.query).items()}
+                code, body = handle(url.path, query)
+                data = json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
@@ -0,0 +1,80 @@
+import asyncio
+import json
+import threading
+
+from aiohttp import web
+
+class UpbitWebSocketReplayServer:
+    '''
+    기록된 웹소켓 메시지(json lines)를 재생하는 로컬 웹소켓 서버
+    UpbitWebSocketFeed(url=server.url) 로 연결하여 실제 업비트 없이 피드를 확인할 수 있다.
+    '''
+    def __init__(
+        self,
+        messages,
+        host = '127.0.0.1',
+        port = 0,
+        interval = 0.0,
+        close_after_send = False
+        ):
+        '''
+        close_after_send: 메시지를 모두 보낸 뒤 연결을 끊는다 (재연결 확인)
+        '''
+        self.messages = messages
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.close_after_send = close_after_send
+        self.subscriptions = []
+        self.__loop: asyncio.AbstractEventLoop = None
+        self.__thread: threading.Thread = None
+        self.__runner: web.AppRunner = None
+
+    @classmethod
+    def from_file(cls, file_path, **kwargs):
+        with open(file_path, encoding='utf-8') as f:
+            messages = [json.loads(line) for line in f if line.strip()]
+        return cls(messages, **kwargs)
+
+    @property
+    def url(self):
+        return f'ws://{self.host}:{self.port}/websocket/v1'
+
+    def start(self):
+        self.__loop = asyncio.new_event_loop()
+        self.__thread = threading.Thread(target=self.__loop.run_forever, daemon=True)
+        self.__thread.start()
+        asyncio.run_coroutine_threadsafe(self.__start_server(), self.__loop).result()
+        return self
+
+    def stop(self):
+        if self.__loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.__runner.cleanup(), self.__loop).result()
+        self.__loop.call_soon_threadsafe(self.__loop.stop)
+        self.__thread.join(timeout=5)
+        self.__loop = None
+
+    async def __start_server(self):
+        app = web.Application()
+        app.router.add_get('/websocket/v1', self.__handle)
+        self.__runner = web.AppRunner(app)
+        await self.__runner.setup()
+        await web.TCPSite(self.__runner, self.host, self.port).start()
+        # port=0 인 경우 실제로 할당된 포트
+        self.port = self.__runner.addresses[0][1]
+
+    async def __handle(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        subscription = await ws.receive()
+        self.subscriptions.append(json.loads(subscription.data))
+        for message in self.messages:
+            await ws.send_bytes(json.dumps(message).encode('utf-8'))
+            if self.interval > 0:
+                await asyncio.sleep(self.interval)
+        if self.close_after_send:
+            await ws.close()
+        else:
+            await ws.receive()
+        return ws